@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos compartidos con la otra unidad viven en ../comun: importar
+# este módulo antes que ellos deja la raíz del repo en sys.path.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.append(RAIZ)
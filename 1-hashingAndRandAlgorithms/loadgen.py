@@ -0,0 +1,7 @@
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun import loadgen
+
+# El generador vive en comun/loadgen.py; aquí solo cambia el JSON por defecto.
+
+if __name__ == "__main__":
+    loadgen.main(datos="biblioteca.json")
@@ -1,22 +1,47 @@
-import random
 import json
 import os
-from datetime import datetime
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun.book_store import BookStore
+from comun.hash_table import HashTable
+from comun.interaction_log import InteractionLog, as_event
+from comun.ngram_index import NgramIndex
+from comun.snapshot import load_snapshot, register_module, save_snapshot
+from weighted_sampler import WeightedSampler
+
+INDEXED_FIELDS = ('title', 'author')
 
 class LibrarySystem:
-    def __init__(self, size=1000):
+    def __init__(self, size=1000, ngram_size=3, max_load=0.7, store=None):
         self.size = size
-        self.table = [[] for _ in range(size)] 
+        self.store = store
+        self.table = HashTable(size, max_load) 
         self.genre_index = {} 
         self.all_books_ref = [] 
-
-    def _hash_function(self, key):
-        return hash(key) % self.size
+        self.text_index = {f: NgramIndex(ngram_size) for f in INDEXED_FIELDS}
+        self.view_sampler = WeightedSampler()
+        self.genre_samplers = {}
+        self.log = None
+        self.log_seq = 0
+
+    def __getstate__(self):
+        # La bitácora es un archivo abierto: no va dentro del snapshot
+        state = self.__dict__.copy()
+        state['log'] = None
+        return state
+
+    def attach_log(self, log):
+        applied = log.replay(self)
+        self.log = log
+        return applied
 
     def insert_book(self, book):
+        # El _id es llave primaria: si ya existe, se actualiza el libro guardado
+        if book['_id'] in self.table:
+            return self.update_book(book['_id'], book)
 
-        index = self._hash_function(book['_id'])
-        self.table[index].append(book)
+        if self.store is not None:
+            book = self.store.append(book)
+        self.table.put(book['_id'], book)
         
         genre = book['genre'].lower()
         if genre not in self.genre_index:
@@ -25,14 +50,69 @@ class LibrarySystem:
 
         self.all_books_ref.append(book)
 
+        for field, index in self.text_index.items():
+            index.add(book['_id'], book[field])
+
+        self.view_sampler.add(book['_id'], book['views'])
+        if genre not in self.genre_samplers:
+            self.genre_samplers[genre] = WeightedSampler()
+        self.genre_samplers[genre].add(book['_id'], book['views'])
+        return book
+
+    def update_book(self, book_id, changes):
+        book = self.search_by_id(book_id)
+        if not book:
+            return None
+        if changes.get('_id', book_id) != book_id:
+            raise ValueError("No se puede cambiar el _id de un libro")
+
+        old_genre = book['genre'].lower()
+        book.update(changes)
+
+        new_genre = book['genre'].lower()
+        if new_genre != old_genre:
+            self.genre_index[old_genre].remove(book)
+            self.genre_index.setdefault(new_genre, []).append(book)
+
+            self.genre_samplers[old_genre].remove(book_id)
+            if new_genre not in self.genre_samplers:
+                self.genre_samplers[new_genre] = WeightedSampler()
+            self.genre_samplers[new_genre].add(book_id, book['views'])
+        elif 'views' in changes:
+            self.genre_samplers[new_genre].set_weight(book_id, book['views'])
+
+        if 'views' in changes:
+            self.view_sampler.set_weight(book_id, book['views'])
+
+        for field, index in self.text_index.items():
+            if field in changes:
+                index.update(book_id, book[field])
+        return book
+
+    def delete_book(self, book_id):
+        book = self.table.delete(book_id)
+        if not book:
+            return None
+
+        genre = book['genre'].lower()
+        self.genre_index[genre].remove(book)
+        self.all_books_ref.remove(book)
+
+        for index in self.text_index.values():
+            index.remove(book_id)
+        self.view_sampler.remove(book_id)
+        self.genre_samplers[genre].remove(book_id)
+        if self.store is not None:
+            self.store.remove(book)
+        return book
+
     def search_by_id(self, book_id):
-        index = self._hash_function(book_id)
-        for book in self.table[index]:
-            if book['_id'] == book_id:
-                return book
-        return None
+        return self.table.get(book_id)
 
     def search_flexible(self, query, filter_type):
+        index = self.text_index.get(filter_type)
+        if index is not None:
+            return [self.search_by_id(book_id) for book_id in index.search(query)]
 
         results = []
         query = query.lower()
@@ -46,54 +126,45 @@ class LibrarySystem:
         return self.genre_index.get(genre.lower(), [])
 
     def recommend_books(self, genre_preference=None, k=3):
-        candidates = []
-        
+        chosen = []
         if genre_preference:
-            candidates = self.get_books_by_genre(genre_preference)
-            if len(candidates) < k:
-                candidates.extend(self.all_books_ref)
-        else:
-            candidates = self.all_books_ref
-
-        candidates = list({v['_id']:v for v in candidates}.values())
+            genre_sampler = self.genre_samplers.get(genre_preference.lower())
+            if genre_sampler is not None:
+                chosen = genre_sampler.sample(k)
 
-        if not candidates:
-            return []
+        # Si el género no alcanza, el resto sale del catálogo (sin repetir)
+        if len(chosen) < k:
+            chosen += self.view_sampler.sample(k - len(chosen), exclude=chosen)
+        return [self.search_by_id(book_id) for book_id in chosen]
 
-        recommendations = []
-        max_attempts = k * 5
-        attempts = 0
-        
-        total_views = sum(b['views'] for b in candidates)
-
-        while len(recommendations) < k and attempts < max_attempts:
-            attempts += 1
-            chosen = None
-
-            if total_views == 0:
-                chosen = random.choice(candidates)
-            else:
-                pick = random.uniform(0, total_views)
-                current = 0
-                for book in candidates:
-                    current += book['views']
-                    if current > pick:
-                        chosen = book
-                        break
-            
-            if chosen and chosen not in recommendations:
-                recommendations.append(chosen)
-                
-        return recommendations
-
-    def register_interaction(self, book_id):
+    def _apply_interaction(self, book_id, user_id, timestamp):
         book = self.search_by_id(book_id)
         if book:
             book['views'] += 1
-            book['lastAccessed'] = datetime.now().isoformat()
+            book['lastAccessed'] = timestamp
+            self.view_sampler.add_weight(book_id, 1)
+            self.genre_samplers[book['genre'].lower()].add_weight(book_id, 1)
             return book
         return None
 
+    def _apply_interactions(self, events):
+        return [self._apply_interaction(*e) for e in events]
+
+    def register_interaction(self, book_id):
+        return self.register_interactions([book_id])[0]
+
+    def register_interactions(self, events):
+        events = [as_event(e) for e in events]
+        # Primero a la bitácora (un solo write por lote) y después a memoria
+        if self.log is not None:
+            self.log_seq = self.log.append_many(events)
+
+        books = self._apply_interactions(events)
+
+        if self.log is not None and self.log.needs_compaction():
+            self.log.compact(self)
+        return books
+
 def cargar_datos(filename):
     if not os.path.exists(filename):
         return []
@@ -113,13 +184,21 @@ def mostrar_libros(lista_libros):
     input("\nPresiona Enter para continuar...")
     return True
 
-def main():
-    archivo = "biblioteca.json"
-    datos = cargar_datos(archivo)
+def cargar_sistema(archivo="biblioteca.json", snapshot="biblioteca.snap", bitacora="biblioteca.log"):
+    # Si el snapshot está al día se mapea directo; si no, se reconstruye desde el JSON
+    sistema = load_snapshot(snapshot, source=archivo)
+    if sistema is None:
+        sistema = LibrarySystem(store=BookStore())
+        for d in cargar_datos(archivo):
+            sistema.insert_book(d)
+        save_snapshot(sistema, snapshot, source=archivo)
 
-    sistema = LibrarySystem()
-    for d in datos:
-        sistema.insert_book(d)
+    # Las vistas registradas después del último snapshot se recuperan de la bitácora
+    sistema.attach_log(InteractionLog(bitacora, snapshot=snapshot, source=archivo))
+    return sistema
+
+def main():
+    sistema = cargar_sistema()
 
     while True:
         print("\n" + "="*40)
@@ -159,10 +238,14 @@ def main():
 
         elif opcion == '5':
             print("Saliendo...")
+            sistema.log.close()
             break
         
         else:
             print("Opción no válida.")
 
+# Las clases de este archivo van al snapshot como biblioteca_u1.<Clase>
+register_module(__name__, "biblioteca_u1")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
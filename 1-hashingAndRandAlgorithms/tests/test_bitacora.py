@@ -0,0 +1,142 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from comun.snapshot import load_snapshot
+from main import LibrarySystem, cargar_sistema
+
+
+def _libros(n=20):
+    return [{"_id": f"id_{i}", "title": f"Libro {i}", "author": f"Autor {i % 5}",
+             "genre": ("historia", "ciencia")[i % 2], "views": i, "lastAccessed": ""}
+            for i in range(n)]
+
+
+@pytest.fixture
+def rutas(tmp_path):
+    datos = tmp_path / "biblioteca.json"
+    datos.write_text(json.dumps(_libros()), encoding="utf-8")
+    return {"archivo": str(datos), "snapshot": str(tmp_path / "biblioteca.snap"),
+            "bitacora": str(tmp_path / "biblioteca.log")}
+
+
+def _vistas(sistema):
+    return {b["_id"]: b["views"] for b in sistema.all_books_ref}
+
+
+def _eventos(n):
+    return [(f"id_{(i * 7) % 20}", f"u{i % 3}", f"2025-01-01T00:00:{i % 60:02d}") for i in range(n)]
+
+
+def _esperado(eventos):
+    vistas = {b["_id"]: b["views"] for b in _libros()}
+    for book_id, _, _ in eventos:
+        vistas[book_id] += 1
+    return vistas
+
+
+def test_snapshot_mas_bitacora_recupera_las_vistas(rutas):
+    sistema = cargar_sistema(**rutas)
+    eventos = _eventos(50)
+    sistema.register_interactions(eventos[:30])
+    sistema.register_interactions(eventos[30:])
+    sistema.log.close()
+
+    recargado = cargar_sistema(**rutas)
+    assert _vistas(recargado) == _esperado(eventos)
+    assert recargado.log_seq == 50
+    assert all(recargado.view_sampler.weight(k) == v for k, v in _esperado(eventos).items())
+    recargado.log.close()
+
+    # Re-aplicar la misma bitácora otra vez no cuenta doble
+    otra = cargar_sistema(**rutas)
+    assert _vistas(otra) == _esperado(eventos)
+    otra.log.close()
+
+
+def test_compactar_y_reconstruir_desde_el_json_no_pierde_vistas(rutas):
+    sistema = cargar_sistema(**rutas)
+    sistema.log.compact_every = 10
+    eventos = _eventos(45)
+    for i in range(0, 45, 5):
+        sistema.register_interactions(eventos[i:i + 5])
+    sistema.log.close()
+    # Se compactó: la bitácora viva solo tiene lo último y el resto está en la base
+    assert sistema.log.base_seq == 40
+    assert os.path.getsize(rutas["bitacora"]) < 10 * 200
+
+    # Con el snapshot al día
+    recargado = cargar_sistema(**rutas)
+    assert _vistas(recargado) == _esperado(eventos)
+    recargado.log.close()
+
+    # El JSON cambia (misma data, otra fecha): el snapshot queda viejo y se
+    # reconstruye, pero las vistas compactadas siguen en la base
+    os.utime(rutas["archivo"], ns=(0, 123456789))
+    reconstruido = cargar_sistema(**rutas)
+    assert _vistas(reconstruido) == _esperado(eventos)
+    ultimo = {}
+    for book_id, _, ts in eventos:
+        ultimo[book_id] = ts
+    assert {b["_id"]: b["lastAccessed"] for b in reconstruido.all_books_ref if b["_id"] in ultimo} == ultimo
+    assert reconstruido.log_seq == 45
+    reconstruido.register_interactions(eventos[:1])
+    assert reconstruido.log_seq == 46
+    reconstruido.log.close()
+
+
+def test_compactar_muchas_veces_no_acumula_archivos(rutas, tmp_path):
+    sistema = cargar_sistema(**rutas)
+    sistema.log.compact_every = 50
+    eventos = _eventos(50)
+    tamanos = []
+    for _ in range(20):
+        sistema.register_interactions(eventos)
+        tamanos.append(sum(p.stat().st_size for p in tmp_path.glob("biblioteca*.log")))
+    sistema.log.close()
+
+    # Una bitácora viva y una base, nada más; con los mismos pares la base
+    # solo crece por los dígitos de los contadores, no con los eventos
+    assert sorted(p.name for p in tmp_path.glob("biblioteca*.log")) == ["biblioteca.base.log", "biblioteca.log"]
+    assert os.path.getsize(rutas["bitacora"]) == 0
+    assert max(tamanos) < tamanos[0] * 1.1
+    assert tamanos[0] < 50 * 80
+
+    os.utime(rutas["archivo"], ns=(0, 123456789))
+    reconstruido = cargar_sistema(**rutas)
+    assert _vistas(reconstruido) == _esperado(eventos * 20)
+    assert reconstruido.log_seq == 1000
+    reconstruido.log.close()
+
+
+def test_linea_corrupta_a_la_mitad_se_salta(rutas):
+    sistema = cargar_sistema(**rutas)
+    eventos = _eventos(10)
+    sistema.register_interactions(eventos[:5])
+    sistema.log.f.write(b"{no es json\n")
+    sistema.register_interactions(eventos[5:])
+    # y una última a medio escribir
+    sistema.log.f.write(b'{"seq":11,"id":"id_0"')
+    sistema.log.close()
+
+    with pytest.warns(RuntimeWarning, match="corrupto"):
+        recargado = cargar_sistema(**rutas)
+    assert _vistas(recargado) == _esperado(eventos)
+    recargado.log.close()
+    with open(rutas["bitacora"], "rb") as f:
+        assert f.read().endswith(b"\n")
+
+
+def test_snapshot_guardado_corriendo_main_como_script(tmp_path):
+    # `python main.py` guarda sus clases como biblioteca_u1.*, no __main__.*:
+    # el snapshot se carga igual desde otro script (server.py, los tests)
+    (tmp_path / "biblioteca.json").write_text(json.dumps(_libros()), encoding="utf-8")
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    subprocess.run([sys.executable, script], input="5\n", text=True, cwd=tmp_path,
+                   check=True, capture_output=True, timeout=60)
+    cargado = load_snapshot(str(tmp_path / "biblioteca.snap"), source=str(tmp_path / "biblioteca.json"))
+    assert isinstance(cargado, LibrarySystem)
+    assert _vistas(cargado) == {b["_id"]: b["views"] for b in _libros()}
@@ -0,0 +1,144 @@
+import random
+from collections import Counter
+
+import pytest
+
+from main import LibrarySystem
+from weighted_sampler import WeightedSampler
+
+
+def _sampler(pesos):
+    s = WeightedSampler()
+    for k, w in pesos.items():
+        s.add(k, w)
+    return s
+
+
+def test_prefijos_del_arbol_cuadran_con_los_pesos():
+    rng = random.Random(3)
+    s = WeightedSampler()
+    pesos = {}
+    for i in range(300):
+        pesos[i] = rng.randint(0, 50)
+        s.add(i, pesos[i])
+    for _ in range(500):
+        k = rng.randrange(300)
+        if k not in s:
+            continue
+        op = rng.random()
+        if op < 0.3:
+            s.remove(k)
+            del pesos[k]
+        elif op < 0.6:
+            pesos[k] = rng.randint(0, 50)
+            s.set_weight(k, pesos[k])
+        else:
+            pesos[k] += 1
+            s.add_weight(k)
+
+    assert s.total == sum(pesos.values())
+    acumulado = 0
+    for i, key in enumerate(s.keys, 1):
+        acumulado += pesos.get(key, 0) if key is not None else 0
+        assert s._prefix(i) == acumulado
+
+
+def test_frecuencias_proporcionales_al_peso():
+    pesos = {"a": 1, "b": 2, "c": 3, "d": 4, "e": 0}
+    s = _sampler(pesos)
+    s.set_weight("b", 5)
+    s.add_weight("a", 1)
+    s.remove("d")
+    esperado = {"a": 2, "b": 5, "c": 3}
+
+    rng = random.Random(4)
+    n = 60000
+    conteo = Counter(s.sample(1, rng)[0] for _ in range(n))
+    total = sum(esperado.values())
+    assert set(conteo) == set(esperado)
+    for k, w in esperado.items():
+        assert conteo[k] / n == pytest.approx(w / total, abs=0.01)
+
+
+def test_muestra_sin_reemplazo_y_restaura_el_arbol():
+    s = _sampler({i: i % 4 for i in range(40)})
+    total = s.total
+    rng = random.Random(5)
+    for k in (1, 5, 30, 40, 100):
+        m = s.sample(k, rng)
+        assert len(m) == min(k, 40) and len(set(m)) == len(m)
+        assert s.total == total
+    # Con k chico nunca salen los de peso 0 mientras quede masa
+    for _ in range(200):
+        assert all(x % 4 for x in s.sample(5, rng))
+
+
+def test_peso_negativo():
+    s = _sampler({"a": 1})
+    with pytest.raises(ValueError):
+        s.set_weight("a", -1)
+    with pytest.raises(ValueError):
+        s.add("b", -2)
+
+
+def test_borrar_compacta_los_huecos():
+    rng = random.Random(6)
+    s = _sampler({i: i + 1 for i in range(200)})
+    vivos = {i: i + 1 for i in range(200)}
+    for i in rng.sample(range(200), 180):
+        s.remove(i)
+        del vivos[i]
+        # Nunca quedan más huecos que claves vivas
+        assert len(s.keys) <= 2 * len(s) + 1
+    assert len(s.keys) < 200
+    assert s.total == sum(vivos.values())
+    acumulado = 0
+    for i, key in enumerate(s.keys, 1):
+        acumulado += vivos.get(key, 0)
+        assert s._prefix(i) == acumulado
+    s.add("nuevo", 1000)
+    conteo = Counter(s.sample(1, rng)[0] for _ in range(20000))
+    total = sum(vivos.values()) + 1000
+    assert conteo["nuevo"] / 20000 == pytest.approx(1000 / total, abs=0.015)
+
+
+def test_residuo_de_floats_no_se_cuelga():
+    s = _sampler({"a": 0.1, "b": 0.2, "c": 0.7})
+    for k in ("a", "c", "b"):
+        s.set_weight(k, 0)
+    assert s.total != 0
+    rng = random.Random(7)
+    for _ in range(100):
+        m = s.sample(2, rng)
+        assert len(set(m)) == 2 and set(m) <= {"a", "b", "c"}
+
+
+def test_sin_masa_completa_uniforme_y_respeta_exclude():
+    s = _sampler({i: 0 for i in range(100)})
+    for i in range(0, 100, 3):
+        s.remove(i)
+    rng = random.Random(8)
+    conteo = Counter()
+    for _ in range(3000):
+        m = s.sample(3, rng, exclude=[1, 2])
+        assert len(set(m)) == 3 and not set(m) & {1, 2} and all(x % 3 for x in m)
+        conteo.update(m)
+    esperado = 3000 * 3 / (len(s) - 2)
+    assert all(c == pytest.approx(esperado, rel=0.35) for c in conteo.values())
+    assert len(conteo) == len(s) - 2
+    # Pidiendo más de lo que hay salen todas las que quedan
+    assert sorted(s.sample(500, rng, exclude=[1])) == sorted(set(s.slot) - {1})
+
+
+def test_recomendaciones_completan_con_otros_generos():
+    sistema = LibrarySystem()
+    for i in range(10):
+        sistema.insert_book({"_id": f"id_{i}", "title": f"Libro {i}", "author": "Autor",
+                             "genre": "poesia" if i < 2 else "historia", "views": 1 + i})
+    for _ in range(200):
+        recs = [b["_id"] for b in sistema.recommend_books("Poesia", k=5)]
+        assert len(set(recs)) == 5
+        # Primero los dos del género pedido, el resto del catálogo
+        assert set(recs[:2]) == {"id_0", "id_1"}
+    assert len(sistema.recommend_books("no_existe", k=4)) == 4
+    assert len(sistema.recommend_books("historia", k=20)) == 10
@@ -0,0 +1,187 @@
+import random
+
+
+class WeightedSampler:
+    """
+    Muestreo ponderado sobre un árbol de Fenwick (Binary Indexed Tree).
+
+    Cada clave ocupa una posición fija y su peso (las vistas del libro) vive
+    en el árbol, así que cambiar un peso o sacar una muestra cuesta O(log n)
+    en vez de recorrer todo el catálogo. Al borrar queda un hueco; cuando
+    los huecos pasan de la mitad de las posiciones se compacta (O(n), pero
+    amortizado O(1) por borrado).
+    """
+
+    # Masa que se considera cero: con pesos float, después de apagar y
+    # prender posiciones el total puede quedar en un residuo de redondeo
+    EPS = 1e-9
+
+    def __init__(self):
+        self.keys = []
+        self.weights = []
+        self.tree = [0]
+        self.slot = {}
+        self.total = 0
+
+    def __len__(self):
+        return len(self.slot)
+
+    def __contains__(self, key):
+        return key in self.slot
+
+    def _prefix(self, i):
+        s = 0
+        tree = self.tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _add(self, i, delta):
+        tree = self.tree
+        n = len(self.keys)
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+        self.total += delta
+
+    def add(self, key, weight):
+        if key in self.slot:
+            self.set_weight(key, weight)
+            return
+        if weight < 0:
+            raise ValueError("El peso no puede ser negativo")
+
+        self.keys.append(key)
+        self.weights.append(weight)
+        i = len(self.keys)
+        self.slot[key] = i
+
+        # El nodo nuevo cubre (i - lowbit(i), i]: su valor se saca con dos prefijos
+        self.tree.append(weight + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        self.total += weight
+
+    def set_weight(self, key, weight):
+        if weight < 0:
+            raise ValueError("El peso no puede ser negativo")
+        i = self.slot[key]
+        delta = weight - self.weights[i - 1]
+        if delta:
+            self.weights[i - 1] = weight
+            self._add(i, delta)
+
+    def remove(self, key):
+        """Apaga la posición de la clave; el hueco queda con peso 0 y ya no se muestrea."""
+        i = self.slot.pop(key, None)
+        if i is None:
+            return False
+        w = self.weights[i - 1]
+        if w:
+            self.weights[i - 1] = 0
+            self._add(i, -w)
+        self.keys[i - 1] = None
+        if len(self.keys) - len(self.slot) > len(self.slot):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Saca los huecos y arma el árbol de nuevo en O(n)."""
+        vivos = [(k, w) for k, w in zip(self.keys, self.weights) if k is not None]
+        self.keys = [k for k, _ in vivos]
+        self.weights = [w for _, w in vivos]
+        self.slot = {k: i for i, k in enumerate(self.keys, 1)}
+        n = len(self.keys)
+        tree = [0] + self.weights
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.tree = tree
+        self.total = sum(self.weights)
+
+    def add_weight(self, key, delta=1):
+        self.set_weight(key, self.weights[self.slot[key] - 1] + delta)
+
+    def weight(self, key):
+        return self.weights[self.slot[key] - 1]
+
+    def _find(self, target):
+        """Primera posición cuyo prefijo acumulado supera `target`."""
+        pos = 0
+        tree = self.tree
+        n = len(self.keys)
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos + 1
+
+    def _off(self, i, removed):
+        w = self.weights[i - 1]
+        removed.append((i, w))
+        if w:
+            self.weights[i - 1] = 0
+            self._add(i, -w)
+
+    def sample(self, k, rng=random, exclude=()):
+        """
+        Saca k claves distintas, con probabilidad proporcional a su peso,
+        sin reemplazo y sin las de `exclude`. Las elegidas (y las excluidas)
+        se apagan temporalmente en el árbol y se restauran al final:
+        O((k + len(exclude)) log n).
+        Si se acaba la masa (todo con peso 0) se completa al azar uniforme.
+        """
+        n = len(self.keys)
+        removed = []
+        taken = set()
+        for key in exclude:
+            i = self.slot.get(key)
+            if i is not None and i not in taken:
+                taken.add(i)
+                self._off(i, removed)
+        k = min(k, len(self.slot) - len(taken))
+        chosen = []
+
+        eps = self.EPS * max(1, self.total)
+        misses = 0
+        while len(chosen) < k and self.total > eps and misses < 32:
+            i = self._find(rng.random() * self.total)
+            if i > n or self.weights[i - 1] == 0:
+                # Solo pasa por redondeo de floats en el borde superior
+                misses += 1
+                continue
+            self._off(i, removed)
+            taken.add(i)
+            chosen.append(i)
+
+        for i, w in reversed(removed):
+            if w:
+                self.weights[i - 1] = w
+                self._add(i, w)
+
+        if len(chosen) < k:
+            chosen.extend(self._uniform(k - len(chosen), taken, rng))
+        return [self.keys[i - 1] for i in chosen]
+
+    def _uniform(self, k, taken, rng):
+        """k posiciones vivas al azar que no estén en `taken`."""
+        n = len(self.keys)
+        libres = len(self.slot) - len(taken)
+        if 2 * k > libres or 4 * libres < n:
+            # Se llevan más de la mitad de lo que queda (recorrer todo es
+            # O(k)) o queda muy poco libre para acertar al azar
+            rest = [i for i in range(1, n + 1) if i not in taken and self.keys[i - 1] is not None]
+            return rng.sample(rest, k)
+        # Por rechazo: al menos n/4 libres y como mucho la mitad ya sacadas,
+        # así cada intento acierta con probabilidad >= 1/8
+        out = []
+        taken = set(taken)
+        while len(out) < k:
+            i = rng.randint(1, n)
+            if i not in taken and self.keys[i - 1] is not None:
+                taken.add(i)
+                out.append(i)
+        return out
@@ -2,116 +2,628 @@ import random
 import json
 import os
 import math
-from datetime import datetime
+import hashlib
+import struct
+import threading
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import deque
+import numpy as np
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun.book_store import BookStore
+from comun.hash_table import HashTable
+from comun.interaction_log import InteractionLog, as_event
+from comun.ngram_index import NgramIndex
+from comun.snapshot import load_snapshot, register_module, save_snapshot
+
+INDEXED_FIELDS = ("title", "author")
+
+#HASH ESTABLE (64 bits, igual en todos los procesos)
+def _digest64(item):
+    if not isinstance(item, bytes):
+        item = str(item).encode("utf-8")
+    return hashlib.blake2b(item, digest_size=8).digest()
+
+def hash64(item):
+    return int.from_bytes(_digest64(item), "little")
+
+def hash64_many(items):
+    """hash64 de cada item como arreglo uint64 (los digests se juntan y se leen de una vez)."""
+    return np.frombuffer(b"".join(_digest64(item) for item in items), dtype="<u8")
 
 #BLOOM FILTER
 class BloomFilter:
-    def __init__(self, size=5000, hash_count=3):
+    """
+    Bits empaquetados en un bytearray. Las k posiciones salen de un solo
+    hash de 64 bits con doble hashing (Kirsch-Mitzenmacher):
+    g_i(x) = h1(x) + i * h2(x) mod m.
+    Los métodos *_many, la unión y la intersección trabajan sobre el mismo
+    bytearray visto como arreglo de NumPy: un hash por item y el resto
+    vectorizado para todo el lote.
+    Si no se da `size`/`hash_count` se calculan a partir de los elementos
+    esperados y la tasa de falsos positivos deseada.
+    """
+
+    HEADER = struct.Struct("<4sQIQ")
+    MAGIC = b"BLM1"
+
+    def __init__(self, size=None, hash_count=None, expected_items=100000, fp_rate=0.01):
+        if size is None:
+            size = math.ceil(-expected_items * math.log(fp_rate) / (math.log(2) ** 2))
+        if hash_count is None:
+            hash_count = max(1, round(size / expected_items * math.log(2)))
         self.size = size
         self.hash_count = hash_count
-        self.bit_array = [0] * size
+        self.bit_array = bytearray((size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def _hashes(self, item):
-        """Genera múltiples hash para un item"""
-        results = []
-        random.seed(hash(item))
-        for _ in range(self.hash_count):
-            results.append(random.randint(0, self.size - 1))
-        return results
+        """Genera las k posiciones del item a partir de un solo hash"""
+        x = hash64(item)
+        h1 = x & 0xFFFFFFFF
+        h2 = (x >> 32) | 1
+        m = self.size
+        return [(h1 + i * h2) % m for i in range(self.hash_count)]
+
+    def _positions(self, items):
+        """Las mismas posiciones que _hashes, como arreglo (items, k)."""
+        x = hash64_many(items)
+        h1 = x & 0xFFFFFFFF
+        h2 = (x >> 32) | 1
+        i = np.arange(self.hash_count, dtype=np.uint64)
+        return (h1[:, None] + i * h2[:, None]) % np.uint64(self.size)
+
+    def _bits(self):
+        # Vista sin copia: escribir en ella escribe en el bytearray
+        return np.frombuffer(self.bit_array, dtype=np.uint8)
 
     def add(self, item):
-        for h in self._hashes(item):
-            self.bit_array[h] = 1
+        with self._lock:
+            bits = self.bit_array
+            for h in self._hashes(item):
+                bits[h >> 3] |= 1 << (h & 7)
+            self.count += 1
+
+    def add_many(self, items):
+        positions = self._positions(items)
+        if not len(positions):
+            return
+        flat = positions.ravel()
+        masks = np.left_shift(1, flat & 7).astype(np.uint8)
+        with self._lock:
+            np.bitwise_or.at(self._bits(), flat >> 3, masks)
+            self.count += len(positions)
 
     def contains(self, item):
-        return all(self.bit_array[h] == 1 for h in self._hashes(item))
+        bits = self.bit_array
+        return all(bits[h >> 3] >> (h & 7) & 1 for h in self._hashes(item))
+
+    __contains__ = contains
+
+    def contains_many(self, items):
+        positions = self._positions(items)
+        hits = (self._bits()[positions >> 3] >> (positions & 7)) & 1
+        return hits.all(axis=1).tolist()
+
+    def _check_compatible(self, other):
+        if self.size != other.size or self.hash_count != other.hash_count:
+            raise ValueError("Los Bloom filters deben tener el mismo tamaño y número de hashes")
+
+    def union(self, other):
+        self._check_compatible(other)
+        res = BloomFilter(self.size, self.hash_count)
+        res.bit_array = bytearray(np.bitwise_or(self._bits(), other._bits()))
+        res.count = self.count + other.count
+        return res
 
-#HYPERLOGLOG (CONTEO APROXIMADO)
+    def intersection(self, other):
+        self._check_compatible(other)
+        res = BloomFilter(self.size, self.hash_count)
+        res.bit_array = bytearray(np.bitwise_and(self._bits(), other._bits()))
+        res.count = min(self.count, other.count)
+        return res
+
+    __or__ = union
+    __and__ = intersection
+
+    def fp_rate(self):
+        """Tasa de falsos positivos estimada según la fracción de bits prendidos."""
+        ones = int(np.unpackbits(self._bits()).sum())
+        return (ones / self.size) ** self.hash_count
+
+    def to_bytes(self):
+        return self.HEADER.pack(self.MAGIC, self.size, self.hash_count, self.count) + bytes(self.bit_array)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < cls.HEADER.size:
+            raise ValueError("No es un Bloom filter serializado")
+        magic, size, hash_count, count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("No es un Bloom filter serializado")
+        if size < 1 or hash_count < 1:
+            raise ValueError(f"Bloom filter inválido: m={size}, k={hash_count}")
+        esperado = cls.HEADER.size + (size + 7) // 8
+        if len(data) != esperado:
+            raise ValueError(f"Bloom filter truncado o con basura: {len(data)} bytes, "
+                             f"se esperaban {esperado} para m={size}")
+        bf = cls(size, hash_count)
+        bf.bit_array = bytearray(data[cls.HEADER.size:])
+        bf.count = count
+        return bf
+
+#HYPERLOGLOG++ (CONTEO APROXIMADO)
 class HyperLogLog:
-    def __init__(self, b=4):
+    """
+    HyperLogLog++ con hash estable de 64 bits y 2^b registros de un byte.
+
+    - Con pocos elementos usa una representación dispersa con precisión
+      2^25, casi exacta: un array('I') ordenado de (índice << 6) | rho, 4
+      bytes por entrada, más un buffer chico sin ordenar que se junta de a
+      tandas. Pasa a la densa antes de ocupar más que ella (m bytes).
+    - El estimador es el "mejorado" de Ertl (2017), que corrige el sesgo en
+      todo el rango sin las tablas empíricas del paper de HLL++.
+    - Error estándar ~ 1.04 / sqrt(2^b): b=14 da ~0.8% con 16 KB.
+    """
+
+    SPARSE_P = 25
+
+    def __init__(self, b=14):
+        if not 4 <= b <= 18:
+            raise ValueError("b debe estar entre 4 y 18")
         self.b = b
         self.m = 1 << b
-        self.registers = [0] * self.m
-
-    def _hash(self, value):
-        return hash(value)
+        self.q = 64 - b
+        self.registers = None
+        self.sparse = array('I')
+        self._buffer = array('I')
+        self._buffer_limit = max(1, self.m // 64)
+        self.sparse_limit = self.m // 4 - self._buffer_limit
+
+    @staticmethod
+    def _hash(value):
+        return hash64(value)
+
+    def _add_hash(self, x):
+        if self.registers is None:
+            sp = self.SPARSE_P
+            j = x >> (64 - sp)
+            w = x & ((1 << (64 - sp)) - 1)
+            rho = (64 - sp) - w.bit_length() + 1
+            code = (j << 6) | rho
+            # Si ya está con un rho igual o mayor no hace falta ni el buffer
+            sparse = self.sparse
+            i = bisect_left(sparse, j << 6)
+            if i < len(sparse) and sparse[i] >> 6 == j and sparse[i] >= code:
+                return
+            self._buffer.append(code)
+            if len(self._buffer) >= self._buffer_limit:
+                self._flush()
+            return
+
+        j = x >> self.q
+        w = x & ((1 << self.q) - 1)
+        rho = self.q - w.bit_length() + 1
+        if rho > self.registers[j]:
+            self.registers[j] = rho
+
+    def _flush(self, extra=()):
+        """Junta el buffer (y `extra`) con la lista dispersa; por índice queda el rho mayor."""
+        merged = array('I')
+        last = -1
+        # Ordenar los códigos ordena por índice y, dentro de cada índice, por rho
+        for code in sorted({*self.sparse, *self._buffer, *extra}):
+            j = code >> 6
+            if j == last:
+                merged[-1] = code
+            else:
+                merged.append(code)
+                last = j
+        self.sparse = merged
+        self._buffer = array('I')
+        if len(merged) > self.sparse_limit:
+            self._to_dense()
+
+    def nbytes(self):
+        """Bytes de los datos (registros o lista dispersa + buffer)."""
+        if self.registers is not None:
+            return len(self.registers)
+        return self.sparse.itemsize * (len(self.sparse) + len(self._buffer))
+
+    def _to_dense(self):
+        if self._buffer:
+            self.sparse.extend(self._buffer)
+            self._buffer = array('I')
+        regs = bytearray(self.m)
+        shift = self.SPARSE_P - self.b
+        low_mask = (1 << shift) - 1
+        for code in self.sparse:
+            j, rho = code >> 6, code & 63
+            idx = j >> shift
+            low = j & low_mask
+            # Los bits que sobran del índice disperso son el inicio de w en la densa
+            r = shift - low.bit_length() + 1 if low else shift + rho
+            if r > regs[idx]:
+                regs[idx] = r
+        self.registers = regs
+        self.sparse = array('I')
 
     def add(self, value):
-        x = self._hash(value)
-        j = x & (self.m - 1)
-        w = x >> self.b
-
-        rho = 1
-        while w & 1 == 0 and rho <= 32:
-            rho += 1
-            w >>= 1
-
-        self.registers[j] = max(self.registers[j], rho)
+        self._add_hash(self._hash(value))
+
+    def add_many(self, values):
+        add = self._add_hash
+        for v in values:
+            add(hash64(v))
+
+    def merge(self, other):
+        """Une otro HLL con la misma precisión (máximo registro a registro)."""
+        if self.b != other.b:
+            raise ValueError("Solo se pueden unir HyperLogLog con la misma precisión")
+        if self.registers is None and other.registers is None:
+            self._flush(extra=(*other.sparse, *other._buffer))
+            return self
+
+        if self.registers is None:
+            self._to_dense()
+        if other.registers is None:
+            other = HyperLogLog(other.b).merge(other)
+            other._to_dense()
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    @staticmethod
+    def _sigma(x):
+        if x == 1.0:
+            return math.inf
+        y, z = 1.0, x
+        while True:
+            x *= x
+            z_old = z
+            z += x * y
+            y += y
+            if z == z_old:
+                return z
+
+    @staticmethod
+    def _tau(x):
+        if x == 0.0 or x == 1.0:
+            return 0.0
+        y, z = 1.0, 1.0 - x
+        while True:
+            x = math.sqrt(x)
+            z_old = z
+            y *= 0.5
+            z -= (1 - x) ** 2 * y
+            if z == z_old:
+                return z / 3
 
     def count(self):
-        Z = 1.0 / sum([2 ** -r for r in self.registers])
-        E = self.m ** 2 * Z * 0.7213 / (1 + 1.079 / self.m)
-        return int(E)
-    
+        if self.registers is None:
+            # Conteo lineal sobre los 2^25 registros dispersos: casi exacto
+            self._flush()
+            if self.registers is None:
+                mp = 1 << self.SPARSE_P
+                return int(round(mp * math.log(mp / (mp - len(self.sparse)))))
+
+        m, q = self.m, self.q
+        hist = [0] * (q + 2)
+        for r in self.registers:
+            hist[r] += 1
+
+        z = m * self._tau(1 - hist[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + hist[k])
+        z += m * self._sigma(hist[0] / m)
+        return int(round(m * m / (2 * math.log(2) * z)))
+
 #DGIM ALGORITHM  
 class DGIM:
-    def __init__(self, window_size=50):
+    """
+    Cuenta aproximada de 1s en los últimos `window_size` eventos.
+
+    Hay un reloj global y una cola por tamaño de bucket (1, 2, 4, ...), cada
+    una con las marcas de tiempo de sus buckets (el más nuevo a la derecha).
+    Cuando un tamaño junta más de `r` buckets, los dos más viejos se unen y
+    suben al siguiente tamaño. Vencer buckets solo mira el más viejo de todos,
+    así que cada evento cuesta O(1) amortizado (los 0 solo mueven el reloj).
+
+    Error relativo: el bucket más viejo se cuenta a medias y debajo de él
+    siempre quedan al menos r-1 buckets de cada tamaño menor, así que el
+    peor caso es 1/r (con buckets grandes tiende a 1/(2(r-1))). No es un
+    error típico chico: con r=2 y ventanas de 10000 eventos se mide hasta
+    ~48%, con r=3 ~25% y con r=8 ~11%. Para más precisión se sube r (la
+    memoria crece como r * log(ventana)).
+    """
+
+    def __init__(self, window_size=50, r=2):
+        if r < 2:
+            raise ValueError("r debe ser >= 2")
         self.window = window_size
-        self.buckets = []
+        self.r = r
+        self.t = 0
+        self.levels = []
+
+    def _expire(self):
+        limit = self.t - self.window
+        levels = self.levels
+        while levels:
+            top = levels[-1]
+            while top and top[0] <= limit:
+                top.popleft()
+            if top:
+                return
+            levels.pop()
+
+    def _add_one(self):
+        levels = self.levels
+        ts = self.t
+        i = 0
+        while True:
+            if i == len(levels):
+                levels.append(deque())
+            level = levels[i]
+            level.append(ts)
+            if len(level) <= self.r:
+                return
+            # El más nuevo de los dos más viejos queda como marca del bucket unido
+            level.popleft()
+            ts = level.popleft()
+            i += 1
 
     def add_event(self, bit):
-        """Añade evento (1 = acceso de libro)"""
+        """Añade evento (1 = acceso a un libro del catálogo, 0 = id desconocido)"""
+        self.t += 1
         if bit == 1:
-            self.buckets.insert(0, [1, 1])
-            self._merge_buckets()
-
-        for b in self.buckets:
-            b[1] += 1
-
-        self.buckets = [b for b in self.buckets if b[1] <= self.window]
-
-    def _merge_buckets(self):
-        i = 0
-        while i < len(self.buckets) - 2:
-            if (self.buckets[i][0] == self.buckets[i+1][0] == self.buckets[i+2][0]):
-                self.buckets[i+2][0] *= 2
-                del self.buckets[i]
-            else:
-                i += 1
-
-    def count_events(self):
+            self._add_one()
+        if self.levels and self.levels[-1][0] <= self.t - self.window:
+            self._expire()
+
+    def add_events(self, bits):
+        for bit in bits:
+            self.t += 1
+            if bit == 1:
+                self._add_one()
+        self._expire()
+
+    def count_events(self, k=None):
+        """Estimado de 1s en los últimos k eventos (k <= window, por defecto toda la ventana)."""
+        if k is None or k > self.window:
+            k = self.window
+        limit = self.t - k
         total = 0
-        if not self.buckets:
-            return 0
-
-        for size, timestamp in self.buckets[:-1]:
-            total += size
-
-        last_size, _ = self.buckets[-1]
-        total += last_size // 2
-
-        return total
+        oldest = 0
+        for i, level in enumerate(self.levels):
+            size = 1 << i
+            for ts in reversed(level):
+                if ts <= limit:
+                    break
+                total += size
+                oldest = size
+        # Del bucket más viejo dentro de la ventana solo se cuenta la mitad
+        return total - oldest // 2
+
+#DECAIMIENTO EXPONENCIAL (compartido por CMS y Space-Saving)
+class _Decay:
+    """
+    Decaimiento exponencial perezoso: en vez de multiplicar todos los
+    contadores en cada tick, cada incremento se pesa por g = 2^(t/half_life)
+    y al leer se divide por el g actual. Cuando g crece demasiado se
+    renormaliza una vez (O(contadores)).
+    """
+
+    MAX_SCALE = 1e150
+
+    def __init__(self, half_life=None):
+        self.half_life = half_life
+        self.t = 0
+        self.g = 1.0
+
+    def tick(self):
+        """Avanza el reloj un evento y devuelve el peso del incremento."""
+        if self.half_life is None:
+            return 1
+        self.t += 1
+        self.g = 2.0 ** (self.t / self.half_life)
+        return self.g
+
+    def needs_rescale(self):
+        return self.g > self.MAX_SCALE
+
+    def rescale(self):
+        factor = 1.0 / self.g
+        self.t = 0
+        self.g = 1.0
+        return factor
+
+#COUNT-MIN SKETCH
+class CountMinSketch:
+    """
+    Frecuencias aproximadas en memoria fija: depth filas de width contadores.
+    Sobreestima como máximo epsilon * total con probabilidad 1 - delta.
+    Con `conservative=True` solo sube los contadores que están en el mínimo
+    (mucho menos sobreconteo). `half_life` (en eventos) activa decaimiento.
+    """
+
+    def __init__(self, width=None, depth=None, epsilon=0.001, delta=0.01,
+                 conservative=False, half_life=None):
+        self.width = width or math.ceil(math.e / epsilon)
+        self.depth = depth or math.ceil(math.log(1 / delta))
+        self.conservative = conservative
+        self.decay = _Decay(half_life)
+        typecode = "q" if half_life is None else "d"
+        self.table = [array(typecode, bytes(8 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+
+    def _cols(self, item):
+        x = hash64(item)
+        h1 = x & 0xFFFFFFFF
+        h2 = (x >> 32) | 1
+        w = self.width
+        return [(h1 + i * h2) % w for i in range(self.depth)]
+
+    def add(self, item, count=1):
+        c = count * self.decay.tick()
+        cols = self._cols(item)
+        table = self.table
+        if self.conservative:
+            target = min(table[i][j] for i, j in enumerate(cols)) + c
+            for i, j in enumerate(cols):
+                if table[i][j] < target:
+                    table[i][j] = target
+        else:
+            for i, j in enumerate(cols):
+                table[i][j] += c
+        self.total += c
+
+        if self.decay.needs_rescale():
+            factor = self.decay.rescale()
+            for row in self.table:
+                for j in range(self.width):
+                    row[j] *= factor
+            self.total *= factor
+
+    def estimate(self, item):
+        raw = min(self.table[i][j] for i, j in enumerate(self._cols(item)))
+        return raw / self.decay.g if self.decay.half_life else raw
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Los Count-Min Sketch deben tener las mismas dimensiones")
+        for row, other_row in zip(self.table, other.table):
+            for j in range(self.width):
+                row[j] += other_row[j]
+        self.total += other.total
+        return self
+
+#SPACE-SAVING (HEAVY HITTERS)
+class SpaceSaving:
+    """
+    Top-k aproximado con `capacity` contadores (Metwally et al.). Si llega un
+    elemento nuevo y no hay espacio, reemplaza al de menor cuenta y hereda esa
+    cuenta como error. Un heap perezoso encuentra el mínimo en O(log k).
+
+    `top(n)` ordena los `capacity` contadores, O(capacity log n): el
+    resultado queda en caché hasta el siguiente `add`, así que leer el
+    ranking varias veces entre lotes cuesta lo mismo que leerlo una vez.
+    """
+
+    def __init__(self, capacity=100, half_life=None):
+        self.capacity = capacity
+        self.decay = _Decay(half_life)
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+        self._top_cache = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_top_cache"] = None
+        return state
+
+    def __setstate__(self, state):
+        # Los snapshots de antes de la caché no traen el campo
+        self.__dict__.update(state)
+        self._top_cache = None
+
+    def add(self, item, count=1):
+        self._top_cache = None
+        c = count * self.decay.tick()
+        counts = self.counts
+        if item in counts:
+            counts[item] += c
+        elif len(counts) < self.capacity:
+            counts[item] = c
+            self.errors[item] = 0
+        else:
+            # Saco del heap las entradas viejas hasta dar con el mínimo real
+            while True:
+                cnt, victim = heapq.heappop(self._heap)
+                if counts.get(victim) == cnt:
+                    break
+            del counts[victim]
+            del self.errors[victim]
+            counts[item] = cnt + c
+            self.errors[item] = cnt
+        heapq.heappush(self._heap, (counts[item], item))
+
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(v, k) for k, v in counts.items()]
+            heapq.heapify(self._heap)
+        if self.decay.needs_rescale():
+            factor = self.decay.rescale()
+            self.counts = {k: v * factor for k, v in counts.items()}
+            self.errors = {k: v * factor for k, v in self.errors.items()}
+            self._heap = [(v, k) for k, v in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, n=10):
+        """Los n más frecuentes como (item, cuenta, error máximo)."""
+        cache = self._top_cache
+        if cache is None or (cache[0] < n and len(cache[1]) == cache[0]):
+            # Se guarda el pedido más largo: los más cortos son un prefijo
+            g = self.decay.g if self.decay.half_life else 1
+            best = heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])
+            cache = self._top_cache = (n, [(k, v / g, self.errors[k] / g) for k, v in best])
+        return cache[1][:n]
 
 class LibrarySystemU2:
-    def __init__(self, size=1000):
+    def __init__(self, size=1000, ngram_size=3, max_load=0.7, store=None,
+                 bloom_capacity=1000000, bloom_fp_rate=0.01, hll_precision=14,
+                 dgim_window=100000, dgim_r=2, trend_capacity=100, trend_half_life=None):
         self.size = size
-        self.table = [[] for _ in range(size)]
+        self.store = store
+        self.table = HashTable(size, max_load)
         
         self.genre_index = {}
         self.all_books_ref = []
+        self.text_index = {f: NgramIndex(ngram_size) for f in INDEXED_FIELDS}
 
-        self.recent_access_bloom = BloomFilter()
-        self.user_counter_hll = HyperLogLog()
-        self.access_stream_dgim = DGIM()
+        self.recent_access_bloom = BloomFilter(expected_items=bloom_capacity, fp_rate=bloom_fp_rate)
+        self.user_counter_hll = HyperLogLog(hll_precision)
+        self.access_stream_dgim = DGIM(dgim_window, dgim_r)
 
         self.genre_frequency = {}
 
-    def _hash_function(self, key):
-        return hash(key) % self.size
+        # Popularidad en streaming: frecuencias aproximadas + heavy hitters
+        self.book_cms = CountMinSketch(conservative=True, half_life=trend_half_life)
+        self.genre_cms = CountMinSketch(width=256, depth=4, conservative=True, half_life=trend_half_life)
+        self.book_trending = SpaceSaving(trend_capacity, half_life=trend_half_life)
+        self.genre_trending = SpaceSaving(trend_capacity, half_life=trend_half_life)
+
+        self.log = None
+        self.log_seq = 0
+
+    def __getstate__(self):
+        # La bitácora es un archivo abierto: no va dentro del snapshot
+        state = self.__dict__.copy()
+        state["log"] = None
+        return state
+
+    def attach_log(self, log):
+        applied = log.replay(self)
+        self.log = log
+        return applied
 
     def insert_book(self, book):
-        index = self._hash_function(book['_id'])
-        self.table[index].append(book)
+        # El _id es llave primaria: si ya existe, se actualiza el libro guardado
+        if book["_id"] in self.table:
+            return self.update_book(book["_id"], book)
+
+        if self.store is not None:
+            book = self.store.append(book)
+        self.table.put(book["_id"], book)
 
         genre = book['genre'].lower()
         if genre not in self.genre_index:
@@ -121,7 +633,38 @@ class LibrarySystemU2:
         self.genre_index[genre].append(book)
         self.all_books_ref.append(book)
 
+        for field, index in self.text_index.items():
+            index.add(book["_id"], book[field])
+        return book
+
+    def update_book(self, book_id, changes):
+        book = self.search_by_id(book_id)
+        if not book:
+            return None
+        if changes.get("_id", book_id) != book_id:
+            raise ValueError("No se puede cambiar el _id de un libro")
+
+        old_genre = book["genre"].lower()
+        book.update(changes)
+
+        new_genre = book["genre"].lower()
+        if new_genre != old_genre:
+            self.genre_index[old_genre].remove(book)
+            if new_genre not in self.genre_index:
+                self.genre_index[new_genre] = []
+                self.genre_frequency[new_genre] = 0
+            self.genre_index[new_genre].append(book)
+
+        for field, index in self.text_index.items():
+            if field in changes:
+                index.update(book_id, book[field])
+        return book
+
     def search_flexible(self, query, field):
+        index = self.text_index.get(field)
+        if index is not None:
+            return [self.search_by_id(book_id) for book_id in index.search(query)]
+
         res = []
         for b in self.all_books_ref:
             if query.lower() in b[field].lower():
@@ -131,27 +674,81 @@ class LibrarySystemU2:
     def get_books_by_genre(self, genre):
         return self.genre_index.get(genre.lower(), [])
 
+    def _apply_interaction(self, book_id, user_id, timestamp):
+        return self._apply_interactions([(book_id, user_id, timestamp)])[0]
+
+    def _apply_interactions(self, events):
+        books = []
+        found = []
+        for book_id, user_id, timestamp in events:
+            book = self.search_by_id(book_id)
+            books.append(book)
+            if not book:
+                continue
+
+            book["views"] += 1
+            book["lastAccessed"] = timestamp
+
+            self.user_counter_hll.add(user_id)
+            # genre_frequency va por género en minúsculas, como genre_index
+            genre = book["genre"].lower()
+            self.genre_frequency[genre] += 1
+
+            self.book_cms.add(book_id)
+            self.genre_cms.add(genre)
+            self.book_trending.add(book_id)
+            self.genre_trending.add(genre)
+            found.append(book_id)
+
+        # El Bloom y el DGIM van por lote: los hashes y los bits de todo el
+        # lote de una vez, y una sola pasada de vencimiento de buckets.
+        # DGIM ve un bit por evento: 1 si el libro existe, 0 si el id no
+        self.recent_access_bloom.add_many(found)
+        self.access_stream_dgim.add_events([1 if book else 0 for book in books])
+        return books
+
+    def trending_books(self, n=5):
+        """Los n libros más accedidos según Space-Saving, con su cuenta estimada."""
+        res = []
+        for book_id, count, _ in self.book_trending.top(n):
+            book = self.search_by_id(book_id)
+            if book:
+                res.append((book, count))
+        return res
+
+    def trending_genres(self, n=5):
+        return [(g, c) for g, c, _ in self.genre_trending.top(n)]
+
     def register_interaction(self, book_id, user_id="anon"):
-        book = self.search_by_id(book_id)
-        if not book:
-            return None
+        return self.register_interactions([(book_id, user_id)])[0]
 
-        book["views"] += 1
-        book["lastAccessed"] = datetime.now().isoformat()
+    def register_interactions(self, events):
+        events = [as_event(e) for e in events]
+        # Primero a la bitácora (un solo write por lote) y después a memoria
+        if self.log is not None:
+            self.log_seq = self.log.append_many(events)
 
-        self.recent_access_bloom.add(book_id)
-        self.user_counter_hll.add(user_id)
-        self.genre_frequency[book["genre"]] += 1
-        self.access_stream_dgim.add_event(1)
+        books = self._apply_interactions(events)
 
+        if self.log is not None and self.log.needs_compaction():
+            self.log.compact(self)
+        return books
+
+    def delete_book(self, book_id):
+        book = self.table.delete(book_id)
+        if not book:
+            return None
+
+        self.genre_index[book["genre"].lower()].remove(book)
+        self.all_books_ref.remove(book)
+        for index in self.text_index.values():
+            index.remove(book_id)
+        if self.store is not None:
+            self.store.remove(book)
         return book
 
     def search_by_id(self, book_id):
-        index = self._hash_function(book_id)
-        for b in self.table[index]:
-            if b["_id"] == book_id:
-                return b
-        return None
+        return self.table.get(book_id)
 
     def recommend_books(self, genre_preference=None, pattern="frequent"):
         pool = self.get_books_by_genre(genre_preference) if genre_preference else self.all_books_ref
@@ -178,13 +775,21 @@ def mostrar_libros(lista):
         print(f"{b['_id']} | {b['views']} | {b['genre']} | {b['title']} por {b['author']}")
     input("\nPresiona Enter...")
 
-def main():
-    archivo = "biblioteca2.json"
-    datos = cargar_datos(archivo)
+def cargar_sistema(archivo="biblioteca2.json", snapshot="biblioteca2.snap", bitacora="biblioteca2.log"):
+    # Si el snapshot está al día se mapea directo; si no, se reconstruye desde el JSON
+    sistema = load_snapshot(snapshot, source=archivo)
+    if sistema is None:
+        sistema = LibrarySystemU2(store=BookStore())
+        for d in cargar_datos(archivo):
+            sistema.insert_book(d)
+        save_snapshot(sistema, snapshot, source=archivo)
+
+    # Las vistas registradas después del último snapshot se recuperan de la bitácora
+    sistema.attach_log(InteractionLog(bitacora, snapshot=snapshot, source=archivo))
+    return sistema
 
-    sistema = LibrarySystemU2()
-    for d in datos:
-        sistema.insert_book(d)
+def main():
+    sistema = cargar_sistema()
 
     while True:
         print("\n===== MOTOR DE BÚSQUEDA DE BIBLIOTECA DIGITAL =====")
@@ -195,7 +800,8 @@ def main():
         print("5. Revisar si libro fue accedido (Bloom Filter)")
         print("6. Ver usuarios únicos (HyperLogLog)")
         print("7. Accesos recientes (DGIM)")
-        print("8. Salir")
+        print("8. Tendencias (Count-Min + Space-Saving)")
+        print("9. Salir")
 
         op = input("\nOpción: ")
 
@@ -225,15 +831,27 @@ def main():
             print("Usuarios únicos aproximados:", sistema.user_counter_hll.count())
 
         elif op == "7":
-            print("Accesos recientes estimados:", sistema.access_stream_dgim.count_events())
+            for k in (1000, 10000, 100000):
+                print(f"Accesos a libros existentes en los últimos {k} eventos:",
+                      sistema.access_stream_dgim.count_events(k))
 
         elif op == "8":
+            print("Géneros en tendencia:")
+            for g, c in sistema.trending_genres():
+                print(f"- {g}: ~{c:.0f} accesos")
+            mostrar_libros([b for b, _ in sistema.trending_books()])
+
+        elif op == "9":
             print("Saliendo...")
+            sistema.log.close()
             break
 
         else:
             print("Opción no válida.")
 
 
+# Las clases de este archivo van al snapshot como biblioteca_u2.<Clase>
+register_module(__name__, "biblioteca_u2")
+
 if __name__ == "__main__":
     main()
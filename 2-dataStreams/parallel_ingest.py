@@ -0,0 +1,247 @@
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import Counter
+
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun.interaction_log import as_event
+from main import BloomFilter, CountMinSketch, HyperLogLog, SpaceSaving, cargar_sistema
+
+# Ingesta en paralelo para LibrarySystemU2.
+# El coordinador no toca los eventos uno por uno: corta la entrada en bloques
+# crudos y los reparte en turno entre los procesos. Cada proceso normaliza
+# sus eventos (as_event), tiene sus propios sketches y de vez en cuando el
+# coordinador le pide su "delta" y lo une a la vista global del sistema:
+#   Bloom -> OR de bits, HLL -> máximo por registro, CMS / conteos -> suma.
+# Un libro puede aparecer en varios procesos: los top-k de Space-Saving se
+# juntan sumando cuentas con add(llave, cuenta), que mantiene la garantía
+# de Space-Saving (sobreestima como mucho N / capacidad).
+
+
+class _Shard:
+    """Estado de un proceso trabajador (se reinicia después de cada entrega)."""
+
+    def __init__(self, config, genres):
+        self.config = config
+        self.genres = genres
+        self.reset()
+
+    def reset(self):
+        c = self.config
+        self.bloom = BloomFilter(c["bloom_size"], c["bloom_hashes"])
+        self.hll = HyperLogLog(c["hll_b"])
+        self.book_cms = CountMinSketch(c["cms_width"], c["cms_depth"], conservative=c["conservative"])
+        self.genre_cms = CountMinSketch(c["genre_cms_width"], c["genre_cms_depth"],
+                                        conservative=c["conservative"])
+        self.book_top = SpaceSaving(c["top_capacity"])
+        self.genre_counts = Counter()
+        self.views = Counter()
+        self.last_ts = {}
+        self.bits = []
+
+    def ingest(self, events):
+        found = []
+        bits = bytearray(len(events))
+        for i, e in enumerate(events):
+            book_id, user_id, ts = as_event(e)
+            genre = self.genres.get(book_id)
+            if genre is None:
+                continue
+            bits[i] = 1
+            found.append(book_id)
+            self.hll.add(user_id)
+            self.book_cms.add(book_id)
+            self.genre_cms.add(genre.lower())
+            self.book_top.add(book_id)
+            self.genre_counts[genre] += 1
+            self.views[book_id] += 1
+            if ts > self.last_ts.get(book_id, ""):
+                self.last_ts[book_id] = ts
+        self.bloom.add_many(found)
+        self.bits.append(bytes(bits))
+
+    def export(self):
+        return {
+            "bloom": self.bloom, "hll": self.hll, "book_cms": self.book_cms,
+            "genre_cms": self.genre_cms, "book_top": self.book_top.top(self.book_top.capacity),
+            "genre_counts": self.genre_counts, "views": self.views,
+            "last_ts": self.last_ts, "bits": self.bits,
+        }
+
+
+def _worker(shard_id, inbox, outbox, config, genres):
+    shard = _Shard(config, genres)
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            break
+        kind, payload = msg
+        if kind == "events":
+            shard.ingest(payload)
+        elif kind == "flush":
+            outbox.put((shard_id, shard.export()))
+            shard.reset()
+
+
+class ParallelIngestor:
+    """
+    Coordinador: reparte bloques crudos de `chunk_size` eventos en turno
+    entre los shards y une los deltas cada `merge_every` bloques (o al
+    llamar `merge()`).
+    La vista global es el propio sistema: sus sketches, vistas y conteos.
+
+    No pasa por la bitácora: está pensado para re-procesar una bitácora o un
+    log de eventos que ya es durable por sí mismo.
+    """
+
+    def __init__(self, sistema, workers=None, chunk_size=5000, merge_every=50):
+        if sistema.book_cms.decay.half_life is not None:
+            raise ValueError("La ingesta en paralelo no soporta sketches con decaimiento")
+        self.sistema = sistema
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.merge_every = merge_every
+        self.procs = []
+        self.inboxes = []
+        self.outbox = None
+        self.turn = 0
+        self.merge_turn = 0
+        self.chunks_sent = 0
+        self.merges = 0
+
+    def _config(self):
+        s = self.sistema
+        return {
+            "bloom_size": s.recent_access_bloom.size,
+            "bloom_hashes": s.recent_access_bloom.hash_count,
+            "hll_b": s.user_counter_hll.b,
+            "cms_width": s.book_cms.width, "cms_depth": s.book_cms.depth,
+            "genre_cms_width": s.genre_cms.width, "genre_cms_depth": s.genre_cms.depth,
+            "conservative": s.book_cms.conservative,
+            "top_capacity": s.book_trending.capacity,
+        }
+
+    def start(self):
+        ctx = mp.get_context()
+        genres = {b["_id"]: b["genre"] for b in self.sistema.all_books_ref}
+        config = self._config()
+        self.outbox = ctx.Queue()
+        for i in range(self.workers):
+            inbox = ctx.Queue(maxsize=8)
+            proc = ctx.Process(target=_worker, args=(i, inbox, self.outbox, config, genres), daemon=True)
+            proc.start()
+            self.procs.append(proc)
+            self.inboxes.append(inbox)
+        return self
+
+    def ingest(self, events):
+        # Los eventos van tal cual: normalizarlos es trabajo de los shards
+        it = iter(events)
+        while True:
+            chunk = list(itertools.islice(it, self.chunk_size))
+            if not chunk:
+                break
+            self._send(chunk)
+
+    def _send(self, chunk):
+        # La cola tiene tamaño máximo: si un shard va atrasado, el coordinador espera
+        self.inboxes[self.turn].put(("events", chunk))
+        self.turn = (self.turn + 1) % self.workers
+        self.chunks_sent += 1
+        if self.chunks_sent % self.merge_every == 0:
+            self.merge()
+
+    def merge(self):
+        """Pide el delta de cada shard y lo une a la vista global del sistema."""
+        for inbox in self.inboxes:
+            inbox.put(("flush", None))
+
+        s = self.sistema
+        last_ts = {}
+        bits = {}
+        for _ in range(self.workers):
+            shard_id, part = self.outbox.get()
+            bits[shard_id] = part["bits"]
+            s.recent_access_bloom = s.recent_access_bloom.union(part["bloom"])
+            s.user_counter_hll.merge(part["hll"])
+            s.book_cms.merge(part["book_cms"])
+            s.genre_cms.merge(part["genre_cms"])
+            for book_id, count, _ in part["book_top"]:
+                s.book_trending.add(book_id, count)
+            for genre, count in part["genre_counts"].items():
+                genre = genre.lower()
+                s.genre_trending.add(genre, count)
+                s.genre_frequency[genre] = s.genre_frequency.get(genre, 0) + count
+            for book_id, count in part["views"].items():
+                s.search_by_id(book_id)["views"] += count
+            for book_id, ts in part["last_ts"].items():
+                if ts > last_ts.get(book_id, ""):
+                    last_ts[book_id] = ts
+        # El mismo libro puede venir de varios shards: gana el acceso más reciente
+        for book_id, ts in last_ts.items():
+            s.search_by_id(book_id)["lastAccessed"] = ts
+        # DGIM sí depende del orden: los bloques se re-arman en el orden en
+        # que se repartieron, en turno desde el primero después del último merge
+        for i in itertools.count():
+            shard_bits = bits[(self.merge_turn + i) % self.workers]
+            if i // self.workers >= len(shard_bits):
+                break
+            s.access_stream_dgim.add_events(shard_bits[i // self.workers])
+        self.merge_turn = self.turn
+        self.merges += 1
+
+    def close(self):
+        self.merge()
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for proc in self.procs:
+            proc.join()
+        self.procs = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def eventos_sinteticos(ids, n, usuarios=50000, seed=7):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield (rng.choice(ids), f"user_{rng.randrange(usuarios)}", f"2025-01-01T00:00:{i % 60:02d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta en paralelo")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    sistema = cargar_sistema()
+    sistema.log.close()
+    ids = [b["_id"] for b in sistema.all_books_ref]
+    eventos = list(eventos_sinteticos(ids, args.events))
+
+    inicio = time.perf_counter()
+    sistema.log = None
+    sistema.register_interactions(eventos)
+    base = args.events / (time.perf_counter() - inicio)
+    print(f"Secuencial: {base:,.0f} eventos/s")
+
+    for w in args.workers:
+        sistema = cargar_sistema()
+        sistema.log.close()
+        sistema.log = None
+        inicio = time.perf_counter()
+        with ParallelIngestor(sistema, workers=w) as ing:
+            ing.ingest(eventos)
+        tasa = args.events / (time.perf_counter() - inicio)
+        print(f"{w} procesos: {tasa:,.0f} eventos/s (x{tasa / base:.2f}) | "
+              f"usuarios únicos ~{sistema.user_counter_hll.count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import bisect
+import csv
+import itertools
+import json
+import random
+import resource
+import sys
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun.book_store import BookStore
+from comun.loadgen import percentil
+from main import LibrarySystemU2, cargar_datos
+
+# Pipeline de re-proceso de eventos para medir el sistema de streams.
+# Fuente (JSONL, CSV o sintética) -> bloques de `chunk` eventos ->
+# register_interactions, y en paralelo una "verdad exacta" (Counter, set,
+# los últimos bits de acceso) para medir el error de cada sketch. Nunca se
+# carga el stream completo: en memoria solo hay un bloque a la vez.
+#
+# DGIM cuenta, de los últimos k eventos, cuántos fueron a un libro que
+# existe (bit 1) y no a un id desconocido (bit 0). El stream sintético
+# mete una fracción `--miss-rate` de ids que no están en el catálogo.
+#
+#   python replay.py --lengths 10000 100000 1000000
+#   python replay.py --source biblioteca2.log      (la bitácora también sirve)
+#   python replay.py --source eventos.csv --json
+
+
+def _evento(rec):
+    # Acepta el formato de la bitácora ({"id","user","ts"}) o el largo
+    book_id = rec.get("book_id", rec.get("id"))
+    user_id = rec.get("user_id", rec.get("user", "anon"))
+    ts = rec.get("timestamp", rec.get("ts"))
+    return book_id, user_id, ts
+
+
+def leer_jsonl(path, chunk=10000):
+    with open(path, encoding="utf-8") as f:
+        bloque = []
+        for linea in f:
+            if not linea.strip():
+                continue
+            bloque.append(_evento(json.loads(linea)))
+            if len(bloque) >= chunk:
+                yield bloque
+                bloque = []
+        if bloque:
+            yield bloque
+
+
+def leer_csv(path, chunk=10000):
+    """CSV con cabecera; columnas book_id, user_id y timestamp (o id, user, ts)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        filas = csv.DictReader(f)
+        while True:
+            bloque = [_evento(r) for r in itertools.islice(filas, chunk)]
+            if not bloque:
+                break
+            yield bloque
+
+
+def generar_eventos(ids, n, chunk=10000, usuarios=100000, skew=1.1, seed=42, miss_rate=0.0):
+    """
+    Stream sintético con popularidad tipo Zipf (exponente `skew`) sobre los
+    libros del catálogo, usuarios uniformes y timestamps crecientes. Una
+    fracción `miss_rate` de los eventos pide un id que no existe.
+    """
+    rng = random.Random(seed)
+    ids = list(ids)
+    rng.shuffle(ids)
+    acumulado = list(itertools.accumulate(1 / (r + 1) ** skew for r in range(len(ids))))
+    total = acumulado[-1]
+    t0 = datetime(2025, 1, 1)
+
+    hechos = 0
+    while hechos < n:
+        m = min(chunk, n - hechos)
+        bloque = []
+        for i in range(hechos, hechos + m):
+            if miss_rate and rng.random() < miss_rate:
+                book_id = f"ausente_{rng.randrange(n)}"
+            else:
+                book_id = ids[bisect.bisect_left(acumulado, rng.random() * total)]
+            ts = (t0 + timedelta(milliseconds=i)).isoformat()
+            bloque.append((book_id, f"user_{rng.randrange(usuarios)}", ts))
+        hechos += m
+        yield bloque
+
+
+def abrir_fuente(source, ids, n, chunk, seed, miss_rate=0.0):
+    if source is None:
+        return generar_eventos(ids, n, chunk, seed=seed, miss_rate=miss_rate)
+    lector = leer_csv if source.endswith(".csv") else leer_jsonl
+    return _recortar(lector(source, chunk), n)
+
+
+def _recortar(bloques, n):
+    hechos = 0
+    for bloque in bloques:
+        if hechos >= n:
+            return
+        bloque = bloque[:n - hechos]
+        hechos += len(bloque)
+        yield bloque
+
+
+def sistema_nuevo(datos, **kwargs):
+    sistema = LibrarySystemU2(store=BookStore(), **kwargs)
+    for d in datos:
+        sistema.insert_book(d)
+    return sistema
+
+
+def _memoria_sketches(s):
+    return {
+        "bloom": len(s.recent_access_bloom.bit_array),
+        "hll": s.user_counter_hll.nbytes(),
+        "cms": sum(r.itemsize * len(r) for cms in (s.book_cms, s.genre_cms) for r in cms.table),
+        "dgim_buckets": sum(len(level) for level in s.access_stream_dgim.levels),
+    }
+
+
+def _errores(s, vistas, usuarios, bits, ventanas, top_n, sondas):
+    n = sum(vistas.values())
+    exacto_u = len(usuarios)
+    hll = s.user_counter_hll.count()
+
+    # CMS: error medio y máximo sobre todos los libros vistos, relativo a N
+    errs = [s.book_cms.estimate(b) - c for b, c in vistas.items()]
+    # Bloom: ningún id de sonda se agregó, así que cada positivo es falso
+    fp = sum(1 for x in sondas if s.recent_access_bloom.contains(x))
+    # DGIM: la cuenta exacta son los 1s entre los últimos k bits
+    bits = list(bits)
+    dgim = {k: (s.access_stream_dgim.count_events(k), sum(bits[-k:])) for k in ventanas}
+    # Space-Saving: cuántos del top-n exacto aparecen en el top-n estimado
+    real = {b for b, _ in vistas.most_common(top_n)}
+    estimado = {b for b, _, _ in s.book_trending.top(top_n)}
+
+    return {
+        "hll_estimate": hll,
+        "hll_exact": exacto_u,
+        "hll_rel_error": abs(hll - exacto_u) / exacto_u if exacto_u else 0.0,
+        "cms_mean_error": sum(errs) / len(errs) if errs else 0.0,
+        "cms_max_error": max(errs, default=0),
+        "cms_max_error_over_n": max(errs, default=0) / n if n else 0.0,
+        "bloom_fp_observed": fp / len(sondas) if sondas else 0.0,
+        "bloom_fp_theoretical": s.recent_access_bloom.fp_rate(),
+        "dgim_estimate": {str(k): e for k, (e, _) in dgim.items()},
+        "dgim_exact": {str(k): r for k, (_, r) in dgim.items()},
+        "dgim_rel_error": {str(k): abs(e - r) / r if r else 0.0 for k, (e, r) in dgim.items()},
+        "topk_n": top_n,
+        "topk_recall": len(real & estimado) / len(real) if real else 1.0,
+    }
+
+
+def correr(datos, largo, args):
+    sistema = sistema_nuevo(datos, dgim_window=max(args.windows))
+    ids = [d["_id"] for d in datos]
+    bloques = abrir_fuente(args.source, ids, largo, args.chunk, args.seed, args.miss_rate)
+
+    vistas, usuarios = Counter(), set()
+    bits = deque(maxlen=max(args.windows))
+    tiempos = {"parse": [], "apply": [], "truth": []}
+    total = 0
+    inicio = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        bloque = next(bloques, None)
+        t1 = time.perf_counter()
+        if bloque is None:
+            break
+        libros = sistema.register_interactions(bloque)
+        t2 = time.perf_counter()
+        for (book_id, user_id, _), libro in zip(bloque, libros):
+            bits.append(1 if libro is not None else 0)
+            if libro is not None:
+                vistas[book_id] += 1
+                usuarios.add(user_id)
+        t3 = time.perf_counter()
+
+        tiempos["parse"].append(t1 - t0)
+        tiempos["apply"].append(t2 - t1)
+        tiempos["truth"].append(t3 - t2)
+        total += len(bloque)
+    # La verdad exacta no es parte del pipeline: no cuenta para el throughput
+    pipeline = time.perf_counter() - inicio - sum(tiempos["truth"])
+
+    sondas = [f"sonda_{i}" for i in range(args.probes)]
+    return {
+        "events": total,
+        "seconds": round(pipeline, 3),
+        "events_per_sec": round(total / pipeline, 1) if pipeline else 0.0,
+        "stage_ms": {
+            etapa: {
+                "total": round(sum(ts) * 1000, 1),
+                "p50_chunk": round(percentil(ts, 50) * 1000, 3),
+                "p99_chunk": round(percentil(ts, 99) * 1000, 3),
+            }
+            for etapa, ts in tiempos.items()
+        },
+        "sketch_bytes": _memoria_sketches(sistema),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "errors": _errores(sistema, vistas, usuarios, bits, args.windows, args.top, sondas),
+    }
+
+
+def imprimir(largo, r):
+    e = r["errors"]
+    print(f"\n=== {largo} eventos ===")
+    print(f"Throughput: {r['events_per_sec']:,.0f} eventos/s ({r['seconds']} s, {r['events']} eventos)")
+    for etapa, t in r["stage_ms"].items():
+        print(f"  {etapa:6s} total {t['total']:>10.1f} ms | p50 {t['p50_chunk']:.3f} ms | p99 {t['p99_chunk']:.3f} ms por bloque")
+    print(f"Memoria: sketches {r['sketch_bytes']} | RSS máx {r['max_rss_kb'] / 1024:.1f} MB")
+    print(f"HLL: {e['hll_estimate']} vs {e['hll_exact']} (error {e['hll_rel_error']:.2%})")
+    print(f"CMS: error medio {e['cms_mean_error']:.2f}, máximo {e['cms_max_error']} ({e['cms_max_error_over_n']:.5f}·N)")
+    print(f"Bloom: falsos positivos {e['bloom_fp_observed']:.4%} (teórico {e['bloom_fp_theoretical']:.4%})")
+    print("DGIM (accesos a libros existentes): " + ", ".join(
+        f"k={k}: {e['dgim_estimate'][k]} vs {e['dgim_exact'][k]} ({v:.2%})"
+        for k, v in e["dgim_rel_error"].items()))
+    print(f"Space-Saving: recall del top-{e['topk_n']}: {e['topk_recall']:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-proceso de eventos y benchmark de los sketches")
+    parser.add_argument("--datos", default="biblioteca2.json")
+    parser.add_argument("--source", default=None, help="JSONL o CSV de eventos; si no, sintético")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--chunk", type=int, default=10000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--probes", type=int, default=100000, help="ids ausentes para medir el Bloom")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--miss-rate", type=float, default=0.1,
+                        help="fracción de ids inexistentes en el stream sintético")
+    parser.add_argument("--json", action="store_true", help="imprime el reporte como JSON")
+    args = parser.parse_args()
+
+    datos = cargar_datos(args.datos)
+    if not datos:
+        sys.exit(f"No se pudo leer {args.datos}")
+
+    reportes = {}
+    for largo in args.lengths:
+        reportes[str(largo)] = r = correr(datos, largo, args)
+        if not args.json:
+            imprimir(largo, r)
+    if args.json:
+        print(json.dumps(reportes, indent=2))
+
+
+if __name__ == "__main__":
+    main()
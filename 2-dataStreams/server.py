@@ -0,0 +1,8 @@
+import _comun  # noqa: F401  (deja ../comun importable)
+from comun import server
+from main import cargar_sistema
+
+# El servidor vive en comun/server.py; aquí solo se le pasa el sistema de esta unidad.
+
+if __name__ == "__main__":
+    server.main(cargar_sistema)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Los tests importan los módulos de la unidad como cuando se corre desde su
+# carpeta. Las unidades 1 y 2 tienen cada una su `main`: se olvida el que
+# haya importado otra unidad antes.
+UNIDAD = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, UNIDAD)
+sys.modules.pop("main", None)
@@ -0,0 +1,52 @@
+import pytest
+
+from main import BloomFilter
+
+
+def _ids(prefijo, n):
+    return [f"{prefijo}_{i}" for i in range(n)]
+
+
+def test_sin_falsos_negativos_y_fp_cerca_del_objetivo():
+    bf = BloomFilter(expected_items=20000, fp_rate=0.01)
+    bf.add_many(_ids("si", 20000))
+    assert all(bf.contains_many(_ids("si", 20000)))
+    fp = sum(bf.contains_many(_ids("no", 50000))) / 50000
+    assert fp < 0.02
+    assert bf.fp_rate() == pytest.approx(0.01, rel=0.3)
+
+
+def test_lote_igual_que_uno_por_uno():
+    a = BloomFilter(5000, 5)
+    b = BloomFilter(5000, 5)
+    items = _ids("x", 700) + [123, b"crudo", ("tupla", 1)]
+    a.add_many(items)
+    for x in items:
+        b.add(x)
+    assert a.bit_array == b.bit_array and a.count == b.count == len(items)
+    sondas = items + _ids("y", 300)
+    assert a.contains_many(sondas) == [a.contains(x) for x in sondas]
+    assert a.contains_many([]) == []
+
+
+def test_union_e_interseccion():
+    a, b = BloomFilter(4000, 4), BloomFilter(4000, 4)
+    a.add_many(_ids("a", 200))
+    b.add_many(_ids("b", 200))
+    u, i = a | b, a & b
+    assert all(u.contains_many(_ids("a", 200) + _ids("b", 200)))
+    assert bytes(u.bit_array) == bytes(x | y for x, y in zip(a.bit_array, b.bit_array))
+    assert bytes(i.bit_array) == bytes(x & y for x, y in zip(a.bit_array, b.bit_array))
+    with pytest.raises(ValueError):
+        a | BloomFilter(4001, 4)
+
+
+def test_from_bytes_valida_el_largo():
+    bf = BloomFilter(1001, 3)
+    bf.add_many(_ids("z", 50))
+    data = bf.to_bytes()
+    copia = BloomFilter.from_bytes(data)
+    assert copia.bit_array == bf.bit_array and copia.count == 50
+    for malo in (data[:-1], data + b"\0", data[:10], b"XXXX" + data[4:]):
+        with pytest.raises(ValueError):
+            BloomFilter.from_bytes(malo)
@@ -0,0 +1,40 @@
+import random
+from collections import deque
+
+import pytest
+
+from main import DGIM
+
+
+@pytest.mark.parametrize("r", [2, 3, 8])
+@pytest.mark.parametrize("p", [1.0, 0.5, 0.05])
+def test_error_dentro_de_la_cota(r, p):
+    rng = random.Random(r * 100 + int(p * 10))
+    ventana = 2000
+    dgim = DGIM(ventana, r)
+    bits = deque(maxlen=ventana)
+    peor = 0.0
+    for t in range(8000):
+        b = 1 if rng.random() < p else 0
+        dgim.add_event(b)
+        bits.append(b)
+        if t % 37 == 0:
+            ultimos = list(bits)
+            for k in (10, 200, ventana):
+                real = sum(ultimos[-k:])
+                if real:
+                    peor = max(peor, abs(dgim.count_events(k) - real) / real)
+    assert peor <= 1 / r
+
+
+def test_lote_igual_que_uno_por_uno():
+    rng = random.Random(3)
+    bits = [rng.randrange(2) for _ in range(5000)]
+    a, b = DGIM(700, 3), DGIM(700, 3)
+    for i in range(0, len(bits), 250):
+        a.add_events(bits[i:i + 250])
+    for bit in bits:
+        b.add_event(bit)
+    assert a.t == b.t
+    for k in (1, 50, 700, None):
+        assert a.count_events(k) == b.count_events(k)
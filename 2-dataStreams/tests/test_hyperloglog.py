@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from main import HyperLogLog
+
+
+def _usuarios(desde, hasta):
+    return (f"user_{i}" for i in range(desde, hasta))
+
+
+@pytest.mark.parametrize("n", [10, 1000, 20000, 200000])
+def test_error_dentro_de_la_cota(n):
+    hll = HyperLogLog(14)
+    hll.add_many(_usuarios(0, n))
+    # Repetidos no cuentan
+    hll.add_many(_usuarios(0, n // 2))
+    error = abs(hll.count() - n) / n
+    # 4 errores estándar (1.04 / sqrt(m)); en disperso es casi exacto
+    cota = 4 * 1.04 / math.sqrt(hll.m) if hll.registers is not None else 0.01
+    assert error <= cota
+
+
+def test_precision_baja_sigue_la_cota():
+    for b in (8, 10, 12):
+        hll = HyperLogLog(b)
+        hll.add_many(_usuarios(0, 50000))
+        assert abs(hll.count() - 50000) / 50000 <= 4 * 1.04 / math.sqrt(1 << b)
+
+
+@pytest.mark.parametrize("n", [500, 50000])
+def test_merge_igual_que_contar_la_union(n):
+    a, b, todo = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    a.add_many(_usuarios(0, n))
+    b.add_many(_usuarios(n // 2, 2 * n))
+    todo.add_many(_usuarios(0, 2 * n))
+    assert a.merge(b).count() == todo.count()
+
+
+@pytest.mark.parametrize("b", [4, 10, 14])
+def test_disperso_nunca_ocupa_mas_que_el_denso(b):
+    hll = HyperLogLog(b)
+    maximo = 0
+    for i in range(4 * hll.m):
+        hll.add(f"user_{i}")
+        hll.add(f"user_{i // 2}")
+        maximo = max(maximo, hll.nbytes())
+        if hll.registers is not None:
+            break
+    assert hll.registers is not None
+    assert maximo <= hll.m
+
+
+def test_disperso_cuenta_casi_exacto_con_repetidos_y_merge():
+    a, b = HyperLogLog(14), HyperLogLog(14)
+    a.add_many(_usuarios(0, 2000))
+    a.add_many(_usuarios(0, 2000))
+    b.add_many(_usuarios(1500, 3000))
+    assert a.registers is None and b.registers is None
+    assert abs(a.count() - 2000) <= 2
+    assert abs(a.merge(b).count() - 3000) <= 3
+    assert list(a.sparse) == sorted(a.sparse)
@@ -0,0 +1,48 @@
+import json
+import random
+
+from main import cargar_sistema
+from parallel_ingest import ParallelIngestor
+
+
+def _sistema(tmp_path, nombre):
+    datos = tmp_path / "biblioteca2.json"
+    if not datos.exists():
+        libros = [{"_id": f"id_{i}", "title": f"Libro {i}", "author": f"Autor {i % 7}",
+                   "genre": ("Historia", "Ciencia", "Arte")[i % 3], "views": 0, "lastAccessed": ""}
+                  for i in range(60)]
+        datos.write_text(json.dumps(libros), encoding="utf-8")
+    sistema = cargar_sistema(str(datos), str(tmp_path / f"{nombre}.snap"), str(tmp_path / f"{nombre}.log"))
+    sistema.log.close()
+    sistema.log = None
+    return sistema
+
+
+def test_paralelo_igual_que_secuencial(tmp_path):
+    secuencial = _sistema(tmp_path, "a")
+    paralelo = _sistema(tmp_path, "b")
+    ids = [b["_id"] for b in secuencial.all_books_ref]
+    rng = random.Random(5)
+    # Mezcla de formatos crudos (los normaliza cada shard) y fechas que avanzan,
+    # como en una bitácora: el último acceso es el más reciente
+    eventos = []
+    for i in range(6000):
+        book_id, user_id, ts = rng.choice(ids + ["no_existe"]), f"u{rng.randrange(500)}", f"2025-01-01T{i:08d}"
+        eventos.append([book_id, user_id, ts] if i % 3 else {"book_id": book_id, "user_id": user_id, "timestamp": ts})
+
+    secuencial.register_interactions(eventos)
+    with ParallelIngestor(paralelo, workers=3, chunk_size=250, merge_every=7) as ing:
+        ing.ingest(iter(eventos))
+
+    def vistas(s):
+        return {b["_id"]: (b["views"], b["lastAccessed"]) for b in s.all_books_ref}
+
+    assert vistas(paralelo) == vistas(secuencial)
+    assert paralelo.genre_frequency == secuencial.genre_frequency
+    assert paralelo.user_counter_hll.count() == secuencial.user_counter_hll.count()
+    assert paralelo.recent_access_bloom.bit_array == secuencial.recent_access_bloom.bit_array
+    assert paralelo.access_stream_dgim.t == secuencial.access_stream_dgim.t
+    assert paralelo.access_stream_dgim.levels == secuencial.access_stream_dgim.levels
+    assert all(paralelo.book_cms.estimate(i) >= secuencial.search_by_id(i)["views"] for i in ids)
+    top = [g for g, _ in secuencial.trending_genres(3)]
+    assert [g for g, _ in paralelo.trending_genres(3)] == top
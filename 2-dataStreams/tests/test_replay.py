@@ -0,0 +1,62 @@
+import argparse
+import itertools
+import json
+from collections import Counter
+
+import replay
+
+
+def _datos(n=50):
+    return [{"_id": f"id_{i}", "title": f"Libro {i}", "author": f"Autor {i % 7}",
+             "genre": ("Historia", "Ciencia", "Arte")[i % 3], "views": 0, "lastAccessed": ""}
+            for i in range(n)]
+
+
+def _args(**kw):
+    base = dict(source=None, chunk=700, seed=3, miss_rate=0.3, windows=[100, 1000, 3000],
+                top=5, probes=1000)
+    base.update(kw)
+    return argparse.Namespace(**base)
+
+
+def test_replay_sintetico_contra_la_cuenta_exacta():
+    datos = _datos()
+    ids = {d["_id"] for d in datos}
+    args = _args()
+    r = replay.correr(datos, 5000, args)
+
+    # El mismo stream, contado a mano
+    eventos = list(itertools.chain.from_iterable(
+        replay.generar_eventos([d["_id"] for d in datos], 5000, args.chunk, seed=args.seed,
+                               miss_rate=args.miss_rate)))
+    bits = [1 if book_id in ids else 0 for book_id, _, _ in eventos]
+    vistas = Counter(book_id for book_id, _, _ in eventos if book_id in ids)
+    e = r["errors"]
+
+    assert r["events"] == 5000
+    assert e["hll_exact"] == len({u for b, u, _ in eventos if b in ids})
+    assert e["cms_max_error"] >= 0
+    for k in args.windows:
+        exacto = sum(bits[-k:])
+        assert e["dgim_exact"][str(k)] == exacto
+        # Con fallos de por medio ya no es simplemente k
+        assert exacto < k
+        # DGIM con r=2: error relativo como mucho 1/r
+        assert abs(e["dgim_estimate"][str(k)] - exacto) <= exacto / 2
+    assert sum(vistas.values()) == sum(bits)
+
+
+def test_replay_de_la_bitacora_se_corta_en_el_largo(tmp_path):
+    datos = _datos()
+    fuente = tmp_path / "eventos.log"
+    with open(fuente, "w", encoding="utf-8") as f:
+        for i in range(300):
+            book_id = f"id_{i % 60}"  # id_50..id_59 no existen
+            f.write(json.dumps({"seq": i + 1, "id": book_id, "user": f"u{i % 11}", "ts": f"t{i:04d}"}) + "\n")
+
+    r = replay.correr(datos, 250, _args(source=str(fuente), chunk=40, windows=[60, 250]))
+    e = r["errors"]
+    bits = [1 if i % 60 < 50 else 0 for i in range(250)]
+    assert r["events"] == 250
+    assert e["dgim_exact"] == {"60": sum(bits[-60:]), "250": sum(bits)}
+    assert e["hll_exact"] == 11
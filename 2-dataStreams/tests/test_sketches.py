@@ -0,0 +1,66 @@
+import random
+from collections import Counter
+
+import pytest
+
+from main import CountMinSketch, SpaceSaving
+
+
+def _zipf(n, universo=5000, seed=1):
+    rng = random.Random(seed)
+    pesos = [1 / (r + 1) ** 1.1 for r in range(universo)]
+    return rng.choices(range(universo), pesos, k=n)
+
+
+@pytest.mark.parametrize("conservative", [False, True])
+def test_count_min_dentro_de_epsilon_total(conservative):
+    eventos = _zipf(50000)
+    real = Counter(eventos)
+    cms = CountMinSketch(epsilon=0.002, delta=0.01, conservative=conservative)
+    for x in eventos:
+        cms.add(x)
+    cota = 0.002 * len(eventos)
+    fuera = 0
+    for x, c in real.items():
+        est = cms.estimate(x)
+        assert est >= c
+        fuera += est - c > cota
+    # La garantía es por item con probabilidad 1 - delta
+    assert fuera <= 0.01 * len(real) + 1
+
+
+def test_count_min_merge_igual_que_un_solo_sketch():
+    eventos = _zipf(10000, seed=2)
+    a, b, todo = (CountMinSketch(width=500, depth=4) for _ in range(3))
+    for i, x in enumerate(eventos):
+        (a if i % 2 else b).add(x)
+        todo.add(x)
+    a.merge(b)
+    assert all(a.estimate(x) == todo.estimate(x) for x in set(eventos))
+
+
+def test_space_saving_garantias_y_heavy_hitters():
+    eventos = _zipf(50000, seed=3)
+    real = Counter(eventos)
+    ss = SpaceSaving(200)
+    for x in eventos:
+        ss.add(x)
+    top = ss.top(200)
+    for x, cuenta, error in top:
+        assert cuenta - error <= real[x] <= cuenta
+    # Todo lo que pasa de N / capacity está seguro entre los contadores
+    umbral = len(eventos) / 200
+    assert {x for x, c in real.items() if c > umbral} <= {x for x, _, _ in top}
+    assert [x for x, _, _ in ss.top(5)] == [x for x, _ in real.most_common(5)]
+
+
+def test_space_saving_top_en_cache_hasta_el_siguiente_add():
+    ss = SpaceSaving(50)
+    for x in _zipf(2000, universo=300, seed=4):
+        ss.add(x)
+    largo = ss.top(20)
+    assert ss.top(20) is not largo and ss.top(20) == largo
+    assert ss.top(5) == largo[:5]
+    assert ss.top(40)[:20] == largo
+    ss.add("nuevo", 10 ** 6)
+    assert ss.top(1)[0][0] == "nuevo"
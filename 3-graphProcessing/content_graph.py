@@ -0,0 +1,152 @@
+import numpy as np
+
+# Grafo libro -> libro armado con las aristas `contentSimilarity` de cada
+# registro. Se guarda como matriz dispersa CSR hecha a mano con NumPy
+# (indptr, indices, data), y encima va PageRank personalizado (random walk
+# con reinicio) para recomendar desde los libros recientes de un usuario.
+
+# Tope de elementos del bloque (usuarios x aristas) en cada multiplicación,
+# para que un lote grande no reviente la memoria.
+_BLOCK = 1 << 22
+
+
+def _csr(rows, cols, vals, n):
+    """Arma (indptr, indices, data) ordenando por fila; duplicados se suman."""
+    flat = rows * n + cols
+    flat, inv = np.unique(flat, return_inverse=True)
+    data = np.bincount(inv.ravel(), weights=vals, minlength=len(flat))
+    rows, cols = np.divmod(flat, n)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols.astype(np.int64), data
+
+
+class ContentGraph:
+    """
+    Matriz de transición P entre libros: cada fila se normaliza para que
+    sume 1. Los libros sin aristas de salida (o con peso total 0) son
+    "colgantes": su masa vuelve al vector de reinicio en cada paso.
+
+    Solo se guardan aristas hacia libros del catálogo; las que apuntan a
+    ids desconocidos se descartan.
+    """
+
+    def __init__(self, ids, src, dst, weights):
+        self.ids = list(ids)
+        self.index = {b: i for i, b in enumerate(self.ids)}
+        self.n = n = len(self.ids)
+
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        w = np.asarray(weights, dtype=np.float64)
+        ok = w > 0
+        self.indptr, self.indices, data = _csr(src[ok], dst[ok], w[ok], n)
+
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        out = np.bincount(rows, weights=data, minlength=n)
+        self.dangling = out == 0
+        self.data = data / out[rows]
+
+        # La multiplicación x P necesita las aristas de entrada: guardo P^T en CSR
+        self._t_indptr, self._t_src, self._t_data = _csr(self.indices, rows, self.data, n)
+
+    @classmethod
+    def from_records(cls, records, weight="transitionProbability"):
+        """
+        `weight` es la llave de la arista a usar ("transitionProbability" o
+        "similarityScore"), o "product" para multiplicar ambas.
+        """
+        ids = [r["_id"] for r in records]
+        index = {b: i for i, b in enumerate(ids)}
+        src, dst, w = [], [], []
+        for i, r in enumerate(records):
+            for e in r.get("contentSimilarity") or ():
+                j = index.get(e.get("relatedContentId"))
+                if j is None:
+                    continue
+                if weight == "product":
+                    peso = e.get("transitionProbability", 0) * e.get("similarityScore", 0)
+                else:
+                    peso = e.get(weight, 0)
+                src.append(i)
+                dst.append(j)
+                w.append(peso)
+        return cls(ids, src, dst, w)
+
+    @property
+    def edges(self):
+        return len(self.indices)
+
+    def step(self, X):
+        """
+        Un paso de la caminata: X @ P, con X de forma (n,) o (lote, n).
+        La masa de los nodos colgantes no se reparte aquí (ver pagerank).
+        """
+        X = np.asarray(X, dtype=np.float64)
+        single = X.ndim == 1
+        X = np.atleast_2d(X)
+        Y = np.zeros_like(X)
+
+        starts = self._t_indptr[:-1]
+        nonempty = np.diff(self._t_indptr) > 0
+        if self.edges:
+            filas = max(1, _BLOCK // self.edges)
+            for a in range(0, len(X), filas):
+                C = X[a:a + filas, self._t_src] * self._t_data
+                Y[a:a + filas, nonempty] = np.add.reduceat(C, starts[nonempty], axis=1)
+        return Y[0] if single else Y
+
+    def _restart(self, seeds):
+        """Una fila de reinicio por usuario: uniforme sobre sus libros conocidos."""
+        S = np.zeros((len(seeds), self.n))
+        for u, libros in enumerate(seeds):
+            pesos = libros if isinstance(libros, dict) else dict.fromkeys(libros, 1.0)
+            for b, p in pesos.items():
+                i = self.index.get(b)
+                if i is not None:
+                    S[u, i] += p
+            total = S[u].sum()
+            if total > 0:
+                S[u] /= total
+            else:
+                # Sin libros conocidos: PageRank global
+                S[u] = 1.0 / self.n
+        return S
+
+    def personalized_pagerank(self, seeds, alpha=0.15, tol=1e-8, max_iter=100):
+        """
+        PageRank personalizado para un lote de usuarios a la vez. `seeds` es
+        una lista donde cada elemento son los libros recientes de un usuario
+        (lista de ids o dict id -> peso). Devuelve una matriz (lote, n).
+
+            r = alpha * s + (1 - alpha) * (r P + masa_colgante * s)
+        """
+        S = self._restart(seeds)
+        R = S.copy()
+        for _ in range(max_iter):
+            colgante = R[:, self.dangling].sum(axis=1, keepdims=True)
+            nueva = alpha * S + (1 - alpha) * (self.step(R) + colgante * S)
+            delta = np.abs(nueva - R).sum(axis=1).max()
+            R = nueva
+            if delta < tol:
+                break
+        return R
+
+    def recommend_batch(self, recientes, k=10, exclude_seen=True, **kwargs):
+        """Top-k (id, score) para cada usuario del lote."""
+        R = self.personalized_pagerank(recientes, **kwargs)
+        if exclude_seen:
+            for u, libros in enumerate(recientes):
+                vistos = [self.index[b] for b in libros if b in self.index]
+                R[u, vistos] = -np.inf
+
+        k = min(k, self.n)
+        res = []
+        for fila in R:
+            top = np.argpartition(-fila, k - 1)[:k] if k < self.n else np.arange(self.n)
+            top = top[np.argsort(-fila[top], kind="stable")]
+            res.append([(self.ids[i], float(fila[i])) for i in top if np.isfinite(fila[i])])
+        return res
+
+    def recommend(self, recientes, k=10, **kwargs):
+        return self.recommend_batch([recientes], k, **kwargs)[0]
@@ -0,0 +1,247 @@
+import json
+from collections import deque
+
+import numpy as np
+
+from content_graph import ContentGraph
+from markov import STATES, MarkovChain
+
+# Análisis de ergodicidad y alcanzabilidad. Todo trabaja sobre la
+# adyacencia en CSR (indptr, indices), así que sirve igual para el grafo de
+# contenido (ContentGraph) que para la matriz P de una MarkovChain.
+# Nada es recursivo: Tarjan y los BFS usan pilas/colas explícitas, O(V + E),
+# y no revientan la pila de Python con millones de nodos.
+
+
+def adjacency(obj):
+    """(indptr, indices) de un ContentGraph, una MarkovChain o una matriz densa."""
+    if hasattr(obj, "indptr"):
+        return obj.indptr, obj.indices
+    P = np.asarray(obj.P if hasattr(obj, "P") else obj)
+    rows, cols = np.nonzero(P > 0)
+    indptr = np.zeros(len(P) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(P)), out=indptr[1:])
+    return indptr, cols.astype(np.int64)
+
+
+def strongly_connected_components(indptr, indices):
+    """
+    Tarjan iterativo. Devuelve (comp, k): comp[v] es la clase comunicante de
+    v y k el número de clases. Las clases salen en orden topológico inverso
+    (primero las que no tienen salida).
+    """
+    n = len(indptr) - 1
+    ptr = np.asarray(indptr).tolist()
+    adj = np.asarray(indices).tolist()
+
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = [-1] * n
+    stack = []
+    counter = 0
+    k = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, ptr[root])]
+
+        while work:
+            v, pos = work[-1]
+            end = ptr[v + 1]
+            bajo = False
+            while pos < end:
+                w = adj[pos]
+                pos += 1
+                if index[w] == -1:
+                    # Bajo a w y dejo anotado por dónde iba en v
+                    work[-1] = (v, pos)
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, ptr[w]))
+                    bajo = True
+                    break
+                if on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            if bajo:
+                continue
+
+            work.pop()
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = k
+                    if w == v:
+                        break
+                k += 1
+            if work:
+                u = work[-1][0]
+                if low[v] < low[u]:
+                    low[u] = low[v]
+
+    return np.array(comp, dtype=np.int64), k
+
+
+def _niveles(indptr, indices, comp):
+    """Nivel BFS de cada nodo, recorriendo solo aristas dentro de su clase."""
+    n = len(indptr) - 1
+    ptr = np.asarray(indptr).tolist()
+    adj = np.asarray(indices).tolist()
+    c = comp.tolist()
+    nivel = [-1] * n
+    for r in range(n):
+        if nivel[r] != -1:
+            continue
+        nivel[r] = 0
+        cola = deque([r])
+        while cola:
+            v = cola.popleft()
+            for w in adj[ptr[v]:ptr[v + 1]]:
+                if nivel[w] == -1 and c[w] == c[v]:
+                    nivel[w] = nivel[v] + 1
+                    cola.append(w)
+    return np.array(nivel, dtype=np.int64)
+
+
+def periods(indptr, indices, comp, k):
+    """
+    Periodo de cada clase: mcd de nivel[u] + 1 - nivel[v] sobre las aristas
+    u -> v internas. Una clase sin aristas internas (un nodo suelto sin
+    lazo) no tiene periodo: queda en 0.
+    """
+    n = len(indptr) - 1
+    src = np.repeat(np.arange(n), np.diff(indptr))
+    dst = np.asarray(indices)
+    nivel = _niveles(indptr, indices, comp)
+
+    interna = comp[src] == comp[dst]
+    clase = comp[src[interna]]
+    d = np.abs(nivel[src[interna]] + 1 - nivel[dst[interna]])
+
+    res = np.zeros(k, dtype=np.int64)
+    if len(clase):
+        orden = np.argsort(clase, kind="stable")
+        clase, d = clase[orden], d[orden]
+        inicio = np.flatnonzero(np.r_[True, clase[1:] != clase[:-1]])
+        res[clase[inicio]] = np.gcd.reduceat(d, inicio)
+    return res
+
+
+def reachable(indptr, indices, sources):
+    """Máscara de nodos alcanzables desde `sources` (BFS iterativo)."""
+    n = len(indptr) - 1
+    ptr = np.asarray(indptr).tolist()
+    adj = np.asarray(indices).tolist()
+    visto = [False] * n
+    cola = deque()
+    for s in sources:
+        if not visto[s]:
+            visto[s] = True
+            cola.append(s)
+    while cola:
+        v = cola.popleft()
+        for w in adj[ptr[v]:ptr[v + 1]]:
+            if not visto[w]:
+                visto[w] = True
+                cola.append(w)
+    return np.array(visto, dtype=bool)
+
+
+def analizar(obj, labels=None, sources=None):
+    """
+    Reporte de clases comunicantes de la cadena:
+    - clases cerradas (ninguna arista sale) y transitorias,
+    - periodo de cada clase,
+    - nodos inalcanzables: los que no se alcanzan desde `sources`, o si no
+      se dan, los que ningún otro nodo apunta (ninguna recomendación lleva ahí),
+    - si es ergódica: irreducible (una sola clase) y aperiódica.
+    `labels` traduce índices a nombres (ids de libros o estados).
+    """
+    indptr, indices = adjacency(obj)
+    if labels is None:
+        labels = getattr(obj, "ids", None) or getattr(obj, "states", None)
+    n = len(indptr) - 1
+    labels = list(labels) if labels is not None else list(range(n))
+
+    comp, k = strongly_connected_components(indptr, indices)
+    src = np.repeat(np.arange(n), np.diff(indptr))
+    dst = np.asarray(indices)
+
+    sale = np.zeros(k, dtype=bool)
+    sale[comp[src[comp[src] != comp[dst]]]] = True
+    per = periods(indptr, indices, comp, k)
+    tam = np.bincount(comp, minlength=k)
+
+    if sources is None:
+        entra = np.bincount(dst[src != dst], minlength=n)
+        inalcanzables = np.flatnonzero(entra == 0)
+    else:
+        pos = {b: i for i, b in enumerate(labels)}
+        mask = reachable(indptr, indices, [pos[s] for s in sources if s in pos])
+        inalcanzables = np.flatnonzero(~mask)
+
+    cerradas = np.flatnonzero(~sale)
+    irreducible = k == 1
+    aperiodica = irreducible and per[0] == 1
+    return {
+        "nodes": n,
+        "edges": len(dst),
+        "classes": k,
+        "component": comp,
+        "class_sizes": tam,
+        "largest_class": int(tam.max()) if k else 0,
+        "closed": cerradas.tolist(),
+        "transient": np.flatnonzero(sale).tolist(),
+        "periods": per,
+        "closed_periods": {int(c): int(per[c]) for c in cerradas},
+        "unreachable": [labels[i] for i in inalcanzables],
+        "irreducible": irreducible,
+        "aperiodic": bool(aperiodica),
+        "ergodic": bool(irreducible and aperiodica),
+    }
+
+
+def resumen(reporte, nombre):
+    r = reporte
+    print(f"\n== {nombre} ==")
+    print(f"Nodos: {r['nodes']} | aristas: {r['edges']} | clases comunicantes: {r['classes']}")
+    print(f"Clase más grande: {r['largest_class']} nodos")
+    print(f"Clases cerradas: {len(r['closed'])} | transitorias: {len(r['transient'])}")
+    periodicas = sum(1 for p in r["closed_periods"].values() if p > 1)
+    print(f"Clases cerradas periódicas: {periodicas}")
+    print(f"Inalcanzables: {len(r['unreachable'])}")
+    print("Ergódica:", "sí" if r["ergodic"] else "no",
+          f"(irreducible: {r['irreducible']}, aperiódica: {r['aperiodic']})")
+
+
+def main():
+    with open("biblioteca3.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    resumen(analizar(MarkovChain.from_records(data, STATES)), "Estados de interés")
+
+    grafo = ContentGraph.from_records(data)
+    reporte = analizar(grafo)
+    resumen(reporte, "Grafo de contenido (contentSimilarity)")
+
+    # El campo ergodicProperty de cada registro viene dado; aquí se compara
+    # contra lo que de verdad pasa: ¿el libro está en una clase cerrada
+    # aperiódica (una vez ahí, la cadena se queda y converge)?
+    comp = reporte["component"]
+    buenas = {c for c, p in reporte["closed_periods"].items() if p == 1}
+    real = [int(comp[i]) in buenas for i in range(grafo.n)]
+    dado = [bool(r.get("ergodicProperty")) for r in data]
+    iguales = sum(a == b for a, b in zip(real, dado))
+    print(f"\nergodicProperty coincide con el análisis en {iguales}/{len(data)} libros")
+
+
+if __name__ == "__main__":
+    main()
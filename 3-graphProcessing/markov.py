@@ -1,96 +1,416 @@
+import bisect
 import json
+import warnings
+from collections import deque
 
-# Estos son los estados que vamos a usar en todo.
-
-STATES = ["casual", "focused", "research", "browsing"]
-
-
-# 1. Cargo el JSON pa' poder trabajar.
-
-with open("biblioteca3.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-print("Registros cargados:", len(data))
-
-
-
-# 2. Creo una matriz 4x4 llena de ceros.
-# voy a ir contando cuántas veces la gente pasa de un estado a otro.
-# Como: casual -> browsing, research -> focused, etc.
-
-counts = [[0, 0, 0, 0] for _ in range(4)]
-
-
-# 3. Recorro todos los libros y miro el estado anterior y el actual.
-# Si algo viene raro pues lo salto y sigo normal.
-# voy sumando las transiciones.
-
-for libro in data:
-    prev = libro.get("previousInterestState")
-    curr = libro.get("userInterestState")
-
-    if prev not in STATES or curr not in STATES:
-        continue   # si llega algo fuera de los estados, lo ignoro y ya
-
-    i = STATES.index(prev)
-    j = STATES.index(curr)
-
-    counts[i][j] += 1  # sumo esa transición entre estados
-
+import numpy as np
 
-# 4. Ya con los conteos, paso todo a probabilidades.
-# Esta ya es la matriz P de Markov. Cada fila representa un estado
-# y debe sumar aprox a 1 .
-
-P = []
-for fila in counts:
-    total = sum(fila)
-    if total == 0:
-        # Si nunca hubo transiciones desde ese estado, pues queda todo en 0.
-        P.append([0, 0, 0, 0])
-    else:
-        P.append([c / total for c in fila])
-
-
-# 5. Imprimo la matriz P para ver cómo está quedando todo.
-# Esto muestra la probabilidad de pasar de un estado a otro.
-
-print("\nMatriz de transición de estados de interés (P):\n")
-for i, fila in enumerate(P):
-    estado = STATES[i]
-    print(f"Desde '{estado}' -> ", end="")
-    print([round(x, 3) for x in fila])
+from content_graph import ContentGraph
 
+# Estos son los estados que vamos a usar en todo.
 
-# 6. Ahora saco la distribución estacionaria.
-# Esto básicamente es: “si el usuario navega mucho rato,
-# ¿en qué estado termina quedándose más tiempo?”.
-# lo calculo repitiendo pi = pi * P varias veces,
+STATES = ["casual", "focused", "research", "browsing"]
 
-n = len(STATES)
-pi = [1.0 / n] * n  # empiezo asumiendo que todos los estados pesan igual
 
-# Repite varias veces para que se estabilice
-for _ in range(50):
-    nueva = [0.0] * n
-    for i in range(n):
-        for j in range(n):
-            nueva[j] += pi[i] * P[i][j]
-    pi = nueva  # actualizo
+class MarkovChain:
+    """
+    Cadena de Markov sobre un conjunto cualquiera de estados.
 
-# Normalizo por si las moscas
-suma_pi = sum(pi) or 1.0
-pi = [p / suma_pi for p in pi]
+    Los conteos de transiciones viven en una matriz NumPy n x n; P y la
+    distribución estacionaria se calculan cuando se piden y quedan en caché
+    hasta que lleguen transiciones nuevas.
 
-print("\nDistribución estacionaria aproximada:\n")
-for estado, valor in zip(STATES, pi):
-    print(f"{estado}: {valor:.3f}")
+        chain = MarkovChain.from_records(data, STATES)
+        chain.P, chain.stationary(), chain.most_likely_next("casual")
 
+    Modo en línea: `observe(prev, curr)` suma una transición en O(1) y solo
+    marca su fila como sucia; P se recalcula por filas al pedirla y pi
+    arranca desde la anterior (warm start), que suele estar a pocas vueltas.
+    Para seguir cambios de comportamiento:
+    - `window`: solo cuentan las últimas `window` transiciones.
+    - `half_life`: cada transición pesa la mitad tras `half_life` más.
+    """
 
-# 7. Recomendación sencilla basada en Markov
-# Aquí lo que hago es: según el estado actual, miro la fila
-# y saco a qué estado es más probable que pase el usuario.
-# Y con eso, recomiendo libros de ese estado.
+    def __init__(self, states=(), window=None, half_life=None):
+        if window is not None and half_life is not None:
+            raise ValueError("Usa ventana o decaimiento, no ambos")
+        self.states = list(states)
+        self.index = {s: i for i, s in enumerate(self.states)}
+        n = len(self.states)
+        self.counts = np.zeros((n, n), dtype=np.int64 if half_life is None else np.float64)
+        self.window = window
+        self.recent = deque() if window is not None else None
+        self.half_life = half_life
+        self.t = 0
+        self.g = 1.0
+
+        self._P = None
+        self._dirty = set()
+        self._pi = {}
+        self._powers = {}
+        self._warm = None
+
+    @classmethod
+    def from_records(cls, records, states=None,
+                     prev_key="previousInterestState", curr_key="userInterestState", **kwargs):
+        """
+        Arma la cadena desde registros tipo biblioteca3.json. Si no se dan los
+        estados, salen de los datos (ordenados, para que sea reproducible).
+        """
+        prevs = [r.get(prev_key) for r in records]
+        currs = [r.get(curr_key) for r in records]
+        if states is None:
+            states = sorted({s for s in prevs + currs if s is not None})
+        chain = cls(states, **kwargs)
+        chain.add_transitions(prevs, currs)
+        return chain
+
+    def encode(self, labels):
+        """Etiquetas -> códigos enteros; lo que no es un estado queda en -1."""
+        idx = self.index
+        return np.fromiter((idx.get(s, -1) for s in labels), dtype=np.int64, count=len(labels))
+
+    def add_transitions(self, prevs, currs):
+        """Suma transiciones dadas como dos listas paralelas de etiquetas."""
+        return self.add_codes(self.encode(prevs), self.encode(currs))
+
+    def add_codes(self, i, j):
+        """
+        Igual pero con códigos ya enteros (arrays). Las transiciones con algún
+        estado fuera del conjunto (-1) se ignoran, como antes. Todo el conteo
+        es un solo bincount: millones de transiciones en milisegundos.
+        """
+        i = np.asarray(i, dtype=np.int64)
+        j = np.asarray(j, dtype=np.int64)
+        n = len(self.states)
+        ok = (i >= 0) & (j >= 0) & (i < n) & (j < n)
+        if self.window is not None or self.half_life is not None:
+            # Con ventana o decaimiento importa el orden: una por una
+            for a, b in zip(i[ok].tolist(), j[ok].tolist()):
+                self._observe_code(a, b)
+            return int(ok.sum())
+
+        flat = i[ok] * n + j[ok]
+        self.counts += np.bincount(flat, minlength=n * n).reshape(n, n)
+        self._invalidate()
+        return int(ok.sum())
+
+    def add_state(self, state):
+        """Agrega un estado nuevo (fila y columna en cero) y devuelve su índice."""
+        i = self.index.get(state)
+        if i is not None:
+            return i
+        i = len(self.states)
+        self.states.append(state)
+        self.index[state] = i
+        self.counts = np.pad(self.counts, ((0, 1), (0, 1)))
+        if self._warm is not None:
+            self._warm = np.append(self._warm, 0.0)
+        self._invalidate()
+        return i
+
+    def observe(self, prev_state, curr_state):
+        """Una transición del stream. Estados nuevos se agregan solos."""
+        self._observe_code(self.add_state(prev_state), self.add_state(curr_state))
+
+    def _observe_code(self, i, j):
+        if self.half_life is not None:
+            # Igual que el decaimiento de los sketches: en vez de achicar todo
+            # lo viejo, lo nuevo pesa cada vez más. P normaliza por fila, así
+            # que la escala se cancela.
+            self.t += 1
+            self.g = 2.0 ** (self.t / self.half_life)
+            self.counts[i, j] += self.g
+            if self.g > 1e100:
+                self.counts /= self.g
+                self.t = 0
+                self.g = 1.0
+        else:
+            self.counts[i, j] += 1
+            if self.window is not None:
+                self.recent.append((i, j))
+                if len(self.recent) > self.window:
+                    a, b = self.recent.popleft()
+                    self.counts[a, b] -= 1
+                    self._dirty.add(a)
+        self._dirty.add(i)
+        self._pi = {}
+        self._powers = {}
+
+    def _invalidate(self):
+        self._P = None
+        self._pi = {}
+        self._powers = {}
+
+    def _rows(self, rows):
+        counts = self.counts[rows]
+        totals = counts.sum(axis=1, keepdims=True)
+        return np.where(totals > 0, counts / np.where(totals > 0, totals, 1), 0.0)
+
+    @property
+    def P(self):
+        """
+        Matriz de transición. Si un estado nunca tuvo salidas, su fila queda en 0.
+        Es de solo lectura y no cambia por debajo: cuando llegan transiciones
+        nuevas se arma otra (copia + filas sucias), así que una P que alguien
+        ya tenía en la mano sigue siendo la de antes.
+        """
+        if self._P is None:
+            self._P = self._rows(slice(None))
+            self._dirty.clear()
+        elif self._dirty:
+            rows = sorted(self._dirty)
+            P = self._P.copy()
+            P[rows] = self._rows(rows)
+            self._P = P
+            self._dirty.clear()
+        self._P.setflags(write=False)
+        return self._P
+
+    def stationary(self, method="power", tol=1e-12, max_iter=10000):
+        """
+        Distribución estacionaria pi = pi P.
+
+        - "power": itera hasta que el cambio (norma L1) sea menor que `tol`,
+          en vez de un número fijo de vueltas. Arranca desde la última pi
+          calculada (o la uniforme la primera vez). Si en `max_iter` vueltas
+          no converge (p. ej. una cadena periódica, que oscila) avisa con un
+          RuntimeWarning y ese resultado no se guarda en caché.
+        - "solve": resuelve directo el sistema (P^T - I) pi = 0 con sum(pi) = 1
+          por mínimos cuadrados.
+        """
+        key = (method, tol, max_iter)
+        if key in self._pi:
+            return self._pi[key]
+
+        P = self.P
+        n = len(self.states)
+        if n == 0:
+            return np.zeros(0)
+
+        if method == "power":
+            pi = self._warm.copy() if self._warm is not None else np.full(n, 1.0 / n)
+            convergio = False
+            for _ in range(max_iter):
+                nueva = pi @ P
+                # Filas en cero pierden masa: se renormaliza en cada paso
+                s = nueva.sum()
+                if s > 0:
+                    nueva /= s
+                if np.abs(nueva - pi).sum() < tol:
+                    pi = nueva
+                    convergio = True
+                    break
+                pi = nueva
+            self._warm = pi.copy()
+            if not convergio:
+                warnings.warn(f"La iteración de potencias no convergió en {max_iter} vueltas "
+                              f"(¿cadena periódica?); prueba method='solve'", RuntimeWarning)
+                pi.setflags(write=False)
+                return pi
+        elif method == "solve":
+            A = np.vstack([P.T - np.eye(n), np.ones(n)])
+            b = np.zeros(n + 1)
+            b[-1] = 1.0
+            pi = np.linalg.lstsq(A, b, rcond=None)[0]
+            pi = np.clip(pi, 0.0, None)
+            pi /= pi.sum() or 1.0
+        else:
+            raise ValueError(f"Método desconocido: {method}")
+
+        pi.setflags(write=False)
+        self._pi[key] = pi
+        return pi
+
+    def most_likely_next(self, state):
+        return recomendar_siguiente_estado(state, self.P, self.states)
+
+    def power(self, k):
+        """
+        P^k por cuadrados repetidos: O(log k) multiplicaciones. Las potencias
+        P^(2^i) y los resultados quedan en caché hasta que cambien los conteos.
+        k tiene que ser un entero >= 0 (si no, ValueError).
+        """
+        if not isinstance(k, (int, np.integer)) or isinstance(k, bool) or k < 0:
+            raise ValueError(f"k debe ser un entero >= 0, no {k!r}")
+        k = int(k)
+        if k in self._powers:
+            return self._powers[k]
+        n = len(self.states)
+        res = np.eye(n)
+        base, bit = self.P, 1
+        r = k
+        while r:
+            if r & 1:
+                res = res @ base
+            r >>= 1
+            if r:
+                bit <<= 1
+                if bit not in self._powers:
+                    sq = base @ base
+                    sq.setflags(write=False)
+                    self._powers[bit] = sq
+                base = self._powers[bit]
+        res.setflags(write=False)
+        self._powers[k] = res
+        return res
+
+    def _dist(self, start):
+        """Un estado, un dict estado -> peso o un vector -> distribución inicial."""
+        n = len(self.states)
+        if start is None:
+            return np.asarray(self.stationary(), dtype=np.float64)
+        if isinstance(start, dict):
+            v = np.zeros(n)
+            for s, w in start.items():
+                v[self.index[s]] = w
+        elif isinstance(start, str) or not np.iterable(start):
+            v = np.zeros(n)
+            v[self.index[start]] = 1.0
+        else:
+            v = np.asarray(start, dtype=np.float64).copy()
+        return v / (v.sum() or 1.0)
+
+    def forecast(self, start, k):
+        """Distribución sobre los estados después de k pasos."""
+        return self._dist(start) @ self.power(k)
+
+    def _reach(self, objetivo, R):
+        """
+        Con `objetivo` una máscara de estados y R (n x m) un valor por estado
+        objetivo y columna: X[i] = valor esperado de R en el primer estado
+        objetivo que se toca desde i (0 si nunca se toca). Con R = 1 es la
+        probabilidad de llegar; con R = identidad sobre los absorbentes, la
+        de terminar en cada uno. Se resuelve (I - Q) X = P[:, objetivo] R
+        solo sobre los estados que pueden llegar, donde I - Q es invertible.
+        """
+        P = self.P
+        # Quiénes pueden llegar (BFS hacia atrás sobre las aristas con P > 0)
+        llega = objetivo.copy()
+        while True:
+            nuevo = llega | (P[:, llega] > 0).any(axis=1)
+            if (nuevo == llega).all():
+                break
+            llega = nuevo
+
+        X = np.zeros(R.shape)
+        X[objetivo] = R[objetivo]
+        resto = np.flatnonzero(llega & ~objetivo)
+        if len(resto):
+            Q = P[np.ix_(resto, resto)]
+            entra = P[np.ix_(resto, np.flatnonzero(objetivo))] @ R[objetivo]
+            X[resto] = np.linalg.solve(np.eye(len(resto)) - Q, entra)
+        return X
+
+    def _mask(self, targets):
+        objetivo = np.zeros(len(self.states), dtype=bool)
+        objetivo[[self.index[t] for t in targets]] = True
+        return objetivo
+
+    def reach_probability(self, targets):
+        """Probabilidad de caer alguna vez en alguno de `targets` desde cada estado."""
+        objetivo = self._mask(targets)
+        return self._reach(objetivo, np.ones((len(self.states), 1)))[:, 0]
+
+    def hitting_times(self, targets, tol=1e-9):
+        """
+        Pasos esperados hasta caer por primera vez en alguno de `targets`
+        desde cada estado: h = 0 en targets y (I - Q) h = 1 en el resto.
+
+        Solo es finito donde se llega con probabilidad 1: si desde un estado
+        hay alguna chance (más de `tol`) de irse a un lugar del que no se
+        vuelve, la espera es infinita aunque a veces sí llegue. El sistema
+        se resuelve solo sobre los estados que llegan seguro, que solo
+        pasan a otros iguales o a targets.
+        """
+        n = len(self.states)
+        objetivo = self._mask(targets)
+        seguro = self._reach(objetivo, np.ones((n, 1)))[:, 0] >= 1 - tol
+
+        h = np.full(n, np.inf)
+        h[objetivo] = 0.0
+        resto = np.flatnonzero(seguro & ~objetivo)
+        if len(resto):
+            Q = self.P[np.ix_(resto, resto)]
+            h[resto] = np.linalg.solve(np.eye(len(resto)) - Q, np.ones(len(resto)))
+        return h
+
+    def absorbing_states(self):
+        """Estados que no salen nunca (P[i, i] = 1)."""
+        P = self.P
+        return [s for i, s in enumerate(self.states) if P[i, i] == 1.0]
+
+    def absorption(self):
+        """
+        Para cadenas con estados absorbentes: pasos esperados hasta absorberse
+        desde cada estado y matriz B (estado x absorbente) con la probabilidad
+        de terminar en cada uno, B = (I - Q)^-1 R sobre los estados que pueden
+        absorberse. Si hay un ciclo cerrado sin absorbentes, sus estados (y
+        los que pueden caer en él) tienen tiempo infinito y filas de B que
+        suman menos de 1.
+        """
+        absorb = self.absorbing_states()
+        if not absorb:
+            raise ValueError("La cadena no tiene estados absorbentes")
+        a = [self.index[s] for s in absorb]
+        R = np.zeros((len(self.states), len(a)))
+        R[a, range(len(a))] = 1.0
+        B = self._reach(self._mask(absorb), R)
+        return self.hitting_times(absorb), B
+
+    def simulate(self, n_users=1_000_000, steps=20, start=None, dwell=None, seed=None):
+        """
+        Avanza `n_users` usuarios a la vez durante `steps` pasos. Cada paso es
+        un muestreo por CDF inversa sobre las filas acumuladas de P: un
+        searchsorted sobre todas las filas pegadas (fila i desplazada en i),
+        así no hace falta una matriz usuarios x estados.
+
+        Devuelve la ocupación (fracción de usuarios por estado en cada paso),
+        las visitas medias por estado y, si se da `dwell` (minutos por visita
+        en cada estado), el tiempo esperado en cada estado por usuario.
+        """
+        rng = np.random.default_rng(seed)
+        n = len(self.states)
+        P = np.array(self.P)
+        # Un estado sin salidas se queda donde está
+        vacias = P.sum(axis=1) == 0
+        P[vacias, vacias] = 1.0
+        C = np.cumsum(P, axis=1)
+        C[:, -1] = 1.0
+        plano = (C + np.arange(n)[:, None]).ravel()
+
+        cur = rng.choice(n, size=n_users, p=self._dist(start))
+        ocupacion = np.zeros((steps + 1, n))
+        visitas = np.bincount(cur, minlength=n).astype(np.float64)
+        ocupacion[0] = visitas / n_users
+        for t in range(1, steps + 1):
+            u = rng.random(n_users)
+            cur = np.searchsorted(plano, u + cur, side="right") - cur * n
+            np.minimum(cur, n - 1, out=cur)
+            cuenta = np.bincount(cur, minlength=n)
+            ocupacion[t] = cuenta / n_users
+            visitas += cuenta
+
+        res = {"occupancy": ocupacion, "visits": visitas / n_users}
+        if dwell is not None:
+            d = np.array([dwell.get(s, 0.0) for s in self.states]) if isinstance(dwell, dict) else np.asarray(dwell)
+            res["time_in_state"] = res["visits"] * d
+            res["total_time"] = float(res["time_in_state"].sum())
+        return res
+
+
+def tiempo_medio_por_estado(data, states, key="timeInInterestState"):
+    """Minutos promedio que se queda un usuario en cada estado según los datos."""
+    res = {}
+    for s in states:
+        vals = [lib[key] for lib in data if lib.get("userInterestState") == s and key in lib]
+        res[s] = sum(vals) / len(vals) if vals else 0.0
+    return res
+
+
+def cargar_datos(filename="biblioteca3.json"):
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
 def recomendar_siguiente_estado(estado_actual, matriz_P, states):
@@ -102,35 +422,156 @@ def recomendar_siguiente_estado(estado_actual, matriz_P, states):
         return None
 
     i = states.index(estado_actual)
-    fila = matriz_P[i]
-    j = fila.index(max(fila))  # agarro el mayor
+    j = int(np.argmax(matriz_P[i]))  # agarro el mayor
     return states[j]
 
 
-def recomendar_libros_por_estado(data, estado, k=5):
+class StateTopIndex:
     """
-    Aquí solo filtro libros que coincidan con ese estado
-    y saco los más vistos. Nada fancy, pero funciona.
+    Libros ordenados por vistas dentro de cada estado de interés y de cada
+    (estado, género). Cada grupo es una lista ordenada de llaves
+    (-views, posición): el top-k es un slice O(k) y un cambio de vistas es
+    sacar y volver a insertar con bisect. La posición desempata igual que el
+    sort estable de antes (primero el que venía antes en el JSON).
+
+    El índice no se entera solo de nada: MarkovChain.observe cuenta
+    transiciones entre estados, no vistas de libros. Quien registre vistas
+    tiene que avisar con `update_views` (y `add_book` para libros nuevos);
+    cambiar `views` directo en el dict deja el orden viejo.
     """
-    filtrados = [lib for lib in data if lib.get("userInterestState") == estado]
-    ordenados = sorted(filtrados, key=lambda x: x.get("views", 0), reverse=True)
-    return ordenados[:k]
-
 
+    def __init__(self, data=(), state_key="userInterestState"):
+        self.state_key = state_key
+        self.books = []
+        self.pos = {}
+        self.groups = {}
+        for lib in data:
+            self.add_book(lib)
+
+    def _groups_of(self, lib):
+        estado = lib.get(self.state_key)
+        if estado is None:
+            return ()
+        return (estado, (estado, lib.get("genre")))
+
+    def add_book(self, lib):
+        p = len(self.books)
+        self.books.append(lib)
+        self.pos[lib["_id"]] = p
+        key = (-lib.get("views", 0), p)
+        for g in self._groups_of(lib):
+            bisect.insort(self.groups.setdefault(g, []), key)
+
+    def update_views(self, book_id, views):
+        """Cambia las vistas de un libro y lo reacomoda en sus grupos."""
+        p = self.pos[book_id]
+        lib = self.books[p]
+        viejo = (-lib.get("views", 0), p)
+        nuevo = (-views, p)
+        for g in self._groups_of(lib):
+            keys = self.groups[g]
+            del keys[bisect.bisect_left(keys, viejo)]
+            bisect.insort(keys, nuevo)
+        lib["views"] = views
+
+    def top(self, estado, k=5, genre=None):
+        keys = self.groups.get(estado if genre is None else (estado, genre), ())
+        return [self.books[p] for _, p in keys[:k]]
+
+
+def recomendar_libros_por_estado(data, estado, k=5, genre=None):
+    """
+    Aquí saco los libros más vistos de ese estado (y género, si se pide).
+    `data` puede ser la lista de libros o un StateTopIndex ya armado; con la
+    lista se arma el índice en el momento, así que si se va a llamar muchas
+    veces conviene pasar el índice.
+    """
+    if not isinstance(data, StateTopIndex):
+        data = StateTopIndex(data)
+    return data.top(estado, k, genre)
 
-# Pruebo todo esto con un ejemplo sencillito.
-
-estado_actual = "casual"  
-
-estado_predicho = recomendar_siguiente_estado(estado_actual, P, STATES)
-
-print("\nEstado actual del usuario:", estado_actual)
-print("Estado más probable al que pasará (Markov):", estado_predicho)
-
-# Ahora sí, recomiendooo
-recs = recomendar_libros_por_estado(data, estado_predicho, k=5)
-
-print(f"\nLibros recomendados para el estado '{estado_predicho}':\n")
-for r in recs:
-    print(f"- {r['title']} (views: {r['views']})")
 
+def recomendar_lote(estados_actuales, matriz_P, states, index, k=5, genres=None):
+    """
+    Recomendaciones para muchos usuarios de una: el siguiente estado de cada
+    uno sale de recomendar_siguiente_estado, pero se calcula una sola vez por
+    estado distinto (y el top-k una vez por estado/género distinto).
+    """
+    if genres is None:
+        genres = [None] * len(estados_actuales)
+    siguiente = {}
+    tops = {}
+    res = []
+    for estado, genre in zip(estados_actuales, genres):
+        if estado not in siguiente:
+            siguiente[estado] = recomendar_siguiente_estado(estado, matriz_P, states)
+        prox = siguiente[estado]
+        clave = (prox, genre)
+        if clave not in tops:
+            tops[clave] = index.top(prox, k, genre) if prox is not None else []
+        res.append(tops[clave])
+    return res
+
+
+def main():
+    # 1. Cargo el JSON pa' poder trabajar.
+    data = cargar_datos()
+    print("Registros cargados:", len(data))
+
+    # 2. Cuento las transiciones (anterior -> actual) y saco P.
+    # Si algo viene raro (un estado que no está en STATES) se salta.
+    chain = MarkovChain.from_records(data, STATES)
+    P = chain.P
+
+    print("\nMatriz de transición de estados de interés (P):\n")
+    for estado, fila in zip(STATES, P):
+        print(f"Desde '{estado}' -> ", end="")
+        print([round(float(x), 3) for x in fila])
+
+    # 3. Distribución estacionaria: “si el usuario navega mucho rato,
+    # ¿en qué estado termina quedándose más tiempo?”.
+    pi = chain.stationary()
+
+    print("\nDistribución estacionaria aproximada:\n")
+    for estado, valor in zip(STATES, pi):
+        print(f"{estado}: {valor:.3f}")
+
+    # 4. Pruebo todo esto con un ejemplo sencillito.
+    estado_actual = "casual"
+    estado_predicho = chain.most_likely_next(estado_actual)
+
+    print("\nEstado actual del usuario:", estado_actual)
+    print("Estado más probable al que pasará (Markov):", estado_predicho)
+
+    # Ahora sí, recomiendooo
+    index = StateTopIndex(data)
+    recs = recomendar_libros_por_estado(index, estado_predicho, k=5)
+
+    print(f"\nLibros recomendados para el estado '{estado_predicho}':\n")
+    for r in recs:
+        print(f"- {r['title']} (views: {r['views']})")
+
+    # 5. Y desde esos libros, caminata con reinicio sobre el grafo de
+    # contenido (contentSimilarity): lo que queda "cerca" de lo que ya vio.
+    grafo = ContentGraph.from_records(data)
+    por_id = {lib["_id"]: lib for lib in data}
+    vecinos = grafo.recommend([r["_id"] for r in recs], k=5)
+
+    print(f"\nSimilares por grafo de contenido ({grafo.n} libros, {grafo.edges} aristas):\n")
+    for book_id, score in vecinos:
+        print(f"- {por_id[book_id]['title']} (score: {score:.4f})")
+
+    # 6. Mirando más lejos: a dónde va a estar el usuario en k pasos y una
+    # simulación de muchos usuarios a la vez para ver cuánto tiempo pasan en
+    # cada estado (con los minutos promedio de timeInInterestState).
+    print(f"\nDesde '{estado_actual}' en 5 pasos:",
+          {s: round(float(p), 3) for s, p in zip(STATES, chain.forecast(estado_actual, 5))})
+    sim = chain.simulate(100000, steps=20, start=estado_actual,
+                         dwell=tiempo_medio_por_estado(data, STATES), seed=0)
+    print("\nMinutos esperados por estado en 20 pasos (100000 usuarios simulados):")
+    for s, minutos in zip(STATES, sim["time_in_state"]):
+        print(f"{s}: {minutos:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from content_graph import ContentGraph
+
+# 6 libros: b4 y b5 no tienen salidas (b5 solo por una arista de peso 0),
+# b0 -> b1 viene repetida y hay una arista a un id que no existe
+IDS = [f"b{i}" for i in range(6)]
+ARISTAS = [(0, 1, 0.5), (0, 1, 0.25), (0, 2, 0.25), (1, 2, 1.0), (1, 3, 3.0),
+           (2, 0, 2.0), (2, 4, 1.0), (3, 3, 1.0), (3, 0, 1.0), (3, 4, 0.5), (5, 0, 0.0)]
+
+
+def _denso(s, alpha=0.15, iters=2000):
+    """Iteración de potencias con la matriz completa, sin nada de CSR."""
+    n = len(IDS)
+    W = np.zeros((n, n))
+    for i, j, w in ARISTAS:
+        if w > 0:
+            W[i, j] += w
+    salida = W.sum(axis=1)
+    colgantes = salida == 0
+    P = np.divide(W, salida[:, None], out=np.zeros_like(W), where=~colgantes[:, None])
+    r = s.copy()
+    for _ in range(iters):
+        r = alpha * s + (1 - alpha) * (r @ P + r[colgantes].sum() * s)
+    return r
+
+
+def _grafo():
+    src, dst, w = zip(*ARISTAS)
+    return ContentGraph(IDS, src, dst, w)
+
+
+def test_pagerank_personalizado_igual_que_el_denso():
+    g = _grafo()
+    assert g.dangling.tolist() == [False, False, False, False, True, True]
+    semillas = [{"b0": 3.0, "b3": 1.0}, ["b4"], {"b2": 0.2, "b5": 0.8, "no_existe": 5.0}, ["no_existe"]]
+    R = g.personalized_pagerank(semillas, tol=1e-13, max_iter=2000)
+
+    esperados = [np.array([0.75, 0, 0, 0.25, 0, 0]), np.array([0, 0, 0, 0, 1.0, 0]),
+                 np.array([0, 0, 0.2, 0, 0, 0.8]), np.full(6, 1 / 6)]
+    for fila, s in zip(R, esperados):
+        assert np.allclose(fila, _denso(s), atol=1e-10)
+        assert np.isclose(fila.sum(), 1.0)
+
+
+def test_from_records_descarta_ids_desconocidos_y_suma_duplicados():
+    records = [{"_id": b, "contentSimilarity": [
+        {"relatedContentId": IDS[j], "transitionProbability": w, "similarityScore": 2.0}
+        for i, j, w in ARISTAS if IDS[i] == b] + [{"relatedContentId": "fantasma", "transitionProbability": 1.0}]}
+        for b in IDS]
+    g = ContentGraph.from_records(records)
+    assert g.edges == len({(i, j) for i, j, w in ARISTAS if w > 0})
+    s = np.array([0.0, 1.0, 0, 0, 0, 0])
+    assert np.allclose(g.personalized_pagerank([["b1"]], tol=1e-13, max_iter=2000)[0], _denso(s), atol=1e-10)
+    # Con "product" el score 2.0 escala todas las aristas igual: misma P
+    assert np.allclose(ContentGraph.from_records(records, weight="product").data, g.data)
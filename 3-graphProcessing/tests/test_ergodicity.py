@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from ergodicity import adjacency, strongly_connected_components
+
+
+def _csr(n, aristas):
+    M = np.zeros((n, n))
+    for u, v in aristas:
+        M[u, v] = 1.0
+    return adjacency(M)
+
+
+def _alcanzables(n, aristas):
+    vecinos = [[] for _ in range(n)]
+    for u, v in aristas:
+        vecinos[u].append(v)
+    res = []
+    for s in range(n):
+        vistos = {s}
+        pila = [s]
+        while pila:
+            for w in vecinos[pila.pop()]:
+                if w not in vistos:
+                    vistos.add(w)
+                    pila.append(w)
+        res.append(vistos)
+    return res
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_clases_igual_que_fuerza_bruta(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 40)
+    p = rng.choice([0.02, 0.05, 0.1, 0.3])
+    aristas = [(u, v) for u in range(n) for v in range(n) if rng.random() < p]
+    comp, k = strongly_connected_components(*_csr(n, aristas))
+
+    alc = _alcanzables(n, aristas)
+    for u in range(n):
+        for v in range(n):
+            # Misma clase <=> cada uno llega al otro
+            assert (comp[u] == comp[v]) == (v in alc[u] and u in alc[v])
+    assert k == len(set(comp.tolist()))
+    # Orden topológico inverso: las aristas entre clases van hacia clases menores
+    for u, v in aristas:
+        assert comp[u] >= comp[v]
+
+
+def test_camino_largo_sin_recursion():
+    n = 200000
+    indptr = np.arange(n + 1, dtype=np.int64)
+    indptr[-1] = n - 1
+    indices = np.arange(1, n, dtype=np.int64)
+    comp, k = strongly_connected_components(indptr, indices)
+    assert k == n
+    assert comp[-1] == 0 and comp[0] == n - 1
+
+    # Cerrando el ciclo queda una sola clase
+    indptr = np.arange(n + 1, dtype=np.int64)
+    indices = (np.arange(n, dtype=np.int64) + 1) % n
+    assert strongly_connected_components(indptr, indices)[1] == 1
@@ -0,0 +1,199 @@
+import numpy as np
+import pytest
+
+from markov import MarkovChain
+
+
+def _cadena(n, seed, densidad=0.6):
+    rng = np.random.default_rng(seed)
+    estados = [f"s{i}" for i in range(n)]
+    chain = MarkovChain(estados)
+    i = rng.integers(0, n, 20000)
+    j = rng.integers(0, n, 20000)
+    keep = rng.random(20000) < densidad
+    # Un ciclo 0 -> 1 -> ... -> 0 asegura que sea irreducible
+    chain.add_codes(np.r_[i[keep], np.arange(n)], np.r_[j[keep], (np.arange(n) + 1) % n])
+    return chain
+
+
+def _solve_lineal(P):
+    """pi (P - I) = 0 con sum(pi) = 1: se cambia una ecuación por la normalización."""
+    n = len(P)
+    A = P.T - np.eye(n)
+    A[-1] = 1.0
+    b = np.zeros(n)
+    b[-1] = 1.0
+    return np.linalg.solve(A, b)
+
+
+@pytest.mark.parametrize("n,seed", [(4, 0), (10, 1), (40, 2)])
+def test_estacionaria_igual_que_sistema_lineal(n, seed):
+    chain = _cadena(n, seed)
+    esperado = _solve_lineal(chain.P)
+    assert np.allclose(chain.stationary(), esperado, atol=1e-9)
+    assert np.allclose(chain.stationary("solve"), esperado, atol=1e-9)
+    assert np.allclose(esperado @ chain.P, esperado)
+
+
+def test_estacionaria_sigue_a_las_observaciones():
+    chain = _cadena(6, 3)
+    chain.stationary()
+    for a, b in [("s0", "s3"), ("s3", "s3"), ("s5", "s0")] * 200:
+        chain.observe(a, b)
+    assert np.allclose(chain.stationary(), _solve_lineal(chain.P), atol=1e-9)
+
+
+def test_P_no_cambia_por_debajo():
+    chain = _cadena(5, 4)
+    P = chain.P
+    antes = P.copy()
+    with pytest.raises(ValueError):
+        P[0, 0] = 1.0
+    chain.observe("s0", "s4")
+    assert np.array_equal(P, antes)
+    assert not np.array_equal(chain.P, antes)
+    assert np.allclose(chain.P.sum(axis=1), 1.0)
+
+
+def test_cadena_periodica_avisa_y_max_iter_va_en_la_cache():
+    chain = MarkovChain(["a", "b"])
+    chain.add_transitions(["a", "b"], ["b", "a"])
+    chain._warm = np.array([1.0, 0.0])
+    with pytest.warns(RuntimeWarning, match="no convergió"):
+        chain.stationary(max_iter=50)
+    # Otra vez: no quedó en caché, vuelve a avisar
+    with pytest.warns(RuntimeWarning):
+        chain.stationary(max_iter=51)
+    assert np.allclose(chain.stationary("solve"), [0.5, 0.5])
+
+    otra = _cadena(5, 5)
+    with pytest.warns(RuntimeWarning):
+        a = otra.stationary(max_iter=1)
+    b = otra.stationary(max_iter=10000)
+    assert a is not b
+
+
+@pytest.mark.parametrize("k", [-1, -8, 2.0, 1.5, "3", None])
+def test_potencia_con_k_invalido_falla(k):
+    chain = _cadena(4, 6)
+    with pytest.raises(ValueError):
+        chain.power(k)
+    with pytest.raises(ValueError):
+        chain.forecast("s0", k)
+
+
+def test_potencia_k_cero_y_entero_numpy():
+    chain = _cadena(4, 7)
+    assert np.array_equal(chain.power(0), np.eye(4))
+    assert np.allclose(chain.power(np.int64(5)), np.linalg.matrix_power(chain.P, 5))
+
+
+def _cadena_de(transiciones):
+    """{(a, b): conteo} -> MarkovChain con esos conteos."""
+    estados = sorted({s for par in transiciones for s in par})
+    chain = MarkovChain(estados)
+    for (a, b), c in transiciones.items():
+        chain.add_transitions([a] * c, [b] * c)
+    return chain
+
+
+def _fuerza_bruta(P, objetivo, pasos=20000):
+    """
+    Probabilidad de llegar y pasos esperados contando a mano: los objetivos
+    se vuelven absorbentes y se suma P(T > t) paso a paso desde cada estado.
+    """
+    n = len(P)
+    M = np.array(P)
+    M[objetivo] = 0.0
+    M[objetivo, objetivo] = 1.0
+    vacias = M.sum(axis=1) == 0
+    M[vacias, vacias] = 1.0
+    V = np.eye(n)
+    h = np.zeros(n)
+    for _ in range(pasos):
+        h += 1.0 - V[:, objetivo].sum(axis=1)
+        V = V @ M
+    return V[:, objetivo].sum(axis=1), h
+
+
+def test_hitting_time_infinito_si_no_llega_seguro():
+    # A llega a T la mitad de las veces; la otra mitad se queda en D para siempre
+    chain = _cadena_de({("A", "T"): 1, ("A", "D"): 1, ("D", "D"): 1, ("T", "T"): 1})
+    h = chain.hitting_times(["T"])
+    assert h.tolist() == [np.inf, np.inf, 0.0]
+    assert np.allclose(chain.reach_probability(["T"]), [0.5, 0.0, 1.0])
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_hitting_times_igual_que_fuerza_bruta(seed):
+    rng = np.random.default_rng(seed)
+    # s0..s4 se comunican; desde s3 se puede caer en la trampa s5 <-> s6
+    trans = {(f"s{i}", f"s{j}"): int(rng.integers(1, 5)) for i in range(5) for j in range(5)
+             if rng.random() < 0.6 or j == (i + 1) % 5}
+    trans[("s3", "s5")] = 1
+    trans[("s5", "s6")] = trans[("s6", "s5")] = 1
+    chain = _cadena_de(trans)
+    for targets in (["s0"], ["s2", "s4"], ["s5"]):
+        objetivo = chain._mask(targets)
+        prob, h_bruta = _fuerza_bruta(chain.P, objetivo)
+        h = chain.hitting_times(targets)
+        assert np.allclose(chain.reach_probability(targets), prob, atol=1e-9)
+        assert np.array_equal(np.isinf(h), prob < 1 - 1e-9)
+        assert np.allclose(h[np.isfinite(h)], h_bruta[np.isfinite(h)], rtol=1e-8)
+
+
+def test_absorcion_igual_que_fuerza_bruta():
+    # Dos absorbentes (X, Y), transitorios A, B, C y un ciclo cerrado D <-> E
+    chain = _cadena_de({("A", "B"): 2, ("A", "X"): 1, ("B", "A"): 1, ("B", "C"): 1, ("B", "Y"): 2,
+                        ("C", "A"): 1, ("C", "D"): 1, ("D", "E"): 1, ("E", "D"): 1,
+                        ("X", "X"): 1, ("Y", "Y"): 1})
+    assert chain.absorbing_states() == ["X", "Y"]
+    h, B = chain.absorption()
+
+    lejos = np.linalg.matrix_power(chain.P, 4000)
+    a = [chain.index["X"], chain.index["Y"]]
+    assert np.allclose(B, lejos[:, a], atol=1e-9)
+    # C puede caer en el ciclo: no se absorbe seguro
+    assert [chain.states[i] for i in np.flatnonzero(np.isinf(h))] == ["A", "B", "C", "D", "E"]
+    assert np.allclose(B[chain.index["D"]], 0.0)
+
+    # Sin el escape al ciclo todo se absorbe y los tiempos coinciden con la cuenta a mano
+    sin_ciclo = _cadena_de({("A", "B"): 2, ("A", "X"): 1, ("B", "A"): 1, ("B", "C"): 1, ("B", "Y"): 2,
+                            ("C", "A"): 1, ("C", "X"): 1, ("X", "X"): 1, ("Y", "Y"): 1})
+    h, B = sin_ciclo.absorption()
+    objetivo = sin_ciclo._mask(["X", "Y"])
+    prob, h_bruta = _fuerza_bruta(sin_ciclo.P, objetivo)
+    assert np.allclose(prob, 1.0)
+    assert np.allclose(h, h_bruta, rtol=1e-8)
+    assert np.allclose(B.sum(axis=1), 1.0)
+
+
+def test_potencia_y_pronostico_igual_que_multiplicar():
+    chain = _cadena(6, 8)
+    P = chain.P
+    dist = np.zeros(6)
+    dist[2] = 1.0
+    for k in (0, 1, 2, 7, 33):
+        assert np.allclose(chain.power(k), np.linalg.matrix_power(P, k))
+        esperado = dist.copy()
+        for _ in range(k):
+            esperado = esperado @ P
+        assert np.allclose(chain.forecast("s2", k), esperado)
+    assert np.allclose(chain.forecast({"s0": 1, "s1": 3}, 4), np.array([0.25, 0.75, 0, 0, 0, 0]) @ chain.power(4))
+
+
+def test_simular_se_parece_al_pronostico():
+    chain = _cadena(5, 9)
+    n_usuarios = 200000
+    sim = chain.simulate(n_usuarios, steps=6, start="s1", dwell={"s0": 2.0, "s3": 1.0}, seed=0)
+    for t in range(7):
+        # Monte Carlo: cada fracción está a unos pocos desvíos de la exacta
+        assert np.allclose(sim["occupancy"][t], chain.forecast("s1", t), atol=5 / np.sqrt(n_usuarios))
+    assert np.allclose(sim["visits"], sim["occupancy"].sum(axis=0))
+    assert np.isclose(sim["total_time"], 2.0 * sim["visits"][0] + 1.0 * sim["visits"][3])
+
+
+def test_simular_estado_sin_salidas_se_queda():
+    chain = _cadena_de({("a", "b"): 1})
+    sim = chain.simulate(1000, steps=3, start="a", seed=1)
+    assert sim["occupancy"].tolist() == [[1.0, 0.0], [0.0, 1.0], [0.0, 1.0], [0.0, 1.0]]
@@ -0,0 +1,28 @@
+import random
+
+from markov import StateTopIndex, recomendar_libros_por_estado
+
+
+def _top_ordenando(libros, estado, k, genre=None):
+    grupo = [l for l in libros if l["userInterestState"] == estado and (genre is None or l["genre"] == genre)]
+    return [l["_id"] for l in sorted(grupo, key=lambda l: -l["views"])[:k]]
+
+
+def test_top_sigue_a_update_views_y_add_book():
+    rng = random.Random(0)
+    estados, generos = ["casual", "focused", "research"], ["a", "b"]
+    libros = [{"_id": f"id_{i}", "views": rng.randrange(20), "userInterestState": rng.choice(estados),
+               "genre": rng.choice(generos)} for i in range(300)]
+    index = StateTopIndex(libros[:200])
+    for lib in libros[200:]:
+        index.add_book(lib)
+    for _ in range(2000):
+        lib = rng.choice(libros)
+        index.update_views(lib["_id"], max(0, lib["views"] + rng.randrange(-3, 6)))
+
+    for estado in estados:
+        for genre in [None] + generos:
+            for k in (1, 5, 50):
+                assert [l["_id"] for l in index.top(estado, k, genre)] == _top_ordenando(libros, estado, k, genre)
+    assert [l["_id"] for l in recomendar_libros_por_estado(libros, "focused", 7)] == \
+        _top_ordenando(libros, "focused", 7)
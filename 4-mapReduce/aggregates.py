@@ -0,0 +1,321 @@
+import heapq
+import math
+
+# Agregados "mergeables" para combiners y reducers: cada uno se puede llenar
+# con valores sueltos (add) o juntar con otro parcial (merge), así un
+# combiner en el map manda un solo objeto por llave en vez de todos los
+# valores, y el reducer junta parciales de todas las particiones.
+# Los que son invertibles también tienen subtract(otro): quita un parcial
+# que ya se había juntado (lo usa incremental.py para retirar un lote), o
+# ValueError si no se puede hacer exacto. TopK no: lo que ya salió del heap
+# no se puede recuperar.
+#
+#   SumCount        suma y conteo (promedio exacto)
+#   Moments         conteo, media y varianza (Welford / Chan et al.)
+#   QuantileSketch  cuantiles con error relativo acotado (estilo DDSketch)
+#   Summary         los tres juntos
+#   TopK            los k mejores con un heap de tamaño k
+
+
+class SumCount:
+    __slots__ = ("sum", "count")
+
+    def __init__(self):
+        self.sum = 0
+        self.count = 0
+
+    def add(self, x):
+        self.sum += x
+        self.count += 1
+
+    def merge(self, other):
+        self.sum += other.sum
+        self.count += other.count
+        return self
+
+    def subtract(self, other):
+        if other.count > self.count:
+            raise ValueError("No se puede quitar un parcial más grande que el total")
+        self.sum -= other.sum
+        self.count -= other.count
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Moments:
+    """Media y varianza en una pasada, estables numéricamente y mergeables."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        n = self.count + other.count
+        d = other.mean - self.mean
+        self.mean += d * other.count / n
+        self.m2 += other.m2 + d * d * self.count * other.count / n
+        self.count = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def subtract(self, other):
+        """
+        Inverso de merge (la misma fórmula de Chan despejada). El mínimo y el
+        máximo no se pueden recuperar si `other` los tenía: ValueError.
+        """
+        if not other.count:
+            return self
+        if other.count > self.count:
+            raise ValueError("No se puede quitar un parcial más grande que el total")
+        n = self.count - other.count
+        if not n:
+            self.__init__()
+            return self
+        if not (self.min < other.min and other.max < self.max):
+            raise ValueError("El parcial tenía el mínimo o el máximo: no se pueden recuperar")
+        mean = (self.count * self.mean - other.count * other.mean) / n
+        d = other.mean - mean
+        m2 = self.m2 - other.m2 - d * d * n * other.count / self.count
+        self.count, self.mean, self.m2 = n, mean, max(m2, 0.0)
+        return self
+
+    def variance(self, ddof=0):
+        return self.m2 / (self.count - ddof) if self.count > ddof else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance())
+
+
+class QuantileSketch:
+    """
+    Cubetas logarítmicas: x cae en la cubeta ceil(log_gamma(|x|)) con
+    gamma = (1 + alpha) / (1 - alpha), así cualquier cuantil sale con error
+    relativo <= alpha. Juntar dos sketches es sumar los conteos por cubeta.
+    """
+
+    __slots__ = ("alpha", "gamma", "_log_gamma", "pos", "neg", "zeros", "count")
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.pos = {}
+        self.neg = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _bucket(self, x):
+        return math.ceil(math.log(x) / self._log_gamma)
+
+    def add(self, x):
+        self.count += 1
+        if x > 0:
+            i = self._bucket(x)
+            self.pos[i] = self.pos.get(i, 0) + 1
+        elif x < 0:
+            i = self._bucket(-x)
+            self.neg[i] = self.neg.get(i, 0) + 1
+        else:
+            self.zeros += 1
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Los sketches de cuantiles deben tener el mismo alpha")
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for i, c in theirs.items():
+                mine[i] = mine.get(i, 0) + c
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def subtract(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Los sketches de cuantiles deben tener el mismo alpha")
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            if any(mine.get(i, 0) < c for i, c in theirs.items()):
+                raise ValueError("No se puede quitar un parcial más grande que el total")
+        if other.zeros > self.zeros:
+            raise ValueError("No se puede quitar un parcial más grande que el total")
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for i, c in theirs.items():
+                mine[i] -= c
+                # Las cubetas vacías se borran: quantile usa la mayor que haya
+                if not mine[i]:
+                    del mine[i]
+        self.zeros -= other.zeros
+        self.count -= other.count
+        return self
+
+    def _valor(self, i):
+        # Punto medio (en error relativo) de la cubeta i
+        return 2 * self.gamma ** i / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not 0 <= q <= 1:
+            raise ValueError(f"El cuantil tiene que estar en [0, 1], no {q}")
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        acumulado = 0
+        for i in sorted(self.neg, reverse=True):
+            acumulado += self.neg[i]
+            if acumulado > rank:
+                return -self._valor(i)
+        acumulado += self.zeros
+        if acumulado > rank:
+            return 0.0
+        for i in sorted(self.pos):
+            acumulado += self.pos[i]
+            if acumulado > rank:
+                return self._valor(i)
+        # Solo se llega aquí por redondeo de rank: el mayor valor que haya,
+        # que puede ser 0 o negativo si no hay positivos
+        if self.pos:
+            return self._valor(max(self.pos))
+        if self.zeros:
+            return 0.0
+        return -self._valor(min(self.neg))
+
+
+class Summary:
+    """Conteo, media, desviación, mínimo/máximo y cuantiles de una llave."""
+
+    __slots__ = ("moments", "quantiles")
+
+    def __init__(self, alpha=0.01):
+        self.moments = Moments()
+        self.quantiles = QuantileSketch(alpha)
+
+    def add(self, x):
+        self.moments.add(x)
+        self.quantiles.add(x)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+        return self
+
+    def subtract(self, other):
+        # Moments primero: es el que puede fallar (mínimo/máximo) y no toca nada si falla
+        self.moments.subtract(other.moments)
+        self.quantiles.subtract(other.quantiles)
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def std(self):
+        return self.moments.std
+
+    def quantile(self, q):
+        return self.quantiles.quantile(q)
+
+
+class Fold:
+    """
+    Combiner/reducer genérico: junta en un `cls()` tanto valores sueltos
+    (los que emite el mapper) como parciales ya combinados. Como es una
+    instancia de una clase de módulo, se puede mandar al pool de procesos.
+
+        Job(mapper, Fold(Summary), combiner=Fold(Summary))
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+
+    def __call__(self, _, valores):
+        acc = self.cls()
+        for v in valores:
+            if isinstance(v, self.cls):
+                acc.merge(v)
+            else:
+                acc.add(v)
+        return acc
+
+    def subtract(self, _, acc, parcial):
+        """
+        Inverso para Job(inverse=...): `acc` sin `parcial`, en una copia (acc
+        no se toca). None si no queda nada; ValueError si no se puede.
+        """
+        resto = self.cls().merge(acc).subtract(parcial)
+        return resto if resto.count else None
+
+
+class _Peor:
+    # Invierte el orden para que la raíz del min-heap sea el peor elemento
+    __slots__ = ("rank",)
+
+    def __init__(self, rank):
+        self.rank = rank
+
+    def __lt__(self, other):
+        return other.rank < self.rank
+
+
+class TopK:
+    """
+    Los k elementos con menor `rank(item)` (p. ej. rank = (-conteo, título)).
+    Memoria O(k): un heap cuya raíz es el peor de los k; cada elemento
+    nuevo cuesta O(log k). Dos TopK de particiones distintas se juntan con
+    merge.
+    """
+
+    def __init__(self, k, rank):
+        self.k = k
+        self.rank = rank
+        self.heap = []
+        self._seq = 0
+
+    def push(self, item):
+        r = self.rank(item)
+        entrada = (_Peor(r), -self._seq, item)
+        self._seq += 1
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entrada)
+        elif r < self.heap[0][0].rank:
+            heapq.heapreplace(self.heap, entrada)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+        return self
+
+    def merge(self, other):
+        return self.extend(other.items())
+
+    def items(self):
+        """Del mejor al peor."""
+        return [item for _, _, item in sorted(self.heap, key=lambda e: (e[0].rank, -e[1]))]
+
+
+def rank_por_valor(par):
+    """Rank para pares (llave, número): mayor valor primero, desempate por llave."""
+    return -par[1], par[0]
@@ -0,0 +1,352 @@
+import json
+import multiprocessing as mp
+import os
+import time
+import zlib
+from collections import defaultdict, deque
+
+from aggregates import TopK
+from streaming import en_bloques
+
+# Motor MapReduce chiquito pero de verdad:
+#
+#   splits --map--> (k, v) --combiner--> particiones --shuffle--> reduce
+#
+# - mapper(registro)        -> iterable de (llave, valor)
+# - combiner(llave, valores) -> un valor (opcional, corre dentro de cada
+#   tarea de map; tiene que ser compatible con el reducer)
+# - partitioner(llave, R)   -> número de reducer en [0, R)
+# - reducer(llave, valores) -> un valor
+# - top_k / rank (opcional): cada reducer se queda solo con sus `top_k`
+#   pares (llave, valor) de menor rank(par) y el coordinador junta esos
+#   heaps, así de cada partición sale O(k) en vez de O(llaves)
+# - inverse(llave, acc, parcial) (opcional, con combiner): el parcial
+#   acumulado sin `parcial`, None si la llave queda vacía o ValueError si no
+#   se puede invertir exacto. Lo usa incremental.py para retirar lotes.
+#
+# Las tareas de map y de reduce corren en un pool de procesos, así que las
+# funciones tienen que estar definidas a nivel de módulo (se pasan por
+# pickle). Con workers=1 todo corre en el mismo proceso, sin pool.
+
+
+def hash_partitioner(key, num_reducers):
+    """Hash estable (crc32): el hash() de Python cambia entre procesos."""
+    return zlib.crc32(repr(key).encode("utf-8")) % num_reducers
+
+
+def splits_por_particion(data, field="mapReducePartition"):
+    """Un split de entrada por cada valor de `field` (como bloques de HDFS)."""
+    grupos = defaultdict(list)
+    for registro in data:
+        grupos[registro.get(field)].append(registro)
+    return [grupos[k] for k in sorted(grupos, key=lambda x: (x is None, x))]
+
+
+def splits_fijos(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class Job:
+    def __init__(self, mapper, reducer, combiner=None, partitioner=hash_partitioner,
+                 num_reducers=None, name=None, top_k=None, rank=None, inverse=None):
+        if top_k is not None and rank is None:
+            raise ValueError("top_k necesita una función rank(par)")
+        if inverse is not None and combiner is None:
+            raise ValueError("inverse necesita un combiner (se invierte el parcial combinado)")
+        self.mapper = mapper
+        self.reducer = reducer
+        self.combiner = combiner
+        self.partitioner = partitioner
+        self.num_reducers = num_reducers
+        self.name = name or getattr(mapper, "__name__", "job")
+        self.top_k = top_k
+        self.rank = rank
+        self.inverse = inverse
+
+    def _top(self, pares):
+        if self.top_k is None:
+            return list(pares)
+        return TopK(self.top_k, self.rank).extend(pares).items()
+
+    def merge_partials(self, acc, parcial):
+        """
+        Junta `parcial` ({llave: parcial}) dentro de `acc`: con el combiner si
+        hay, si no concatenando las listas de valores.
+        """
+        if self.combiner is None:
+            for k, vs in parcial.items():
+                acc.setdefault(k, []).extend(vs)
+        else:
+            for k, v in parcial.items():
+                acc[k] = self.combiner(k, (acc[k], v)) if k in acc else v
+        return acc
+
+    def subtract_partials(self, acc, parcial):
+        """
+        Quita `parcial` de `acc` con `inverse` (las llaves que quedan vacías
+        se borran). Devuelve las llaves que no se pudieron invertir: esas
+        quedan como estaban y hay que rehacerlas desde los parciales.
+        """
+        malas = []
+        for k, v in parcial.items():
+            try:
+                resto = self.inverse(k, acc[k], v)
+            except (KeyError, ValueError):
+                malas.append(k)
+                continue
+            if resto is None:
+                del acc[k]
+            else:
+                acc[k] = resto
+        return malas
+
+    def reduce_partials(self, acc):
+        """Reducer (y top_k) sobre los parciales ya juntados de todas las llaves."""
+        if self.combiner is None:
+            return self._top((k, self.reducer(k, vs)) for k, vs in acc.items())
+        return self._top((k, self.reducer(k, (v,))) for k, v in acc.items())
+
+
+class JobResult:
+    def __init__(self, output, counters):
+        self.output = output
+        self.counters = counters
+
+    def as_dict(self):
+        return dict(self.output)
+
+    def __iter__(self):
+        return iter(self.output)
+
+    def __len__(self):
+        return len(self.output)
+
+
+def _map_task(args):
+    mapper, combiner, partitioner, num_reducers, split = args
+    t0 = time.perf_counter()
+    grupos = defaultdict(list)
+    emitidos = 0
+    for registro in split:
+        for k, v in mapper(registro):
+            grupos[k].append(v)
+            emitidos += 1
+    t1 = time.perf_counter()
+
+    if combiner is not None:
+        pares = [(k, combiner(k, vs)) for k, vs in grupos.items()]
+    else:
+        pares = [(k, v) for k, vs in grupos.items() for v in vs]
+    t2 = time.perf_counter()
+
+    buckets = [[] for _ in range(num_reducers)]
+    for k, v in pares:
+        buckets[partitioner(k, num_reducers)].append((k, v))
+    t3 = time.perf_counter()
+
+    stats = {"input_records": len(split), "map_output_records": emitidos,
+             "combine_output_records": len(pares),
+             "map_s": t1 - t0, "combine_s": t2 - t1, "partition_s": t3 - t2}
+    return buckets, stats
+
+
+def _reduce_task(args):
+    reducer, top_k, rank, buckets = args
+    t0 = time.perf_counter()
+    grupos = defaultdict(list)
+    for bucket in buckets:
+        for k, v in bucket:
+            grupos[k].append(v)
+    t1 = time.perf_counter()
+    salida = ((k, reducer(k, vs)) for k, vs in grupos.items())
+    if top_k is None:
+        salida = list(salida)
+    else:
+        salida = TopK(top_k, rank).extend(salida).items()
+    t2 = time.perf_counter()
+    return salida, {"reduce_groups": len(grupos), "sort_s": t1 - t0, "reduce_s": t2 - t1}
+
+
+def _fused_task(args):
+    """Un bloque de registros pasa una sola vez por todos los mappers."""
+    enrich, specs, bloque = args
+    t0 = time.perf_counter()
+    lineas = []
+    if enrich is not None:
+        for registro in bloque:
+            lineas.append(json.dumps(enrich(registro), ensure_ascii=False, separators=(",", ":")))
+    t1 = time.perf_counter()
+
+    parciales = []
+    emitidos = 0
+    for mapper, combiner in specs:
+        grupos = defaultdict(list)
+        for registro in bloque:
+            for k, v in mapper(registro):
+                grupos[k].append(v)
+                emitidos += 1
+        if combiner is not None:
+            grupos = {k: combiner(k, vs) for k, vs in grupos.items()}
+        parciales.append(grupos)
+    t2 = time.perf_counter()
+
+    lado = "\n".join(lineas) + "\n" if lineas else ""
+    return parciales, lado, {"input_records": len(bloque), "map_output_records": emitidos,
+                             "enrich_s": t1 - t0, "map_s": t2 - t1}
+
+
+class MapReduceEngine:
+    """
+    Corre Jobs sobre una lista de splits. Los contadores de cada corrida
+    (registros por fase y segundos por fase) quedan en `JobResult.counters`;
+    los tiempos de map/combine/reduce son la suma sobre todas las tareas
+    (tiempo de CPU de los workers), `wall_*` es el tiempo real de la fase.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def _map(self, fn, tasks):
+        if self.workers == 1:
+            return [fn(t) for t in tasks]
+        if self._pool is None:
+            self._pool = mp.get_context().Pool(self.workers)
+        return self._pool.map(fn, tasks, chunksize=1)
+
+    def run(self, job, splits):
+        R = job.num_reducers or self.workers
+        inicio = time.perf_counter()
+
+        resultados = self._map(_map_task, [(job.mapper, job.combiner, job.partitioner, R, s)
+                                           for s in splits])
+        t_map = time.perf_counter()
+
+        # Shuffle: cada reducer recibe su bucket de cada tarea de map
+        por_reducer = [[buckets[r] for buckets, _ in resultados] for r in range(R)]
+        t_shuffle = time.perf_counter()
+
+        reducidos = self._map(_reduce_task, [(job.reducer, job.top_k, job.rank, b)
+                                             for b in por_reducer])
+        fin = time.perf_counter()
+
+        counters = defaultdict(float)
+        for _, stats in resultados:
+            for k, v in stats.items():
+                counters[k] += v
+        for _, stats in reducidos:
+            for k, v in stats.items():
+                counters[k] += v
+        # Con top_k cada reducer ya mandó solo sus k mejores: aquí se juntan
+        output = job._top(par for salida, _ in reducidos for par in salida)
+        counters.update({
+            "job": job.name, "splits": len(splits), "reducers": R, "workers": self.workers,
+            "shuffle_records": sum(len(b) for bs in por_reducer for b in bs),
+            "output_records": len(output),
+            "wall_map_s": t_map - inicio, "wall_shuffle_s": t_shuffle - t_map,
+            "wall_reduce_s": fin - t_shuffle, "wall_total_s": fin - inicio,
+        })
+        for k in ("input_records", "map_output_records", "combine_output_records", "reduce_groups"):
+            counters[k] = int(counters[k])
+        return JobResult(output, dict(counters))
+
+    def run_fused(self, jobs, registros, chunk_size=5000, enrich=None, side_file=None):
+        """
+        Modo fusionado y en streaming: cada bloque de `registros` (cualquier
+        iterable, p. ej. streaming.leer_registros) pasa una sola vez por los
+        mappers de todos los `jobs`. Cada tarea combina lo suyo y el
+        coordinador va juntando los parciales con el combiner, así la memoria
+        depende de las llaves distintas, no del tamaño de la entrada. Como
+        mucho hay 2 bloques por worker en vuelo.
+
+        `enrich(registro)` (opcional) completa el registro antes de los
+        mappers y devuelve un dict que se escribe como una línea JSONL
+        compacta en `side_file`.
+
+        Devuelve {job.name: JobResult}.
+        """
+        acumulado, counters = self.run_partials(jobs, registros, chunk_size, enrich, side_file)
+        t_map = time.perf_counter()
+
+        resultados = {}
+        for job, acc in zip(jobs, acumulado):
+            t0 = time.perf_counter()
+            output = job.reduce_partials(acc)
+            resultados[job.name] = JobResult(output, {
+                "job": job.name, "workers": self.workers, "fused_jobs": len(jobs),
+                "input_records": int(counters["input_records"]),
+                "chunks": int(counters["chunks"]),
+                "reduce_groups": len(acc), "output_records": len(output),
+                "reduce_s": time.perf_counter() - t0,
+            })
+
+        comunes = {
+            "map_output_records": int(counters["map_output_records"]),
+            "map_s": counters["map_s"], "enrich_s": counters["enrich_s"],
+            "merge_s": counters["merge_s"], "wall_map_s": counters["wall_map_s"],
+            "wall_total_s": time.perf_counter() - t_map + counters["wall_map_s"],
+        }
+        for r in resultados.values():
+            r.counters.update(comunes)
+        return resultados
+
+    def run_partials(self, jobs, registros, chunk_size=5000, enrich=None, side_file=None):
+        """
+        La pasada de run_fused sin el reduce: devuelve ([{llave: parcial}
+        por job], contadores). Sirve para guardar el estado combinado y
+        juntarlo después con Job.merge_partials (ver incremental.py).
+        """
+        specs = [(job.mapper, job.combiner) for job in jobs]
+        acumulado = [{} for _ in jobs]
+        counters = defaultdict(float)
+        lado = open(side_file, "w", encoding="utf-8") if side_file else None
+        inicio = time.perf_counter()
+        t_merge = 0.0
+
+        def juntar(resultado):
+            nonlocal t_merge
+            parciales, texto, stats = resultado
+            t0 = time.perf_counter()
+            for job, acc, parcial in zip(jobs, acumulado, parciales):
+                job.merge_partials(acc, parcial)
+            if lado is not None and texto:
+                lado.write(texto)
+            t_merge += time.perf_counter() - t0
+            for k, v in stats.items():
+                counters[k] += v
+            counters["chunks"] += 1
+
+        try:
+            tareas = ((enrich, specs, b) for b in en_bloques(registros, chunk_size))
+            if self.workers == 1:
+                for t in tareas:
+                    juntar(_fused_task(t))
+            else:
+                if self._pool is None:
+                    self._pool = mp.get_context().Pool(self.workers)
+                # Se espera al bloque más viejo: la salida lateral sale en orden
+                en_vuelo = deque()
+                for t in tareas:
+                    en_vuelo.append(self._pool.apply_async(_fused_task, (t,)))
+                    if len(en_vuelo) >= 2 * self.workers:
+                        juntar(en_vuelo.popleft().get())
+                while en_vuelo:
+                    juntar(en_vuelo.popleft().get())
+        finally:
+            if lado is not None:
+                lado.close()
+        counters["merge_s"] = t_merge
+        counters["wall_map_s"] = time.perf_counter() - inicio
+        return acumulado, counters
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
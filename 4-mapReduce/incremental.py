@@ -0,0 +1,445 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import time
+from datetime import datetime
+
+from engine import Job, MapReduceEngine
+from mapreduce import CONTADOR_LIBROS, JOBS, PROMEDIO_LECTURA, REPORTE_AUTORES
+from streaming import leer_registros
+
+# Recomputación incremental por lote (batchId). En vez de correr los jobs
+# sobre toda la historia cada noche:
+#
+#   - los lotes nuevos pasan solo por map + combine, todos juntos en una
+#     sola corrida (MapReduceEngine.run_partials con la llave (batchId,
+#     llave)), y sus parciales por llave ({llave: parcial} por job) se
+#     guardan en el almacén de estado, un directorio local. Los lotes chicos
+#     se empaquetan: un archivo por cada ~5000 registros, no uno por lote;
+#   - la vista materializada (los parciales de todos los lotes ya juntados
+#     con Job.merge_partials) se actualiza juntándole solo lo nuevo;
+#   - el reduce final (promedios, top-k) corre sobre la vista, que es O(llaves);
+#   - si un lote llega corregido (otra huella) o se borra, se retira: su
+#     parcial viejo se resta de la vista con Job.inverse (conteos, sumas,
+#     Moments y las cubetas del sketch de cuantiles son invertibles). Solo
+#     las llaves que no se pueden invertir exacto (p. ej. el lote tenía el
+#     mínimo de una categoría) y los jobs sin inverse se rehacen desde los
+#     parciales guardados, sin volver a leer los registros de los demás lotes.
+#
+# Así el costo de una actualización depende del lote nuevo (y del retirado),
+# no del total de registros.
+#
+#   python incremental.py agregar nuevos.jsonl                (agrupa por batchId)
+#   python incremental.py agregar nuevos.jsonl --lote batch_2025_01_07
+#   python incremental.py retirar batch_2025_01_07
+#   python incremental.py mostrar
+
+
+def huella(registros):
+    """
+    Huella del contenido de un lote, sin importar el orden de los registros:
+    suma (mod 2^64) del hash de cada registro serializado con llaves ordenadas.
+    """
+    total = 0
+    for r in registros:
+        h = hashlib.blake2b(json.dumps(r, sort_keys=True).encode("utf-8"), digest_size=8)
+        total = (total + int.from_bytes(h.digest(), "big")) % (1 << 64)
+    return f"{len(registros)}:{total:016x}"
+
+
+def empaquetar(tamanos, maximo):
+    """
+    Agrupa los lotes de {batchId: registros} en paquetes de hasta `maximo`
+    registros, en orden; un lote más grande que `maximo` va solo.
+    """
+    paquetes, actual, n = [], [], 0
+    for batch_id, t in tamanos.items():
+        if actual and n + t > maximo:
+            paquetes.append(actual)
+            actual, n = [], 0
+        actual.append(batch_id)
+        n += t
+    if actual:
+        paquetes.append(actual)
+    return paquetes
+
+
+class _MapperPorLote:
+    # Recibe pares (batchId, registro) y le agrega el lote a cada llave
+    def __init__(self, mapper):
+        self.mapper = mapper
+
+    def __call__(self, par):
+        batch_id, registro = par
+        for k, v in self.mapper(registro):
+            yield (batch_id, k), v
+
+
+class _CombinerPorLote:
+    def __init__(self, combiner):
+        self.combiner = combiner
+
+    def __call__(self, llave, valores):
+        return self.combiner(llave[1], valores)
+
+
+def _por_lote(job):
+    combiner = job.combiner and _CombinerPorLote(job.combiner)
+    return Job(_MapperPorLote(job.mapper), job.reducer, combiner=combiner, name=job.name)
+
+
+def agrupar_por_lote(registros, lote=None):
+    """{batchId: [registros]}; con `lote` todos van a ese lote (y se les pone el batchId)."""
+    lotes = {}
+    for r in registros:
+        if lote is not None:
+            r["batchId"] = lote
+        lotes.setdefault(r.get("batchId", "sin_lote"), []).append(r)
+    return lotes
+
+
+class StateStore:
+    """
+    Directorio con el estado de los jobs:
+        manifest.json                  lotes aplicados (registros, huella, fecha,
+                                       archivo) y jobs
+        lotes/<batchId>-<huella>.pkl   parciales de un paquete de lotes,
+                                       {batchId: {job: {llave: parcial}}}
+        materializado.pkl              parciales de todos los lotes ya juntados
+    Cada archivo se escribe aparte y se renombra encima (os.replace), y el
+    manifest va al final: si algo se corta a medias, la vista no coincide
+    con el manifest y se reconstruye desde los parciales.
+    Los parciales de un lote corregido van a un archivo nuevo (el nombre
+    lleva la huella del paquete) y el viejo se borra recién después de
+    escribir el manifest, y solo si ya ningún lote lo usa: hasta entonces el
+    manifest en disco sigue apuntando a parciales que existen. Lo que quede
+    huérfano de una corrida cortada se borra al abrir el almacén.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dir_lotes = os.path.join(path, "lotes")
+        os.makedirs(self.dir_lotes, exist_ok=True)
+        self.manifest = self._leer_json("manifest.json") or {"jobs": None, "batches": {}}
+        self.por_borrar = set()
+        self._cache = (None, None)
+        self._limpiar_huerfanos()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.path, nombre)
+
+    def _archivo_paquete(self, paquete):
+        # El batchId viene de los datos: nada de separadores de ruta
+        seguro = re.sub(r"[^A-Za-z0-9_.-]", "_", str(next(iter(paquete))))
+        llave = "\0".join(f"{b}\0{info['fingerprint']}" for b, (_, info) in paquete.items())
+        digest = hashlib.blake2b(llave.encode("utf-8"), digest_size=8).hexdigest()
+        return f"{seguro}-{digest}.pkl"
+
+    def _en_uso(self):
+        return {info["file"] for info in self.manifest["batches"].values()}
+
+    def _limpiar_huerfanos(self):
+        en_uso = self._en_uso()
+        for nombre in os.listdir(self.dir_lotes):
+            if nombre not in en_uso:
+                os.remove(os.path.join(self.dir_lotes, nombre))
+
+    def _leer_json(self, nombre):
+        try:
+            with open(self._ruta(nombre), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _escribir(path, escribir, modo="wb"):
+        tmp = path + ".tmp"
+        with open(tmp, modo, **({} if "b" in modo else {"encoding": "utf-8"})) as f:
+            escribir(f)
+        os.replace(tmp, path)
+
+    def _pickle(self, path, obj):
+        self._escribir(path, lambda f: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _unpickle(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def check_jobs(self, nombres):
+        if self.manifest["jobs"] is None:
+            self.manifest["jobs"] = list(nombres)
+        elif self.manifest["jobs"] != list(nombres):
+            raise ValueError(f"El estado en {self.path} es de los jobs {self.manifest['jobs']}, "
+                             f"no de {list(nombres)}")
+
+    def batches(self):
+        return self.manifest["batches"]
+
+    def fingerprint(self, batch_id):
+        info = self.manifest["batches"].get(batch_id)
+        return info and info["fingerprint"]
+
+    def _cargar(self, nombre):
+        # Los lotes de un paquete se suelen leer seguidos: se guarda el último archivo
+        if self._cache[0] != nombre:
+            self._cache = (nombre, self._unpickle(os.path.join(self.dir_lotes, nombre)))
+        return self._cache[1]
+
+    def load_partials(self, batch_id):
+        return self._cargar(self.manifest["batches"][batch_id]["file"])[batch_id]
+
+    def iter_partials(self):
+        """(batchId, parciales) de todos los lotes, leyendo cada archivo una sola vez."""
+        por_archivo = {}
+        for batch_id, info in self.manifest["batches"].items():
+            por_archivo.setdefault(info["file"], []).append(batch_id)
+        for nombre, batch_ids in por_archivo.items():
+            contenido = self._cargar(nombre)
+            for batch_id in batch_ids:
+                yield batch_id, contenido[batch_id]
+
+    def save_partials(self, paquete):
+        """
+        Guarda {batchId: (parciales, info)} en un solo archivo nuevo; los
+        archivos anteriores de esos lotes se borran en commit.
+        """
+        nombre = self._archivo_paquete(paquete)
+        self._pickle(os.path.join(self.dir_lotes, nombre),
+                     {batch_id: parciales for batch_id, (parciales, _) in paquete.items()})
+        for batch_id, (_, info) in paquete.items():
+            self.delete_batch(batch_id)
+            self.manifest["batches"][batch_id] = dict(info, file=nombre)
+
+    def delete_batch(self, batch_id):
+        info = self.manifest["batches"].pop(batch_id, None)
+        if info is not None:
+            self.por_borrar.add(info["file"])
+
+    def load_view(self):
+        """La vista materializada, o None si falta o no coincide con el manifest."""
+        try:
+            vista = self._unpickle(self._ruta("materializado.pkl"))
+        except FileNotFoundError:
+            return None
+        huellas = {b: i["fingerprint"] for b, i in self.manifest["batches"].items()}
+        return vista["acc"] if vista["batches"] == huellas else None
+
+    def commit(self, acc):
+        huellas = {b: i["fingerprint"] for b, i in self.manifest["batches"].items()}
+        self._pickle(self._ruta("materializado.pkl"), {"batches": huellas, "acc": acc})
+        self._escribir(self._ruta("manifest.json"),
+                       lambda f: json.dump(self.manifest, f, indent=2, ensure_ascii=False), "w")
+        # Recién ahora nadie apunta a los archivos viejos (salvo que se hayan vuelto a escribir)
+        for nombre in self.por_borrar - self._en_uso():
+            try:
+                os.remove(os.path.join(self.dir_lotes, nombre))
+            except FileNotFoundError:
+                pass
+        self.por_borrar = set()
+
+
+class IncrementalRunner:
+    """
+    Mantiene los resultados de `jobs` al día lote por lote sobre un
+    StateStore. Los jobs necesitan combiner (o sea, parciales mergeables);
+    sin combiner también funciona, pero el parcial es la lista de valores.
+    """
+
+    def __init__(self, jobs, store, engine):
+        self.jobs = list(jobs)
+        self.store = store
+        self.engine = engine
+        store.check_jobs(job.name for job in self.jobs)
+        self.acc = store.load_view()
+        self.rebuilt = False
+        if self.acc is None:
+            self.rebuild()
+
+    def rebuild(self):
+        """Junta de nuevo los parciales de todos los lotes guardados (sin leer registros)."""
+        self.acc = {job.name: {} for job in self.jobs}
+        self._rehacer({job.name: None for job in self.jobs})
+        self.rebuilt = True
+
+    def _juntar(self, parciales):
+        for job in self.jobs:
+            job.merge_partials(self.acc[job.name], parciales[job.name])
+
+    def _restar(self, parciales, pendientes):
+        """
+        Quita de la vista los parciales de un lote retirado. Lo que no se
+        puede invertir queda anotado en `pendientes` ({job: llaves}, o
+        {job: None} para todo el job) para _rehacer.
+        """
+        for job in self.jobs:
+            if job.inverse is None or job.name in pendientes and pendientes[job.name] is None:
+                pendientes[job.name] = None
+                continue
+            malas = job.subtract_partials(self.acc[job.name], parciales[job.name])
+            if malas:
+                pendientes.setdefault(job.name, set()).update(malas)
+
+    def _rehacer(self, pendientes):
+        """Rehace solo las llaves (o jobs) de `pendientes` desde los parciales guardados."""
+        if not pendientes:
+            return
+        for job in self.jobs:
+            if job.name not in pendientes:
+                continue
+            llaves = pendientes[job.name]
+            if llaves is None:
+                self.acc[job.name] = {}
+            else:
+                for k in llaves:
+                    self.acc[job.name].pop(k, None)
+        for _, parciales in self.store.iter_partials():
+            for job in self.jobs:
+                if job.name not in pendientes:
+                    continue
+                parcial, llaves = parciales[job.name], pendientes[job.name]
+                if llaves is not None:
+                    parcial = {k: parcial[k] for k in llaves if k in parcial}
+                job.merge_partials(self.acc[job.name], parcial)
+
+    def _parciales(self, lotes, chunk_size):
+        """
+        Map + combine de todos los lotes en una sola corrida del motor (la
+        llave lleva el batchId): {batchId: {job: {llave: parcial}}}.
+        """
+        pares = ((batch_id, r) for batch_id, registros in lotes.items() for r in registros)
+        acumulado, _ = self.engine.run_partials([_por_lote(job) for job in self.jobs], pares, chunk_size)
+        parciales = {batch_id: {job.name: {} for job in self.jobs} for batch_id in lotes}
+        for job, acc in zip(self.jobs, acumulado):
+            for (batch_id, k), v in acc.items():
+                parciales[batch_id][job.name][k] = v
+        return parciales
+
+    def apply(self, lotes, chunk_size=5000, por_archivo=5000):
+        """
+        Aplica {batchId: registros}. Un lote nuevo se procesa y se junta a la
+        vista; uno que ya estaba con la misma huella se salta; uno que ya
+        estaba con otra huella (corregido) se retira (su parcial viejo se
+        resta de la vista) y se reprocesa. Los lotes que cambian se guardan
+        en paquetes de hasta `por_archivo` registros.
+        """
+        inicio = time.perf_counter()
+        stats = {"new": [], "corrected": [], "unchanged": [], "records_processed": 0}
+        cambiados = {}
+        for batch_id, registros in lotes.items():
+            h = huella(registros)
+            anterior = self.store.fingerprint(batch_id)
+            if anterior == h:
+                stats["unchanged"].append(batch_id)
+                continue
+            stats["corrected" if anterior else "new"].append(batch_id)
+            cambiados[batch_id] = (registros, h)
+            stats["records_processed"] += len(registros)
+
+        nuevos = self._parciales({b: registros for b, (registros, _) in cambiados.items()},
+                                 chunk_size) if cambiados else {}
+        pendientes = {}
+        for batch_id in stats["corrected"]:
+            # Lo viejo de este lote ya está mezclado en la vista
+            self._restar(self.store.load_partials(batch_id), pendientes)
+        ahora = datetime.now().isoformat(timespec="seconds")
+        for paquete in empaquetar({b: len(registros) for b, (registros, _) in cambiados.items()}, por_archivo):
+            self.store.save_partials({b: (nuevos[b], {"records": len(cambiados[b][0]),
+                                                      "fingerprint": cambiados[b][1], "updated": ahora})
+                                      for b in paquete})
+
+        for parciales in nuevos.values():
+            self._juntar(parciales)
+        # Lo que no se pudo restar se rehace desde los parciales (ya con los lotes nuevos)
+        self._rehacer(pendientes)
+        stats["rebuilt_keys"] = {name: "todas" if llaves is None else len(llaves)
+                                 for name, llaves in pendientes.items()}
+        if nuevos or self.rebuilt:
+            self.store.commit(self.acc)
+            self.rebuilt = False
+        stats["seconds"] = time.perf_counter() - inicio
+        return stats
+
+    def retract(self, batch_ids):
+        """Borra lotes (p. ej. datos retirados) y resta sus parciales de la vista."""
+        quitados = [b for b in dict.fromkeys(batch_ids) if b in self.store.batches()]
+        pendientes = {}
+        for b in quitados:
+            self._restar(self.store.load_partials(b), pendientes)
+            self.store.delete_batch(b)
+        if quitados:
+            self._rehacer(pendientes)
+            self.store.commit(self.acc)
+        return quitados
+
+    def results(self):
+        """{job.name: salida del reducer} sobre la vista materializada."""
+        return {job.name: job.reduce_partials(self.acc[job.name]) for job in self.jobs}
+
+
+def mostrar(runner):
+    lotes = runner.store.batches()
+    print(f"Lotes aplicados: {len(lotes)}, registros: {sum(i['records'] for i in lotes.values())}")
+    res = runner.results()
+
+    print("\nTop libros más 'prestados':")
+    for titulo, conteo in res[CONTADOR_LIBROS.name]:
+        print(f"- {titulo} -> {conteo} checkouts aprox.")
+
+    print("\nPromedio de tiempo de lectura por categoría:")
+    for categoria, s in sorted(res[PROMEDIO_LECTURA.name], key=lambda x: -x[1].mean):
+        print(f"- {categoria}: {s.mean:.2f} minutos (desv. {s.std:.2f}, n={s.count})")
+
+    print("\nTop libros con su autor y número de checkouts:")
+    for _, item in res[REPORTE_AUTORES.name]:
+        print(f"- {item['author']} – {item['title']} -> {item['totalCheckouts']} checkouts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jobs de MapReduce incrementales por lote (batchId)")
+    parser.add_argument("--estado", default="estado_mr", help="directorio del almacén de estado")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--por-archivo", type=int, default=5000,
+                        help="registros por archivo de parciales (los lotes chicos se empaquetan)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("agregar", help="procesa lotes nuevos o corregidos")
+    p.add_argument("datos", help="arreglo JSON o JSONL con los registros")
+    p.add_argument("--lote", default=None, help="todos los registros son de este lote (si no, su batchId)")
+
+    p = sub.add_parser("retirar", help="quita lotes y rehace los resultados")
+    p.add_argument("lotes", nargs="+")
+
+    sub.add_parser("reconstruir", help="rehace la vista desde los parciales guardados")
+    sub.add_parser("mostrar", help="imprime los resultados actuales")
+    args = parser.parse_args()
+
+    with MapReduceEngine(args.workers) as engine:
+        runner = IncrementalRunner(JOBS, StateStore(args.estado), engine)
+        if runner.rebuilt and runner.store.batches():
+            print("La vista no coincidía con el manifest: se reconstruyó desde los parciales.")
+
+        if args.comando == "agregar":
+            lotes = agrupar_por_lote(leer_registros(args.datos), args.lote)
+            s = runner.apply(lotes, args.chunk, args.por_archivo)
+            print(f"Lotes nuevos: {len(s['new'])}, corregidos: {len(s['corrected'])}, "
+                  f"sin cambios: {len(s['unchanged'])} | {s['records_processed']} registros "
+                  f"procesados en {s['seconds'] * 1000:.1f} ms\n")
+        elif args.comando == "retirar":
+            quitados = runner.retract(args.lotes)
+            faltan = sorted(set(args.lotes) - set(quitados))
+            print(f"Lotes retirados: {len(quitados)}" + (f" (no estaban: {', '.join(faltan)})" if faltan else "") + "\n")
+        elif args.comando == "reconstruir":
+            runner.rebuild()
+            runner.store.commit(runner.acc)
+            print("Vista reconstruida.\n")
+
+        mostrar(runner)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+
+# Joins para cuando los datos no caben (o podrían no caber) en memoria.
+#
+# - hash_join: el lado chico va a un dict (broadcast, como un map-side join
+#   de Hadoop) y el grande pasa en streaming.
+# - sort_merge_join: los dos lados se ordenan por llave con ExternalSorter
+#   (corridas ordenadas que se vuelcan a disco al pasar el presupuesto de
+#   memoria + merge de k vías) y después se recorren juntos una sola vez.
+# - join: elige entre los dos según cuántos registros tiene cada lado.
+#
+# Las llaves pueden ser una función o el nombre de un campo. El presupuesto
+# de memoria se mide en registros.
+
+
+def _key(k):
+    return itemgetter(k) if isinstance(k, str) else k
+
+
+class ExternalSorter:
+    """
+    Ordena un stream de cualquier tamaño: junta hasta `memory_budget`
+    registros, los ordena y los vuelca a disco como una corrida (pickle
+    secuencial); al final hace merge de todas las corridas con un heap.
+    Si nunca se pasó del presupuesto, no toca el disco. Con más de `fanout`
+    corridas se juntan primero en corridas más grandes, para no abrir miles
+    de archivos a la vez.
+    """
+
+    def __init__(self, key, memory_budget=100000, tmpdir=None, fanout=128):
+        self.key = _key(key)
+        self.memory_budget = memory_budget
+        self.tmpdir = tmpdir
+        self.fanout = fanout
+        self.buffer = []
+        self.runs = []
+        self.spilled = 0
+        self._dir = None
+        self._n_runs = 0
+
+    def add(self, registro):
+        self.buffer.append(registro)
+        if len(self.buffer) >= self.memory_budget:
+            self._spill()
+
+    def extend(self, registros):
+        for r in registros:
+            self.add(r)
+        return self
+
+    def _spill(self):
+        self.buffer.sort(key=self.key)
+        self.runs.append(self._escribir_run(self.buffer))
+        self.spilled += len(self.buffer)
+        self.buffer = []
+
+    def _escribir_run(self, registros):
+        if self._dir is None:
+            self._dir = tempfile.TemporaryDirectory(prefix="mr_sort_", dir=self.tmpdir)
+        path = os.path.join(self._dir.name, f"run_{self._n_runs:05d}.pkl")
+        self._n_runs += 1
+        with open(path, "wb") as f:
+            p = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            for r in registros:
+                p.dump(r)
+                # Sin esto el pickler se guarda referencias a todo lo escrito
+                p.clear_memo()
+        return path
+
+    @staticmethod
+    def _leer_run(path):
+        with open(path, "rb") as f:
+            u = pickle.Unpickler(f)
+            while True:
+                try:
+                    yield u.load()
+                except EOFError:
+                    return
+
+    def __iter__(self):
+        """Recorre todo en orden y borra las corridas al terminar."""
+        try:
+            self.buffer.sort(key=self.key)
+            if not self.runs:
+                yield from self.buffer
+                return
+            while len(self.runs) > self.fanout:
+                grupo, self.runs = self.runs[:self.fanout], self.runs[self.fanout:]
+                self.runs.append(self._escribir_run(
+                    heapq.merge(*[self._leer_run(p) for p in grupo], key=self.key)))
+                for p in grupo:
+                    os.remove(p)
+            fuentes = [self._leer_run(p) for p in self.runs] + [iter(self.buffer)]
+            yield from heapq.merge(*fuentes, key=self.key)
+        finally:
+            self.buffer = []
+            if self._dir is not None:
+                self._dir.cleanup()
+                self._dir = None
+            self.runs = []
+
+
+def hash_join(build, probe, build_key, probe_key, how="inner"):
+    """
+    Broadcast hash join: `build` (el lado chico) entra completo a un dict y
+    `probe` se recorre en streaming. Devuelve pares (probe, build); con
+    how="left" los de `probe` sin pareja salen con None.
+    """
+    bk, pk = _key(build_key), _key(probe_key)
+    tabla = {}
+    for r in build:
+        tabla.setdefault(bk(r), []).append(r)
+    for r in probe:
+        matches = tabla.get(pk(r))
+        if matches:
+            for m in matches:
+                yield r, m
+        elif how == "left":
+            yield r, None
+
+
+def cogroup_sorted(left, right, left_key, right_key):
+    """
+    Recorre dos streams ya ordenados por llave y devuelve
+    (llave, registros_izq, registros_der) por cada llave de cualquiera de los dos.
+    """
+    lk, rk = _key(left_key), _key(right_key)
+    izq = itertools.groupby(left, key=lk)
+    der = itertools.groupby(right, key=rk)
+    a = next(izq, None)
+    b = next(der, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], list(a[1]), []
+            a = next(izq, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], [], list(b[1])
+            b = next(der, None)
+        else:
+            yield a[0], list(a[1]), list(b[1])
+            a = next(izq, None)
+            b = next(der, None)
+
+
+def sort_merge_join(left, right, left_key, right_key, how="inner", memory_budget=100000,
+                    tmpdir=None):
+    """Ordena ambos lados (con spill a disco si hace falta) y los junta en una pasada."""
+    izq = ExternalSorter(left_key, memory_budget, tmpdir).extend(left)
+    der = ExternalSorter(right_key, memory_budget, tmpdir).extend(right)
+    for _, ls, rs in cogroup_sorted(izq, der, left_key, right_key):
+        if rs:
+            for l in ls:
+                for r in rs:
+                    yield l, r
+        elif how == "left":
+            for l in ls:
+                yield l, None
+
+
+def _medir(registros, limite):
+    """
+    Tamaño del lado si se puede saber sin recorrerlo (len); si no, lee hasta
+    `limite` + 1 registros. Devuelve (tamaño o None si se pasa, registros).
+    """
+    try:
+        n = len(registros)
+        return (n if n <= limite else None), registros
+    except TypeError:
+        pass
+    it = iter(registros)
+    prefijo = list(itertools.islice(it, limite + 1))
+    if len(prefijo) <= limite:
+        return len(prefijo), prefijo
+    return None, itertools.chain(prefijo, it)
+
+
+def join(left, right, left_key, right_key, how="inner", memory_budget=100000, tmpdir=None):
+    """
+    Elige la estrategia con el tamaño de cada lado: si alguno cabe en el
+    presupuesto va broadcast hash join con ese lado en memoria (con
+    how="left" solo puede ser el derecho); si no, sort-merge con spill.
+    Devuelve (estrategia, iterador de pares (izq, der)).
+    """
+    n_der, right = _medir(right, memory_budget)
+    if n_der is not None:
+        return "broadcast_right", hash_join(right, left, right_key, left_key, how)
+
+    if how == "inner":
+        n_izq, left = _medir(left, memory_budget)
+        if n_izq is not None:
+            pares = ((l, r) for r, l in hash_join(left, right, left_key, right_key))
+            return "broadcast_left", pares
+
+    return "sort_merge", sort_merge_join(left, right, left_key, right_key, how,
+                                         memory_budget, tmpdir)
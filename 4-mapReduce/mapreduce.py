@@ -1,207 +1,351 @@
+import argparse
+import itertools
 import json
-import random
-from collections import defaultdict
+import os
+
+from aggregates import Fold, Summary, TopK, rank_por_valor
+from engine import Job, MapReduceEngine, hash_partitioner, splits_por_particion
+from joins import ExternalSorter, join
+from streaming import leer_registros
 
 
 # UNIDAD 4 - MAPREDUCE
 # sigo trabajando con la misma biblioteca del W3,
 # pero ahora le metemos la parte de MapReduce.
+#
+# Los algoritmos 1-3 ahora son jobs de verdad sobre engine.py: el mapper, el
+# combiner y el reducer de cada uno están aquí abajo a nivel de módulo (los
+# workers del pool los importan), y el script en sí vive en main().
+# Por defecto los tres corren fusionados en una sola pasada en streaming
+# sobre el archivo (ver MapReduceEngine.run_fused).
 
+PARTICIONES = 24
+NODOS = 12
+TOP = 5
 
 
-# 0. Cargo la data del W3 (biblioteca3.json) y le agrego
-#    los campos nuevos que pide el W4:
-#    - mapReducePartition
-#    - processingNode
-#    - batchId
-#    - aggregationKey = genre_contentCategory
-# Después guardo todo en biblioteca4.json para que quede listo.
-
-with open("biblioteca4.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-print("Registros originales (U3):", len(data))
-
-for libro in data:
-    # Simulo en qué partición del cluster cae cada registro
-    libro["mapReducePartition"] = random.randint(1, 24)
-    # Simulo en qué nodo se procesa
-    libro["processingNode"] = f"node_{random.randint(1, 12)}"
-    # Simulo un id de batch
-    libro["batchId"] = f"batch_{random.randint(1000, 9999)}"
-
+def enriquecer(libro):
+    """
+    0. Le agrego a cada registro del W3 los campos nuevos que pide el W4:
+       - mapReducePartition: hash del _id, así un libro cae siempre en la
+         misma partición (antes era al azar)
+       - processingNode: el nodo dueño de esa partición
+       - batchId: si el registro ya trae uno se respeta; si no, sale del
+         hash del _id (antes era al azar y cambiaba en cada corrida, así
+         incremental.py veía todos los lotes como nuevos)
+       - aggregationKey = genre_contentCategory
+    Devuelve solo esos campos (con el _id) para el archivo lateral.
+    """
+    particion = hash_partitioner(libro.get("_id"), PARTICIONES) + 1
     genero = libro.get("genre", "unknown")
     categoria = libro.get("contentCategory", "unknown")
-    # Esta llave sirve para agrupar cosas por género + categoría
-    libro["aggregationKey"] = f"{genero}_{categoria}"
-
-# Guardo el JSON ya actualizado con la info de MapReduce
-with open("biblioteca4.json", "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-
-print("Se creó biblioteca4.json con los campos de MapReduce.\n")
+    extra = {
+        "mapReducePartition": particion,
+        "processingNode": f"node_{(particion - 1) % NODOS + 1}",
+        "batchId": libro.get("batchId") or f"batch_{hash_partitioner(libro.get('_id'), 9000) + 1000}",
+        # Esta llave sirve para agrupar cosas por género + categoría
+        "aggregationKey": f"{genero}_{categoria}",
+    }
+    libro.update(extra)
+    return dict(_id=libro.get("_id"), **extra)
 
-# A partir de aquí ya uso "data" que tiene todo lo del W3 + W4.
 
+def preparar_datos(data):
+    for libro in data:
+        enriquecer(libro)
+    return data
 
 
-# ALGORITMO 1: Library Book Counter 
+# ALGORITMO 1: Library Book Counter
 # Idea: hacer un "word count" pero con títulos de libros.
 # Map:   (title, 1)
-# Reduce: sumar todos los 1 por cada título.
-# Objetivo: ver cuáles libros son los más "prestados".
+# Combine/Reduce: sumar todos los 1 por cada título.
+# Cada reducer se queda solo con sus TOP títulos (heap de tamaño TOP) y el
+# coordinador junta esos heaps: no hace falta ordenar todos los títulos.
 
+def map_titulo(registro):
+    yield registro.get("title", "sin_titulo"), 1
 
-print("Algoritmo 1: Contador de libros")
 
-book_counts = defaultdict(int)
+def sumar(_, valores):
+    return sum(valores)
 
-# Aqui hago el Map + Reduce  en Python
-for registro in data:
-    titulo = registro.get("title", "sin_titulo")
-    book_counts[titulo] += 1  # es como emitir (title,1) y luego agrupar
 
-# Ordeno de mayor a menor para ver los mas populares
-libros_populares = sorted(book_counts.items(), key=lambda x: x[1], reverse=True)
+def restar(_, total, parcial):
+    if parcial > total:
+        raise ValueError("No se puede quitar un parcial más grande que el total")
+    return total - parcial or None
 
-print("Top 5 libros más 'prestados' según los registros:\n")
-for titulo, conteo in libros_populares[:5]:
-    print(f"- {titulo} -> {conteo} checkouts aprox.")
-
-print("\n")
 
+CONTADOR_LIBROS = Job(map_titulo, sumar, combiner=sumar, name="contador_libros",
+                      top_k=TOP, rank=rank_por_valor, inverse=restar)
 
 
 # ALGORITMO 2: Average Reading Time Calculator
-# Idea: ver qué tipo de usuario lee más tiempo en promedio.
-# Acá uso:
 #   - user_category = userInterestState (casual, focused, etc)
 #   - reading_time = expectedReadingTime
-# Map:   (user_category, reading_time)
-# Reduce: sacar el promedio por categoría.
-
-
-print("Algoritmo 2: Promedio de tiempo de lectura por tipo de usuario")
+# Map:     (user_category, reading_time)
+# Combine: un Summary por categoría (conteo, media y varianza con la fórmula
+#          de Chan para juntar parciales, más un sketch de cuantiles); un
+#          promedio de promedios estaría mal, el Summary arrastra el conteo
+# Reduce:  juntar los Summary de todas las particiones
 
-tiempos_por_categoria = defaultdict(list)
+def map_tiempo_lectura(registro):
+    yield registro.get("userInterestState", "desconocido"), registro.get("expectedReadingTime", 0)
 
-for registro in data:
-    categoria = registro.get("userInterestState", "desconocido")
-    tiempo = registro.get("expectedReadingTime", 0)
-    tiempos_por_categoria[categoria].append(tiempo)
 
-print("Promedio de tiempo de lectura  por categoría:\n")
-for categoria, tiempos in tiempos_por_categoria.items():
-    if not tiempos:
-        continue
-    promedio = sum(tiempos) / len(tiempos)
-    print(f"- {categoria}: {promedio:.2f} minutos")
+resumir = Fold(Summary)
 
-print("\n")
+PROMEDIO_LECTURA = Job(map_tiempo_lectura, resumir, combiner=resumir, name="promedio_lectura",
+                       inverse=resumir.subtract)
 
-# ALGORITMO 3: Library Report Generator (Basic Join)
-# Idea: simular un JOIN sencillo:
-#   - "Tabla" de libros: (book_id, title, author)
-#   - "Tabla" de checkouts: (book_id, cantidad de veces que aparece)
-# En la vida real serían dos archivos y se haría un MapReduce join.
-# Aquí lo hago sencillo con dos diccionarios y luego los uno.
 
+# ALGORITMO 3: Library Report Generator (Reduce-side Join)
+# Cada registro hace de dos "tablas":
+#   - libros:    (book_id, ("libro", (title, author)))
+#   - checkouts: (book_id, ("checkout", 1))
+# El reducer recibe todo lo de un book_id junto y arma la fila del reporte;
+# como en el algoritmo 1, de cada reducer salen solo sus TOP filas.
 
-print("Algoritmo 3: Reporte de autores y popularidad")
-
-# Esta parte simula la tabla de libros
-books_info = {}
-for registro in data:
-    book_id = registro.get("_id")
-    books_info[book_id] = {
-        "title": registro.get("title", "sin_titulo"),
-        "author": registro.get("author", "sin_autor")
-    }
-
-# Esta parte simula la tabla de checkouts
-checkout_counts = defaultdict(int)
-for registro in data:
+def map_reporte(registro):
     book_id = registro.get("_id")
-    checkout_counts[book_id] += 1
-
-# Aqu ya seria como el "reduce": junto toda la info por book_id
-reporte = []
-for book_id, info in books_info.items():
-    total_checkouts = checkout_counts[book_id]
-    reporte.append({
-        "author": info["author"],
-        "title": info["title"],
-        "totalCheckouts": total_checkouts
-    })
-
-# Ordeno por núimero de checkouts para ver lo más popular
-reporte_ordenado = sorted(reporte, key=lambda x: x["totalCheckouts"], reverse=True)
+    yield book_id, ("libro", (registro.get("title", "sin_titulo"), registro.get("author", "sin_autor")))
+    yield book_id, ("checkout", 1)
 
-print("Top 5 libros con su autor y número de checkouts:\n")
-for item in reporte_ordenado[:5]:
-    print(f"- {item['author']} – {item['title']} -> {item['totalCheckouts']} checkouts")
 
-print("\n")
+def combinar_reporte(_, valores):
+    # Junta lo que haya de un book_id en un solo valor parcial
+    titulo, autor, total = None, None, 0
+    for tipo, v in valores:
+        if tipo == "libro":
+            titulo, autor = v
+        elif tipo == "checkout":
+            total += v
+        else:
+            t, a, n = v
+            if t is not None:
+                titulo, autor = t, a
+            total += n
+    return "parcial", (titulo, autor, total)
 
 
-# ALGORITMO 4: Library System Costs
-# estimación simple de costos.
-# Suposiciones :
-#   - 1 libro de texto ~ 1 MB
-#   - 1 recurso multimedia (video/audio) ~ 50 MB
-#   - 70% de los registros son texto, 30% multimedia
-#   - costo almacenamiento ~ 0.02 USD por GB al mes 
-# Esto es  para mostrar que también se pueden hacer análisis de costos.
+def restar_reporte(_, acc, parcial):
+    # El título y el autor de un _id son los mismos en todos los lotes: solo se resta el total
+    _, (titulo, autor, total) = acc
+    _, (_, _, n) = parcial
+    if n > total:
+        raise ValueError("No se puede quitar un parcial más grande que el total")
+    return ("parcial", (titulo, autor, total - n)) if total > n else None
 
 
-print("Algoritmo 4: Costos del sistema de biblioteca ")
+def join_reporte(llave, valores):
+    _, (titulo, autor, total) = combinar_reporte(llave, valores)
+    return {"author": autor, "title": titulo, "totalCheckouts": total}
 
-total_registros = len(data)
-texto = int(total_registros * 0.7)
-multimedia = total_registros - texto
 
-mb_texto = texto * 1              # 1 MB por libro de texto
-mb_multimedia = multimedia * 50   # 50 MB por recurso multimedia
+def rank_reporte(par):
+    _, fila = par
+    return -fila["totalCheckouts"], fila["title"]
 
-mb_total = mb_texto + mb_multimedia
-gb_total = mb_total / 1024.0
 
-costo_por_gb = 0.02  # USD/GB/mes 
-costo_mensual = gb_total * costo_por_gb
+REPORTE_AUTORES = Job(map_reporte, join_reporte, combiner=combinar_reporte, name="reporte_autores",
+                      top_k=TOP, rank=rank_reporte, inverse=restar_reporte)
 
-print(f"Registros totales: {total_registros}")
-print(f"Libros tipo texto aprox.: {texto}")
-print(f"Recursos multimedia aprox.: {multimedia}")
-print(f"Almacenamiento total estimado: {gb_total:.2f} GB")
-print(f"Costo mensual estimado (solo storage): ${costo_mensual:.2f} USD\n")
+JOBS = [CONTADOR_LIBROS, PROMEDIO_LECTURA, REPORTE_AUTORES]
 
 
+def _fila_reporte(pares):
+    _, libro = next(pares)
+    return {"author": libro["author"], "title": libro["title"], "totalCheckouts": 1 + sum(1 for _ in pares)}
 
-# ALGORITMO 5: Library Data Processing Performance
-# Aquí es ver "cómo se comporta" el sistema con:
-#   - distintos tamaños de biblioteca
-#   - distintos tamaños de cluster (número de nodos)
-#  formula sencilla:
-#   tiempo ~ num_registros / (nodos * factor)
-# Mientras más nodos tenga el cluster, menos tiempo.
 
-
-print("Algoritmo 5: Rendimiento del procesamiento de datos")
-
-def tiempo_procesamiento(num_registros, nodos_cluster, factor=100000):
+def catalogo_unico(path, memory_budget=100000, tmpdir=None):
     """
-    Función mega simple para simular el tiempo de análisis.
-    Entre más nodos tenga el cluster, más rápido debería ir.
+    Una fila (_id, title, author) por _id, la primera que aparece en `path`.
+    En el log de préstamos un libro se repite una vez por checkout: sin esto
+    el join daría n x n pares para un _id que aparece n veces. Se deduplica
+    ordenando por _id con ExternalSorter, así respeta el mismo presupuesto
+    de memoria que el join.
     """
-    return num_registros / (nodos_cluster * factor)
-
+    filas = ({"_id": r.get("_id"), "title": r.get("title", "sin_titulo"),
+              "author": r.get("author", "sin_autor")} for r in leer_registros(path))
+    # El orden es estable: dentro de un _id la primera fila sigue siendo la primera
+    ordenado = ExternalSorter("_id", memory_budget, tmpdir).extend(filas)
+    for _, grupo in itertools.groupby(ordenado, key=lambda r: r["_id"]):
+        yield next(grupo)
 
-tamanos_biblioteca = [len(data), 100000, 1000000]  # tamaño actual, 100k y 1M
-nodos_posibles = [1, 4, 8, 16]
-
-for size in tamanos_biblioteca:
-    print(f"\nSimulación para biblioteca con {size} registros:")
-    for nodos in nodos_posibles:
-        t = tiempo_procesamiento(size, nodos)
-        print(f"- Cluster con {nodos} nodos -> tiempo aprox.: {t:.4f} unidades")
 
+def reporte_por_join(path, top=TOP, memory_budget=100000, tmpdir=None, catalogo=None):
+    """
+    El mismo reporte, pero como un join de verdad entre dos "tablas" leídas
+    en streaming: el log de checkouts (cada registro es un préstamo de su
+    _id) y el catálogo (_id, title, author), una fila por libro. El catálogo
+    sale de `catalogo` (otro archivo) o, si no se da, de los mismos registros
+    deduplicados por _id (catalogo_unico). joins.join elige broadcast si el
+    catálogo cabe en el presupuesto, o sort-merge con spill a disco si no.
+    El top sale con un heap de tamaño `top`, sin ordenar todo el reporte.
+    """
+    checkouts = (r.get("_id") for r in leer_registros(path))
+    filas = catalogo_unico(catalogo or path, memory_budget, tmpdir)
+    estrategia, pares = join(checkouts, filas, lambda b: b, "_id",
+                             memory_budget=memory_budget, tmpdir=tmpdir)
+
+    if estrategia == "sort_merge":
+        # Los pares ya salen agrupados por _id: se cuentan de corrido
+        filas = (_fila_reporte(grupo) for _, grupo in itertools.groupby(pares, key=lambda p: p[0]))
+    else:
+        # Con broadcast el catálogo ya está en memoria: el conteo por libro también cabe
+        conteo = {}
+        for _, libro in pares:
+            par = conteo.setdefault(libro["_id"], [libro, 0])
+            par[1] += 1
+        filas = ({"author": libro["author"], "title": libro["title"], "totalCheckouts": n}
+                 for libro, n in conteo.values())
+
+    mejores = TopK(top, lambda fila: rank_reporte((None, fila))).extend(filas)
+    return estrategia, mejores.items()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unidad 4: MapReduce sobre la biblioteca")
+    parser.add_argument("--datos", default="biblioteca4.json", help="arreglo JSON o JSONL")
+    parser.add_argument("--lateral", default="biblioteca4_mr.jsonl",
+                        help="archivo JSONL con los campos de MapReduce de cada registro")
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, núcleos)")
+    parser.add_argument("--chunk", type=int, default=5000, help="registros por bloque")
+    parser.add_argument("--join", action="store_true",
+                        help="algoritmo 3 como join (broadcast o sort-merge con spill) en vez del job")
+    parser.add_argument("--memoria", type=int, default=100000,
+                        help="presupuesto de memoria del join, en registros")
+    parser.add_argument("--catalogo", default=None,
+                        help="catálogo (_id, title, author) para el join; por defecto, --datos sin repetidos")
+    parser.add_argument("--splits", action="store_true",
+                        help="carga todo y corre cada job por separado sobre splits por partición")
+    args = parser.parse_args()
+
+    with MapReduceEngine(args.workers) as engine:
+        if args.splits:
+            with open(args.datos, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            preparar_datos(data)
+            # Cada partición es un split de entrada (una tarea de map)
+            splits = splits_por_particion(data)
+            resultados = {job.name: engine.run(job, splits) for job in JOBS}
+            total_registros = len(data)
+        else:
+            # Una sola pasada en streaming: se enriquece cada registro, pasa por
+            # los tres jobs y sus campos nuevos van al archivo lateral (en vez de
+            # reescribir todo el JSON con indent)
+            resultados = engine.run_fused(JOBS, leer_registros(args.datos), chunk_size=args.chunk,
+                                          enrich=enriquecer, side_file=args.lateral)
+            total_registros = resultados[CONTADOR_LIBROS.name].counters["input_records"]
+            print(f"Campos de MapReduce escritos en {args.lateral}.")
+
+        print("Registros procesados:", total_registros, "\n")
+
+        print("Algoritmo 1: Contador de libros")
+        res = resultados[CONTADOR_LIBROS.name]
+
+        # El job ya devuelve solo el top, ordenado
+        print(f"Top {TOP} libros más 'prestados' según los registros:\n")
+        for titulo, conteo in res:
+            print(f"- {titulo} -> {conteo} checkouts aprox.")
+        imprimir_contadores(res.counters)
+        print("\n")
+
+        print("Algoritmo 2: Promedio de tiempo de lectura por tipo de usuario")
+        res = resultados[PROMEDIO_LECTURA.name]
+
+        print("Promedio de tiempo de lectura  por categoría:\n")
+        for categoria, s in sorted(res, key=lambda x: -x[1].mean):
+            print(f"- {categoria}: {s.mean:.2f} minutos "
+                  f"(desv. {s.std:.2f}, p50 {s.quantile(0.5):.1f}, p90 {s.quantile(0.9):.1f}, "
+                  f"n={s.count})")
+        imprimir_contadores(res.counters)
+        print("\n")
+
+        print("Algoritmo 3: Reporte de autores y popularidad")
+        res = resultados[REPORTE_AUTORES.name]
+        if args.join:
+            estrategia, reporte_ordenado = reporte_por_join(args.datos, TOP, args.memoria,
+                                                            catalogo=args.catalogo)
+        else:
+            reporte_ordenado = [fila for _, fila in res]
+
+        print(f"Top {TOP} libros con su autor y número de checkouts:\n")
+        for item in reporte_ordenado:
+            print(f"- {item['author']} – {item['title']} -> {item['totalCheckouts']} checkouts")
+        if args.join:
+            print(f"  [join] estrategia {estrategia}, presupuesto {args.memoria} registros")
+        else:
+            imprimir_contadores(res.counters)
+        print("\n")
+
+    # ALGORITMO 4: Library System Costs
+    # estimación simple de costos.
+    # Suposiciones :
+    #   - 1 libro de texto ~ 1 MB
+    #   - 1 recurso multimedia (video/audio) ~ 50 MB
+    #   - 70% de los registros son texto, 30% multimedia
+    #   - costo almacenamiento ~ 0.02 USD por GB al mes 
+    # Esto es  para mostrar que también se pueden hacer análisis de costos.
+
+
+    print("Algoritmo 4: Costos del sistema de biblioteca ")
+
+    texto = int(total_registros * 0.7)
+    multimedia = total_registros - texto
+
+    mb_texto = texto * 1              # 1 MB por libro de texto
+    mb_multimedia = multimedia * 50   # 50 MB por recurso multimedia
+
+    mb_total = mb_texto + mb_multimedia
+    gb_total = mb_total / 1024.0
+
+    costo_por_gb = 0.02  # USD/GB/mes 
+    costo_mensual = gb_total * costo_por_gb
+
+    print(f"Registros totales: {total_registros}")
+    print(f"Libros tipo texto aprox.: {texto}")
+    print(f"Recursos multimedia aprox.: {multimedia}")
+    print(f"Almacenamiento total estimado: {gb_total:.2f} GB")
+    print(f"Costo mensual estimado (solo storage): ${costo_mensual:.2f} USD\n")
+
+
+
+    # ALGORITMO 5: Library Data Processing Performance
+    # Antes era una fórmula inventada (registros / (nodos * factor)). Ahora se
+    # miden corridas de verdad de los tres jobs con distintos números de
+    # workers (los "nodos" del cluster local) sobre la biblioteca actual.
+    # Para bibliotecas más grandes y el reporte JSON, ver scaling.py.
+
+    # Aquí adentro: scaling importa este módulo
+    from scaling import medir, workers_por_defecto
+
+    print("Algoritmo 5: Rendimiento del procesamiento de datos")
+    print(f"\nCorridas reales con {total_registros} registros "
+          f"({os.cpu_count()} núcleos en esta máquina):")
+    modo = "splits" if args.splits else "fused"
+    ref = None
+    for w in workers_por_defecto():
+        r = medir(args.datos, w, args.chunk, modo)
+        ref = ref or r["wall_s"]
+        print(f"- {w} workers -> {r['wall_s']:.3f} s, {r['records'] / r['wall_s']:,.0f} registros/s, "
+              f"speedup {ref / r['wall_s']:.2f}")
+    print("\nPara bibliotecas más grandes: python scaling.py (100k y 1M con --grande)")
+
+
+def imprimir_contadores(c):
+    if "fused_jobs" in c:
+        print(f"  [{c['job']}] {c['input_records']} registros en {c['chunks']} bloques, "
+              f"{c['workers']} workers, {c['fused_jobs']} jobs en una pasada | "
+              f"pasada {c['wall_map_s'] * 1000:.1f} ms, reduce {c['reduce_s'] * 1000:.1f} ms")
+        return
+    print(f"  [{c['job']}] {c['input_records']} registros, {c['splits']} splits, "
+          f"{c['workers']} workers | map {c['wall_map_s'] * 1000:.1f} ms, "
+          f"shuffle {c['wall_shuffle_s'] * 1000:.1f} ms ({c['shuffle_records']} pares), "
+          f"reduce {c['wall_reduce_s'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
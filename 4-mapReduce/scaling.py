@@ -0,0 +1,317 @@
+import argparse
+import bisect
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from engine import MapReduceEngine, splits_por_particion
+from mapreduce import JOBS, enriquecer, preparar_datos
+from streaming import leer_registros
+
+# Benchmark de escalamiento del motor: corre los jobs de verdad (los tres
+# algoritmos de mapreduce.py) con 1, 2, 4, 8, ... procesos sobre bibliotecas
+# de distintos tamaños y mide, para cada combinación:
+#   - tiempo total (con el arranque y cierre del pool) y registros/s
+#   - tiempo por fase (contadores del motor)
+#   - RSS máximo del coordinador y del worker más pesado
+#   - speedup y eficiencia contra la corrida con 1 worker
+# Cada medición corre en un proceso aparte para que el RSS no se mezcle
+# entre corridas. Las bibliotecas grandes se generan con el esquema de
+# biblioteca4.json y quedan en un JSONL temporal (~1.2 KB por registro: el
+# barrido grande, 100k y 1M, ocupa ~1.4 GB, por eso va aparte con --grande
+# y antes de generar se revisa que haya espacio en disco).
+#
+#   python scaling.py                                   (la base y 20k)
+#   python scaling.py --grande                          (la base, 100k y 1M)
+#   python scaling.py --tamanos 1000 20000 --workers 1 2 --salida base.json
+#   python scaling.py --tamanos 1000 20000 --workers 1 2 --comparar base.json
+
+FASES_FUSED = ("enrich_s", "map_s", "merge_s", "reduce_s", "wall_map_s")
+FASES_SPLITS = ("load_s", "map_s", "combine_s", "partition_s", "sort_s", "reduce_s",
+                "wall_map_s", "wall_shuffle_s", "wall_reduce_s")
+TAMANOS = (20000,)
+TAMANOS_GRANDES = (100000, 1000000)
+# Espacio libre que se deja en el disco además de lo que ocupan los archivos
+MARGEN_DISCO = 256 * 1024 * 1024
+
+
+def generar_registros(base, n, skew=1.1, seed=42):
+    """
+    Registros con el mismo esquema que biblioteca4.json. Cada registro es un
+    préstamo: el libro (_id, title, author) sale con popularidad tipo Zipf
+    sobre el catálogo base y el resto de los campos (estado del usuario,
+    tiempo de lectura, etc.) se copia de un registro base al azar.
+    """
+    rng = random.Random(seed)
+    libros = list(base)
+    rng.shuffle(libros)
+    acumulado = list(itertools.accumulate(1 / (r + 1) ** skew for r in range(len(libros))))
+    total = acumulado[-1]
+    for _ in range(n):
+        libro = libros[bisect.bisect_left(acumulado, rng.random() * total)]
+        registro = dict(rng.choice(base))
+        registro["_id"] = libro["_id"]
+        registro["title"] = libro.get("title")
+        registro["author"] = libro.get("author")
+        yield registro
+
+
+def bytes_por_registro(base):
+    """Tamaño medio de un registro de `base` como línea JSONL compacta."""
+    if not base:
+        return 0
+    total = sum(len(json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8")) + 1
+                for r in base)
+    return total / len(base)
+
+
+def revisar_disco(directorio, necesarios, margen=MARGEN_DISCO):
+    """Error antes de generar nada si en `directorio` no caben `necesarios` bytes (+ margen)."""
+    libres = shutil.disk_usage(directorio).free
+    if necesarios + margen > libres:
+        raise RuntimeError(f"Las bibliotecas generadas ocupan ~{necesarios / 2 ** 20:,.0f} MB y en "
+                           f"{directorio} quedan {libres / 2 ** 20:,.0f} MB libres (se dejan "
+                           f"{margen / 2 ** 20:,.0f} MB de margen); usa tamaños más chicos o --tmp")
+
+
+def preparar_archivo(base_path, n, directorio, seed=42):
+    """Ruta de una biblioteca de `n` registros; si es la base tal cual, la misma."""
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    if n == len(base):
+        return base_path
+    path = os.path.join(directorio, f"biblioteca4_{n}.jsonl")
+    if not os.path.exists(path):
+        revisar_disco(directorio, n * bytes_por_registro(base))
+        with open(path, "w", encoding="utf-8") as f:
+            for r in generar_registros(base, n, seed=seed):
+                f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+    return path
+
+
+def _medir_aqui(path, workers, chunk, modo, lateral):
+    fases = dict.fromkeys(FASES_FUSED if modo == "fused" else FASES_SPLITS, 0.0)
+    inicio = time.perf_counter()
+    with MapReduceEngine(workers) as engine:
+        if modo == "fused":
+            res = engine.run_fused(JOBS, leer_registros(path), chunk_size=chunk,
+                                   enrich=enriquecer, side_file=lateral)
+            c = res[JOBS[0].name].counters
+            registros = c["input_records"]
+            for k in FASES_FUSED:
+                fases[k] = sum(r.counters[k] for r in res.values()) if k == "reduce_s" else c[k]
+        else:
+            data = list(leer_registros(path))
+            preparar_datos(data)
+            splits = splits_por_particion(data)
+            fases["load_s"] = time.perf_counter() - inicio
+            registros = len(data)
+            for job in JOBS:
+                c = engine.run(job, splits).counters
+                for k in FASES_SPLITS[1:]:
+                    fases[k] += c[k]
+    wall = time.perf_counter() - inicio
+    return {
+        "records": registros,
+        "wall_s": wall,
+        "phases_s": fases,
+        "rss_coordinator_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        # Con workers=1 no hay pool y esto queda en 0
+        "rss_worker_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def _medir_hijo(cola, *args):
+    try:
+        cola.put(("ok", _medir_aqui(*args)))
+    except BaseException as e:
+        cola.put(("error", repr(e)))
+
+
+def medir(path, workers, chunk=5000, modo="fused", lateral=os.devnull, aislado=True):
+    """
+    Una corrida de los jobs sobre `path` con `workers` procesos. Con
+    aislado=True corre en un proceso nuevo, así el RSS es solo de esta corrida.
+    """
+    if not aislado:
+        return _medir_aqui(path, workers, chunk, modo, lateral)
+    ctx = mp.get_context()
+    cola = ctx.Queue()
+    p = ctx.Process(target=_medir_hijo, args=(cola, path, workers, chunk, modo, lateral))
+    p.start()
+    estado, r = cola.get()
+    p.join()
+    if estado != "ok":
+        raise RuntimeError(f"La corrida con {workers} workers falló: {r}")
+    return r
+
+
+def correr(base_path, tamanos, workers, chunk=5000, modo="fused", repeticiones=1,
+           directorio=None, seed=42, aislado=True, progreso=None):
+    """
+    Todas las combinaciones tamaño x workers. De cada una se queda la
+    mediana de `repeticiones` (tiempos) y el máximo de RSS. Devuelve una
+    lista de filas con speedup y eficiencia contra el menor número de workers.
+    """
+    filas = []
+    tmp = tempfile.mkdtemp(prefix="mr_scaling_", dir=directorio)
+    try:
+        # Todas las bibliotecas quedan en disco hasta el final: se revisa el total de una
+        with open(base_path, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        generados = sum(n for n in set(tamanos) if n != len(base))
+        revisar_disco(tmp, generados * bytes_por_registro(base))
+        del base
+        lateral = os.path.join(tmp, "lateral.jsonl")
+        for n in tamanos:
+            path = preparar_archivo(base_path, n, tmp, seed)
+            grupo = []
+            for w in workers:
+                corridas = [medir(path, w, chunk, modo, lateral, aislado) for _ in range(repeticiones)]
+                wall = statistics.median(r["wall_s"] for r in corridas)
+                fila = {
+                    "mode": modo, "size": n, "workers": w, "chunk": chunk,
+                    "records": corridas[0]["records"], "repeats": repeticiones,
+                    "wall_s": round(wall, 4),
+                    "records_per_s": round(n / wall, 1) if wall else 0.0,
+                    "phases_s": {k: round(statistics.median(r["phases_s"][k] for r in corridas), 4)
+                                 for k in corridas[0]["phases_s"]},
+                    "rss_coordinator_kb": max(r["rss_coordinator_kb"] for r in corridas),
+                    "rss_worker_kb": max(r["rss_worker_kb"] for r in corridas),
+                }
+                grupo.append(fila)
+                if progreso:
+                    progreso(fila)
+            ref = grupo[0]
+            for fila in grupo:
+                speedup = ref["wall_s"] / fila["wall_s"] if fila["wall_s"] else 0.0
+                fila["speedup"] = round(speedup, 3)
+                fila["efficiency"] = round(speedup * ref["workers"] / fila["workers"], 3)
+            filas.extend(grupo)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return filas
+
+
+def reporte(filas, **config):
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            **config,
+        },
+        "results": filas,
+    }
+
+
+def comparar(actual, base, tolerancia=0.2):
+    """
+    Regresiones contra un reporte anterior: combinaciones (modo, tamaño,
+    workers) cuyo throughput bajó más de `tolerancia` (fracción).
+    """
+    previas = {(f["mode"], f["size"], f["workers"]): f for f in base["results"]}
+    regresiones = []
+    for f in actual["results"]:
+        p = previas.get((f["mode"], f["size"], f["workers"]))
+        if p is None or not p["records_per_s"]:
+            continue
+        cambio = f["records_per_s"] / p["records_per_s"] - 1
+        if cambio < -tolerancia:
+            regresiones.append({"mode": f["mode"], "size": f["size"], "workers": f["workers"],
+                                "baseline_records_per_s": p["records_per_s"],
+                                "records_per_s": f["records_per_s"], "change": round(cambio, 3)})
+    return regresiones
+
+
+def imprimir_fila(f):
+    rss_w = f"{f['rss_worker_kb'] / 1024:.1f} MB" if f["rss_worker_kb"] else "-"
+    print(f"- {f['size']:>9} registros, {f['workers']:>2} workers -> {f['wall_s']:.3f} s, "
+          f"{f['records_per_s']:,.0f} reg/s | RSS coord. {f['rss_coordinator_kb'] / 1024:.1f} MB, "
+          f"worker {rss_w}", flush=True)
+
+
+def imprimir(filas):
+    print("\nResumen (speedup y eficiencia contra el menor número de workers):")
+    for f in filas:
+        fases = ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in f["phases_s"].items())
+        print(f"- {f['size']:>9} x {f['workers']:>2}: speedup {f['speedup']:.2f}, "
+              f"eficiencia {f['efficiency']:.0%} | {fases}")
+
+
+def workers_por_defecto():
+    n = os.cpu_count() or 1
+    return sorted({1, 2, 4, 8, n})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalamiento real del motor MapReduce")
+    parser.add_argument("--datos", default="biblioteca4.json", help="biblioteca base (arreglo JSON)")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=None,
+                        help="registros por corrida (por defecto: la base y 20k)")
+    parser.add_argument("--grande", action="store_true",
+                        help="barrido grande: la base, 100k y 1M (~1.4 GB temporales)")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="procesos por corrida (por defecto 1, 2, 4, 8 y los núcleos)")
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--modo", choices=("fused", "splits"), default="fused",
+                        help="una pasada en streaming, o cada job sobre splits en memoria")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tmp", default=None, help="directorio para las bibliotecas generadas")
+    parser.add_argument("--salida", default=None, help="escribe el reporte JSON aquí")
+    parser.add_argument("--comparar", default=None, help="reporte JSON anterior para buscar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="caída de reg/s permitida antes de marcar regresión")
+    parser.add_argument("--json", action="store_true", help="imprime solo el reporte JSON")
+    args = parser.parse_args()
+
+    with open(args.datos, "r", encoding="utf-8") as f:
+        base_n = len(json.load(f))
+    tamanos = args.tamanos or [base_n, *(TAMANOS_GRANDES if args.grande else TAMANOS)]
+    workers = sorted(set(args.workers or workers_por_defecto()))
+
+    filas = correr(args.datos, tamanos, workers, args.chunk, args.modo, args.repeticiones,
+                   args.tmp, args.seed, progreso=None if args.json else imprimir_fila)
+    r = reporte(filas, mode=args.modo, chunk=args.chunk, repeats=args.repeticiones,
+                sizes=tamanos, workers=workers, seed=args.seed)
+
+    regresiones = []
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regresiones = comparar(r, json.load(f), args.tolerancia)
+        r["regressions"] = regresiones
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(r, f, indent=2)
+    if args.json:
+        print(json.dumps(r, indent=2))
+    else:
+        imprimir(filas)
+        if args.salida:
+            print(f"\nReporte escrito en {args.salida}")
+        if args.comparar:
+            print(f"\nRegresiones contra {args.comparar} (tolerancia {args.tolerancia:.0%}): "
+                  f"{len(regresiones) or 'ninguna'}")
+            for g in regresiones:
+                print(f"- {g['size']} x {g['workers']}: {g['baseline_records_per_s']:,.0f} -> "
+                      f"{g['records_per_s']:,.0f} reg/s ({g['change']:+.0%})")
+    if regresiones:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import itertools
+import json
+
+# Lectura incremental de registros: nunca se carga el archivo completo.
+# Sirve para un arreglo JSON (como biblioteca4.json) o para JSONL (un
+# registro por línea); en memoria solo queda un pedazo del archivo y el
+# registro que se está decodificando.
+
+
+def leer_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def leer_json_array(path, chunk_size=1 << 16):
+    """
+    Recorre un arreglo JSON `[{...}, {...}, ...]` elemento por elemento con
+    raw_decode sobre un buffer que se va rellenando de a `chunk_size`.
+    """
+    dec = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        eof = not buf
+        abierto = False
+
+        while True:
+            # Salto espacios (y la coma entre elementos)
+            while True:
+                while pos < len(buf) and (buf[pos].isspace() or (abierto and buf[pos] == ",")):
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+
+            if pos >= len(buf):
+                if abierto:
+                    raise ValueError(f"{path}: el arreglo JSON no está cerrado")
+                return
+            if not abierto:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: se esperaba un arreglo JSON")
+                abierto = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+
+            try:
+                obj, fin = dec.raw_decode(buf, pos)
+                # Un número al borde del buffer podría estar cortado
+                completo = fin < len(buf) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                completo = False
+            if not completo:
+                mas = f.read(chunk_size)
+                eof = not mas
+                buf, pos = buf[pos:] + mas, 0
+                continue
+
+            yield obj
+            pos = fin
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def leer_registros(path, chunk_size=1 << 16):
+    """Arreglo JSON o JSONL según el primer carácter no vacío del archivo."""
+    with open(path, "r", encoding="utf-8") as f:
+        inicio = ""
+        while not inicio:
+            pedazo = f.read(4096)
+            if not pedazo:
+                return iter(())
+            inicio = pedazo.lstrip()
+    if inicio[0] == "[":
+        return leer_json_array(path, chunk_size)
+    return leer_jsonl(path)
+
+
+def en_bloques(registros, size):
+    """Agrupa un iterable en listas de `size` sin materializarlo."""
+    it = iter(registros)
+    while True:
+        bloque = list(itertools.islice(it, size))
+        if not bloque:
+            return
+        yield bloque
@@ -0,0 +1,109 @@
+import math
+import random
+
+import pytest
+
+from aggregates import Fold, Moments, QuantileSketch, Summary
+
+
+def _exacto(valores, q):
+    orden = sorted(valores)
+    return orden[int(q * (len(orden) - 1))]
+
+
+@pytest.mark.parametrize("signo", ["positivos", "negativos", "mixtos"])
+def test_cuantiles_con_error_relativo_acotado(signo):
+    rng = random.Random(0)
+    valores = [rng.lognormvariate(3, 1.5) for _ in range(5000)]
+    if signo == "negativos":
+        valores = [-v for v in valores]
+    elif signo == "mixtos":
+        valores = [v * rng.choice((-1, 1)) for v in valores] + [0.0] * 100
+    sk = QuantileSketch(alpha=0.01)
+    for v in valores:
+        sk.add(v)
+    for q in (0, 0.01, 0.25, 0.5, 0.9, 0.99, 1):
+        real = _exacto(valores, q)
+        assert sk.quantile(q) == pytest.approx(real, rel=0.0101, abs=1e-12)
+
+
+def test_cuantiles_bordes():
+    sk = QuantileSketch()
+    assert sk.quantile(0.5) is None
+    for v in (-5, -3, -1):
+        sk.add(v)
+    # Sin positivos: el máximo es negativo
+    assert sk.quantile(1) == pytest.approx(-1, rel=0.01)
+    for q in (-0.1, 1.5, math.nan):
+        with pytest.raises(ValueError):
+            sk.quantile(q)
+    ceros = QuantileSketch()
+    ceros.add(0)
+    assert ceros.quantile(1) == 0.0
+
+
+def test_merge_igual_que_una_sola_pasada():
+    rng = random.Random(1)
+    valores = [rng.gauss(50, 20) for _ in range(3000)]
+    partes = [Summary() for _ in range(7)]
+    todo = Summary()
+    for i, v in enumerate(valores):
+        partes[i % 7].add(v)
+        todo.add(v)
+    junto = Summary()
+    for p in partes:
+        junto.merge(p)
+    assert junto.count == todo.count == len(valores)
+    assert junto.mean == pytest.approx(sum(valores) / len(valores))
+    assert junto.std == pytest.approx(todo.std)
+    assert junto.quantile(0.5) == todo.quantile(0.5)
+    m = Moments()
+    m.merge(Moments())
+    assert m.count == 0 and m.variance() == 0.0
+
+
+def test_subtract_deshace_el_merge():
+    rng = random.Random(2)
+    # La parte que se quita no tiene el mínimo ni el máximo
+    resto = [rng.uniform(-100, 100) for _ in range(2000)] + [-500.0, 500.0]
+    parte = [rng.uniform(-50, 50) for _ in range(300)] + [0.0] * 5
+    esperado, quitado = Summary(), Summary()
+    for v in resto:
+        esperado.add(v)
+    for v in parte:
+        quitado.add(v)
+    total = Summary().merge(esperado).merge(quitado)
+
+    sin_parte = Fold(Summary).subtract(None, total, quitado)
+    assert total.count == len(resto) + len(parte)
+    assert sin_parte.count == esperado.count
+    assert sin_parte.mean == pytest.approx(esperado.mean)
+    assert sin_parte.std == pytest.approx(esperado.std)
+    assert (sin_parte.moments.min, sin_parte.moments.max) == (-500.0, 500.0)
+    assert sin_parte.quantiles.pos == esperado.quantiles.pos
+    assert sin_parte.quantiles.neg == esperado.quantiles.neg
+    assert sin_parte.quantiles.zeros == esperado.quantiles.zeros
+    for q in (0, 0.1, 0.5, 0.9, 1):
+        assert sin_parte.quantile(q) == esperado.quantile(q)
+    assert Fold(Summary).subtract(None, quitado, quitado) is None
+
+
+def test_subtract_sin_minimo_o_maximo_recuperable():
+    a, b = Moments(), Moments()
+    for v in (1, 5, 9):
+        a.add(v)
+    b.add(9)
+    a.merge(b)
+    with pytest.raises(ValueError):
+        a.subtract(b)
+    # Si falla no toca nada
+    assert (a.count, a.max) == (4, 9)
+    with pytest.raises(ValueError):
+        Moments().subtract(b)
+    sk = QuantileSketch()
+    sk.add(3.0)
+    otro = QuantileSketch()
+    otro.add(7.0)
+    with pytest.raises(ValueError):
+        sk.subtract(otro)
+    assert sk.count == 1 and sk.quantile(0.5) == pytest.approx(3.0, rel=0.011)
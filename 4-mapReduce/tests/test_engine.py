@@ -0,0 +1,68 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from engine import MapReduceEngine, splits_fijos, splits_por_particion
+from mapreduce import CONTADOR_LIBROS, JOBS, PROMEDIO_LECTURA, REPORTE_AUTORES, TOP, preparar_datos
+from streaming import leer_registros
+
+
+def _registros(n=3000, libros=120, seed=0):
+    rng = random.Random(seed)
+    catalogo = [{"_id": f"id_{i}", "title": f"Libro {i % 90}", "author": f"Autor {i % 13}"}
+                for i in range(libros)]
+    estados = ["casual", "focused", "research", "browsing"]
+    res = []
+    for _ in range(n):
+        # Préstamos con ids repetidos (y títulos repetidos entre ids distintos)
+        libro = catalogo[min(int(rng.paretovariate(1.2)) - 1, libros - 1)]
+        res.append(dict(libro, userInterestState=rng.choice(estados),
+                        expectedReadingTime=rng.randint(5, 300)))
+    return res
+
+
+def _esperado(data):
+    titulos = Counter(r["title"] for r in data)
+    contador = sorted(titulos.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP]
+    tiempos = {}
+    for r in data:
+        tiempos.setdefault(r["userInterestState"], []).append(r["expectedReadingTime"])
+    por_id = Counter(r["_id"] for r in data)
+    libro = {r["_id"]: r for r in data}
+    reporte = sorted(((i, {"author": libro[i]["author"], "title": libro[i]["title"], "totalCheckouts": n})
+                      for i, n in por_id.items()), key=lambda p: (-p[1]["totalCheckouts"], p[1]["title"]))
+    return contador, tiempos, reporte[:TOP]
+
+
+def _comparar(res, data):
+    contador, tiempos, reporte = _esperado(data)
+    assert list(res[CONTADOR_LIBROS.name]) == contador
+    assert list(res[REPORTE_AUTORES.name]) == reporte
+    promedios = dict(res[PROMEDIO_LECTURA.name])
+    assert set(promedios) == set(tiempos)
+    for estado, vals in tiempos.items():
+        s = promedios[estado]
+        assert s.count == len(vals)
+        assert s.mean == pytest.approx(sum(vals) / len(vals))
+        assert s.std == pytest.approx((sum((v - s.mean) ** 2 for v in vals) / len(vals)) ** 0.5)
+        mediana = sorted(vals)[(len(vals) - 1) // 2]
+        assert s.quantile(0.5) == pytest.approx(mediana, rel=0.011)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_fusionado_igual_que_por_separado(workers, tmp_path):
+    data = _registros()
+    path = tmp_path / "datos.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in data), encoding="utf-8")
+
+    with MapReduceEngine(workers) as engine:
+        fusionado = engine.run_fused(JOBS, leer_registros(str(path)), chunk_size=173)
+        preparar_datos(data)
+        por_particion = {job.name: engine.run(job, splits_por_particion(data)) for job in JOBS}
+        fijos = {job.name: engine.run(job, splits_fijos(data, 500)) for job in JOBS}
+
+    for res in (fusionado, por_particion, fijos):
+        _comparar(res, data)
+    assert fusionado[CONTADOR_LIBROS.name].counters["input_records"] == len(data)
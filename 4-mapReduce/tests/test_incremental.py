@@ -0,0 +1,132 @@
+import os
+import random
+
+import pytest
+
+from engine import MapReduceEngine
+from incremental import IncrementalRunner, StateStore, empaquetar
+from mapreduce import CONTADOR_LIBROS, JOBS, PROMEDIO_LECTURA, REPORTE_AUTORES, enriquecer
+
+
+def _libros(n, tiempo=30):
+    return [{"_id": f"id_{i}", "title": f"Libro {i}", "author": "Autor", "userInterestState": "casual",
+             "expectedReadingTime": tiempo + i} for i in range(n)]
+
+
+def test_corregir_un_lote_no_pisa_sus_parciales_antes_del_manifest(tmp_path):
+    with MapReduceEngine(1) as engine:
+        runner = IncrementalRunner(JOBS, StateStore(str(tmp_path)), engine)
+        runner.apply({"b1": _libros(3)})
+        viejo = runner.store.batches()["b1"]["file"]
+
+        # Se corta justo antes del commit: el lote corregido ya está en disco
+        store = runner.store
+        store.save_partials({"b1": (store.load_partials("b1"), {"records": 3, "fingerprint": "otra"})})
+        nuevo = store.batches()["b1"]["file"]
+        assert nuevo != viejo
+        assert sorted(os.listdir(tmp_path / "lotes")) == sorted([viejo, nuevo])
+
+        # Al reabrir, el manifest en disco sigue apuntando al archivo viejo, que existe
+        reabierto = IncrementalRunner(JOBS, StateStore(str(tmp_path)), engine)
+        assert reabierto.store.batches()["b1"]["file"] == viejo
+        assert os.listdir(tmp_path / "lotes") == [viejo]
+        assert not reabierto.rebuilt
+
+        # Con el commit el viejo se borra, después de escribir el manifest
+        reabierto.apply({"b1": _libros(4)})
+        actual = reabierto.store.batches()["b1"]["file"]
+        assert actual != viejo
+        assert os.listdir(tmp_path / "lotes") == [actual]
+        [(_, resumen)] = reabierto.results()[PROMEDIO_LECTURA.name]
+        assert resumen.count == 4
+
+
+def test_batch_id_estable_entre_corridas():
+    assert enriquecer({"_id": "id_7"})["batchId"] == enriquecer({"_id": "id_7"})["batchId"]
+    assert enriquecer({"_id": "id_7", "batchId": "batch_2025_01_07"})["batchId"] == "batch_2025_01_07"
+
+
+def test_lotes_chicos_van_en_un_solo_archivo(tmp_path):
+    assert empaquetar({"a": 3, "b": 3, "c": 9, "d": 1}, 6) == [["a", "b"], ["c"], ["d"]]
+    lotes = {f"b{i}": _libros(2, tiempo=10 * i) for i in range(40)}
+    with MapReduceEngine(1) as engine:
+        runner = IncrementalRunner(JOBS, StateStore(str(tmp_path)), engine)
+        s = runner.apply(lotes, por_archivo=25)
+        assert len(s["new"]) == 40
+        assert len(os.listdir(tmp_path / "lotes")) == 4
+        # Los parciales salen separados por lote aunque pasaron juntos por el motor
+        [(_, resumen)] = runner.store.load_partials("b3")[PROMEDIO_LECTURA.name].items()
+        assert (resumen.count, resumen.mean) == (2, 30.5)
+
+        # Retirar un lote no borra el paquete que comparte con otros
+        runner.retract(["b0"])
+        assert len(os.listdir(tmp_path / "lotes")) == 4
+        runner.retract([f"b{i}" for i in range(1, 12)])
+        assert len(os.listdir(tmp_path / "lotes")) == 3
+
+
+def _prestamos(n=2000, lotes=30, seed=3):
+    rng = random.Random(seed)
+    estados = ["casual", "focused", "research", "browsing"]
+    res = {}
+    for i in range(n):
+        libro = min(int(rng.paretovariate(1.2)) - 1, 79)
+        res.setdefault(f"b{i % lotes}", []).append({
+            "_id": f"id_{libro}", "title": f"Libro {libro % 60}", "author": f"Autor {libro % 9}",
+            "userInterestState": rng.choice(estados), "expectedReadingTime": rng.randint(5, 300)})
+    return res
+
+
+def _comparar(incremental, completo):
+    assert incremental[CONTADOR_LIBROS.name] == list(completo[CONTADOR_LIBROS.name])
+    assert incremental[REPORTE_AUTORES.name] == list(completo[REPORTE_AUTORES.name])
+    inc = dict(incremental[PROMEDIO_LECTURA.name])
+    todo = dict(completo[PROMEDIO_LECTURA.name])
+    assert inc.keys() == todo.keys()
+    for k, esperado in todo.items():
+        s = inc[k]
+        assert s.count == esperado.count
+        assert s.mean == pytest.approx(esperado.mean)
+        assert s.std == pytest.approx(esperado.std)
+        assert (s.moments.min, s.moments.max) == (esperado.moments.min, esperado.moments.max)
+        for q in (0, 0.25, 0.5, 0.9, 1):
+            assert s.quantile(q) == esperado.quantile(q)
+
+
+def _extremo(lotes, mejor):
+    """El lote que tiene el mínimo (o máximo) de alguna categoría."""
+    _, batch_id = mejor((r["expectedReadingTime"], b) for b, regs in lotes.items() for r in regs)
+    return batch_id
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_corregir_y_retirar_igual_que_recalcular_todo(workers, tmp_path):
+    lotes = _prestamos()
+    # Se corrige el lote con el máximo y se retira el del mínimo: sus llaves no
+    # se pueden restar y se rehacen desde los parciales
+    a_corregir = _extremo(lotes, max)
+    retirados = sorted({"b9", _extremo({b: r for b, r in lotes.items() if b != a_corregir}, min)} - {a_corregir})
+    with MapReduceEngine(workers) as engine:
+        runner = IncrementalRunner(JOBS, StateStore(str(tmp_path)), engine)
+        runner.apply(lotes, chunk_size=97, por_archivo=300)
+
+        # Cambian tiempos, sobra un registro y aparece un libro nuevo
+        corregido = [dict(r, expectedReadingTime=r["expectedReadingTime"] // 2) for r in lotes[a_corregir][1:]]
+        corregido.append(dict(lotes[a_corregir][0], _id="id_nuevo", title="Libro nuevo"))
+        s = runner.apply(dict(lotes, **{a_corregir: corregido}), chunk_size=97, por_archivo=300)
+        assert s["corrected"] == [a_corregir] and len(s["unchanged"]) == len(lotes) - 1
+        assert s["records_processed"] == len(corregido)
+        assert s["rebuilt_keys"] == {PROMEDIO_LECTURA.name: 1}
+
+        assert runner.retract(retirados + ["no_existe"]) == retirados
+
+        final = {b: regs for b, regs in dict(lotes, **{a_corregir: corregido}).items() if b not in retirados}
+        completo = engine.run_fused(JOBS, [r for regs in final.values() for r in regs])
+        _comparar(runner.results(), completo)
+
+        # Lo guardado en disco da lo mismo: sin reconstruir y reconstruyendo
+        reabierto = IncrementalRunner(JOBS, StateStore(str(tmp_path)), engine)
+        assert not reabierto.rebuilt
+        _comparar(reabierto.results(), completo)
+        reabierto.rebuild()
+        _comparar(reabierto.results(), completo)
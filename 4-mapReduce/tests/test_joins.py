@@ -0,0 +1,81 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from engine import MapReduceEngine
+from joins import hash_join, join, sort_merge_join
+from mapreduce import REPORTE_AUTORES, catalogo_unico, reporte_por_join
+from streaming import leer_registros
+
+
+def _lados(seed=0):
+    rng = random.Random(seed)
+    izq = [{"k": rng.randrange(40), "i": i} for i in range(600)]
+    der = [{"k": rng.randrange(60), "j": j} for j in range(300)]
+    return izq, der
+
+
+def _multiconjunto(pares):
+    return Counter((l["i"], r and r["j"]) for l, r in pares)
+
+
+@pytest.mark.parametrize("how", ["inner", "left"])
+def test_broadcast_y_sort_merge_con_llaves_repetidas(how, tmp_path):
+    izq, der = _lados()
+    esperado = Counter()
+    for l in izq:
+        matches = [r for r in der if r["k"] == l["k"]]
+        for r in matches:
+            esperado[(l["i"], r["j"])] += 1
+        if how == "left" and not matches:
+            esperado[(l["i"], None)] += 1
+
+    broadcast = _multiconjunto(hash_join(der, izq, "k", "k", how))
+    # Presupuesto chico: corridas a disco en los dos lados
+    sort_merge = _multiconjunto(sort_merge_join(iter(izq), iter(der), "k", "k", how,
+                                                memory_budget=37, tmpdir=tmp_path))
+    assert broadcast == sort_merge == esperado
+
+    for budget, estrategia in ((1000, "broadcast_right"), (50, "sort_merge")):
+        nombre, pares = join(iter(izq), iter(der), "k", "k", how, memory_budget=budget, tmpdir=tmp_path)
+        assert nombre == estrategia
+        assert _multiconjunto(pares) == esperado
+
+
+def _prestamos(path, n=2000, libros=80, seed=1):
+    rng = random.Random(seed)
+    registros = []
+    for _ in range(n):
+        i = min(int(rng.paretovariate(1.1)) - 1, libros - 1)
+        registros.append({"_id": f"id_{i:03d}", "title": f"Libro {i}", "author": f"Autor {i % 9}"})
+    path.write_text(json.dumps(registros), encoding="utf-8")
+    return registros
+
+
+@pytest.mark.parametrize("budget", [10000, 25])
+def test_reporte_por_join_igual_que_el_job(budget, tmp_path):
+    path = tmp_path / "prestamos.json"
+    registros = _prestamos(path)
+    with MapReduceEngine(1) as engine:
+        job = [fila for _, fila in engine.run_fused([REPORTE_AUTORES], leer_registros(str(path)))[REPORTE_AUTORES.name]]
+
+    estrategia, filas = reporte_por_join(str(path), memory_budget=budget, tmpdir=str(tmp_path))
+    assert estrategia == ("broadcast_right" if budget > 1000 else "sort_merge")
+    assert filas == job
+    # Los totales son préstamos, no préstamos al cuadrado
+    assert filas[0]["totalCheckouts"] == Counter(r["_id"] for r in registros).most_common(1)[0][1]
+
+
+def test_catalogo_aparte_y_unico(tmp_path):
+    path = tmp_path / "prestamos.json"
+    registros = _prestamos(path)
+    catalogo = list(catalogo_unico(str(path), memory_budget=7, tmpdir=str(tmp_path)))
+    assert [c["_id"] for c in catalogo] == sorted({r["_id"] for r in registros})
+
+    aparte = tmp_path / "catalogo.jsonl"
+    aparte.write_text("".join(json.dumps(dict(c, title=c["title"].upper())) + "\n" for c in catalogo),
+                      encoding="utf-8")
+    _, filas = reporte_por_join(str(path), catalogo=str(aparte))
+    assert all(f["title"].isupper() for f in filas)
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import sys
+from collections import namedtuple
+
+import pytest
+
+import scaling
+
+
+def _base(tmp_path, n=5):
+    base = [{"_id": str(i), "title": f"Libro {i}", "genre": "ficción"} for i in range(n)]
+    path = tmp_path / "base.json"
+    path.write_text(json.dumps(base), encoding="utf-8")
+    return base, str(path)
+
+
+def test_sin_espacio_no_se_genera_nada(tmp_path, monkeypatch):
+    _, path = _base(tmp_path)
+    Uso = namedtuple("Uso", "total used free")
+    monkeypatch.setattr(shutil, "disk_usage", lambda _: Uso(10 ** 9, 10 ** 9, 1024))
+    with pytest.raises(RuntimeError, match="MB libres"):
+        scaling.preparar_archivo(path, 1000, str(tmp_path))
+    assert not (tmp_path / "biblioteca4_1000.jsonl").exists()
+
+
+def test_con_espacio_genera_la_biblioteca(tmp_path):
+    _, path = _base(tmp_path)
+    salida = scaling.preparar_archivo(path, 12, str(tmp_path))
+    with open(salida, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == 12
+    # La base tal cual no se copia
+    assert scaling.preparar_archivo(path, 5, str(tmp_path)) == path
+
+
+def _correr_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["scaling.py", *args])
+    scaling.main()
+
+
+def test_barrido_por_defecto_en_chico(tmp_path, monkeypatch):
+    # Los primeros 40 de la biblioteca real: los jobs necesitan todo el esquema
+    aqui = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(aqui, "biblioteca4.json"), encoding="utf-8") as f:
+        base = json.load(f)[:40]
+    datos = tmp_path / "base.json"
+    datos.write_text(json.dumps(base), encoding="utf-8")
+    salida = tmp_path / "reporte.json"
+    tmp = tmp_path / "tmp"
+    tmp.mkdir()
+
+    # El barrido por defecto (la base y TAMANOS), con un TAMANOS de juguete
+    monkeypatch.setattr(scaling, "TAMANOS", (90,))
+    _correr_main(monkeypatch, "--datos", str(datos), "--workers", "1", "2", "--tmp", str(tmp),
+                 "--salida", str(salida), "--json")
+
+    r = json.loads(salida.read_text(encoding="utf-8"))
+    assert r["meta"]["sizes"] == [40, 90]
+    filas = r["results"]
+    assert [(f["size"], f["workers"]) for f in filas] == [(40, 1), (40, 2), (90, 1), (90, 2)]
+    for f in filas:
+        assert f["records"] == f["size"]
+        assert f["wall_s"] > 0 and f["records_per_s"] > 0
+        assert set(f["phases_s"]) == set(scaling.FASES_FUSED)
+        assert f["rss_coordinator_kb"] > 0
+    assert [f["speedup"] for f in filas if f["workers"] == 1] == [1.0, 1.0]
+    # Las bibliotecas generadas se borran al terminar
+    assert os.listdir(tmp) == []
+
+
+def test_barrido_grande_sin_espacio_no_genera_nada(tmp_path, monkeypatch):
+    _, path = _base(tmp_path)
+    tmp = tmp_path / "tmp"
+    tmp.mkdir()
+    Uso = namedtuple("Uso", "total used free")
+    monkeypatch.setattr(shutil, "disk_usage", lambda _: Uso(10 ** 12, 10 ** 12, 100 * 2 ** 20))
+    with pytest.raises(RuntimeError, match="MB libres"):
+        _correr_main(monkeypatch, "--datos", path, "--grande", "--workers", "1", "--tmp", str(tmp))
+    assert os.listdir(tmp) == []
@@ -0,0 +1,3 @@
+# Código compartido por las unidades 1 y 2 (índices, tabla hash, BookStore,
+# snapshots, bitácora y el servidor). Cada unidad lo importa como `comun.*`
+# después de importar su `_comun`, que deja la raíz del repo en sys.path.
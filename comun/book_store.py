@@ -0,0 +1,533 @@
+from array import array
+from collections.abc import MutableMapping
+
+
+class _Incompatible(Exception):
+    """El valor no cabe en el tipo de la columna: hay que convertirla."""
+
+
+class _Bitmap:
+    """Conjunto de números de fila como bits de un bytearray (1 bit por fila)."""
+
+    __slots__ = ('bits',)
+
+    def __init__(self, n=0):
+        # Arranca con las filas [0, n)
+        self.bits = bytearray(b'\xff' * (n >> 3))
+        if n & 7:
+            self.bits.append((1 << (n & 7)) - 1)
+
+    def add(self, i):
+        j = i >> 3
+        if j >= len(self.bits):
+            self.bits.extend(bytes(j + 1 - len(self.bits)))
+        self.bits[j] |= 1 << (i & 7)
+
+    def discard(self, i):
+        j = i >> 3
+        if j < len(self.bits):
+            self.bits[j] &= ~(1 << (i & 7)) & 0xFF
+
+    def __contains__(self, i):
+        j = i >> 3
+        return j < len(self.bits) and (self.bits[j] >> (i & 7)) & 1 == 1
+
+    def __len__(self):
+        return sum(bin(b).count('1') for b in self.bits)
+
+
+# Enteros más grandes no caben exactos en un double
+_MAX_EXACT_INT = 2 ** 53
+
+
+class NumberColumn:
+    """
+    Enteros en array('q'), floats en array('d') y booleanos en array('b').
+    Una columna 'd' puede tener enteros (llegó un float a una columna de
+    enteros, o al revés): las filas que eran int quedan marcadas en `ints`
+    y se devuelven como int, así el JSON sale igual que entró.
+    """
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.data = array(typecode)
+        self.ints = None
+
+    @staticmethod
+    def accepts(typecode, value):
+        if typecode == 'b':
+            return type(value) is bool
+        if typecode == 'q':
+            return type(value) is int
+        return type(value) is float or type(value) is int and abs(value) <= _MAX_EXACT_INT
+
+    def _mark(self, i, value):
+        if self.typecode != 'd':
+            return
+        if type(value) is int:
+            if self.ints is None:
+                self.ints = _Bitmap()
+            self.ints.add(i)
+        elif self.ints is not None:
+            self.ints.discard(i)
+
+    def append(self, value):
+        if not self.accepts(self.typecode, value):
+            raise _Incompatible
+        try:
+            self.data.append(value)
+        except OverflowError:
+            raise _Incompatible
+        self._mark(len(self.data) - 1, value)
+
+    def append_default(self):
+        self.data.append(0)
+
+    def get(self, i):
+        v = self.data[i]
+        if self.typecode == 'b':
+            return bool(v)
+        if self.ints is not None and i in self.ints:
+            return int(v)
+        return v
+
+    to_python = get
+
+    def set(self, i, value):
+        if not self.accepts(self.typecode, value):
+            raise _Incompatible
+        try:
+            self.data[i] = value
+        except OverflowError:
+            raise _Incompatible
+        self._mark(i, value)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class CategoryColumn:
+    """
+    Strings codificados por diccionario: cada fila guarda un código uint32
+    y el texto vive una sola vez en `values`. El código 0 es None.
+    """
+
+    # Pasado este umbral (muchos valores distintos) sale más barato un StringColumn
+    MAX_RATIO = 0.5
+    MIN_VALUES = 256
+
+    def __init__(self):
+        self.codes = array('I')
+        self.values = [None]
+        self.lookup = {None: 0}
+
+    def _code(self, value):
+        if value is not None and type(value) is not str:
+            raise _Incompatible
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.lookup[value] = code
+        return code
+
+    def append(self, value):
+        self.codes.append(self._code(value))
+
+    def append_default(self):
+        self.codes.append(0)
+
+    def get(self, i):
+        return self.values[self.codes[i]]
+
+    to_python = get
+
+    def set(self, i, value):
+        self.codes[i] = self._code(value)
+
+    def too_diverse(self):
+        return len(self.values) > self.MIN_VALUES and len(self.values) > len(self.codes) * self.MAX_RATIO
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class StringColumn:
+    """Strings únicos (ids, títulos) empaquetados en un solo buffer UTF-8."""
+
+    def __init__(self):
+        self.blob = bytearray()
+        self.starts = array('q')
+        self.lens = array('i')
+
+    def _encode(self, value):
+        if value is None:
+            return None
+        if type(value) is not str:
+            raise _Incompatible
+        return value.encode('utf-8')
+
+    def append(self, value):
+        raw = self._encode(value)
+        self.starts.append(len(self.blob))
+        if raw is None:
+            self.lens.append(-1)
+        else:
+            self.lens.append(len(raw))
+            self.blob += raw
+
+    def append_default(self):
+        self.starts.append(len(self.blob))
+        self.lens.append(0)
+
+    def get(self, i):
+        n = self.lens[i]
+        if n < 0:
+            return None
+        s = self.starts[i]
+        return self.blob[s:s + n].decode('utf-8')
+
+    to_python = get
+
+    def set(self, i, value):
+        # El texto viejo queda como basura en el buffer; se limpia al reconstruir
+        raw = self._encode(value)
+        self.starts[i] = len(self.blob)
+        if raw is None:
+            self.lens[i] = -1
+        else:
+            self.lens[i] = len(raw)
+            self.blob += raw
+
+    def __len__(self):
+        return len(self.lens)
+
+
+class ObjectColumn:
+    """Último recurso: objetos de Python tal cual."""
+
+    def __init__(self, values=None):
+        self.data = values if values is not None else []
+
+    def append(self, value):
+        self.data.append(value)
+
+    def append_default(self):
+        self.data.append(None)
+
+    def get(self, i):
+        return self.data[i]
+
+    to_python = get
+
+    def set(self, i, value):
+        self.data[i] = value
+
+    def __len__(self):
+        return len(self.data)
+
+
+class StructColumn:
+    """Campo anidado (dict): sus llaves son columnas de un ColumnStore hijo."""
+
+    def __init__(self):
+        self.child = ColumnStore()
+
+    def append(self, value):
+        if not isinstance(value, (dict, BookRow)):
+            raise _Incompatible
+        self.child.append(value)
+
+    def append_default(self):
+        self.child.append({})
+
+    def get(self, i):
+        return BookRow(self.child, i)
+
+    def to_python(self, i):
+        return self.child.to_dict(i)
+
+    def set(self, i, value):
+        if not isinstance(value, (dict, BookRow)):
+            raise _Incompatible
+        value = dict(value.items())
+        self.child.clear_row(i)
+        for k, v in value.items():
+            self.child.set(i, k, v)
+
+    def __len__(self):
+        return len(self.child)
+
+
+class ListColumn:
+    """
+    Listas de largo variable: (inicio, largo) por fila y todos los elementos
+    en un ColumnStore hijo. Listas de dicts (contentSimilarity) quedan
+    columnares; listas de escalares o de listas usan la columna '_v'.
+    """
+
+    def __init__(self, of_dicts):
+        self.of_dicts = of_dicts
+        self.starts = array('q')
+        self.lens = array('I')
+        self.child = ColumnStore()
+
+    def _push(self, value):
+        if not isinstance(value, list):
+            raise _Incompatible
+        for item in value:
+            if isinstance(item, dict) != self.of_dicts:
+                raise _Incompatible
+        start = len(self.child)
+        for item in value:
+            self.child.append(item if self.of_dicts else {'_v': item})
+        return start, len(value)
+
+    def append(self, value):
+        start, n = self._push(value)
+        self.starts.append(start)
+        self.lens.append(n)
+
+    def append_default(self):
+        self.starts.append(len(self.child))
+        self.lens.append(0)
+
+    def get(self, i):
+        """Devuelve una lista nueva: para modificar el campo hay que reasignarlo."""
+        s = self.starts[i]
+        rows = range(s, s + self.lens[i])
+        if self.of_dicts:
+            return [BookRow(self.child, j) for j in rows]
+        return [self.child.get(j, '_v') for j in rows]
+
+    def to_python(self, i):
+        s = self.starts[i]
+        rows = range(s, s + self.lens[i])
+        if self.of_dicts:
+            return [self.child.to_dict(j) for j in rows]
+        return [self.child.columns['_v'].to_python(j) for j in rows]
+
+    def set(self, i, value):
+        if isinstance(value, list):
+            value = [dict(v.items()) if isinstance(v, BookRow) else v for v in value]
+        self.starts[i], self.lens[i] = self._push(value)
+
+    def __len__(self):
+        return len(self.lens)
+
+
+def _new_column(value):
+    t = type(value)
+    if t is bool:
+        return NumberColumn('b')
+    if t is int:
+        return NumberColumn('q')
+    if t is float:
+        return NumberColumn('d')
+    if t is str:
+        return CategoryColumn()
+    if t is dict:
+        return StructColumn()
+    if t is list and value and all(isinstance(v, dict) for v in value):
+        return ListColumn(of_dicts=True)
+    if t is list and all(not isinstance(v, dict) for v in value):
+        return ListColumn(of_dicts=False)
+    return ObjectColumn()
+
+
+class ColumnStore:
+    """
+    Tabla columnar genérica. El tipo de cada columna sale del primer valor
+    que se ve, y si luego llega algo que no cabe la columna se convierte
+    (int -> float, categoría -> string, cualquier cosa -> objeto).
+    Las filas que no tienen un campo quedan en `missing[campo]`, un bitmap:
+    en datos dispersos cuesta un bit por fila, no un int en un set.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.missing = {}
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def _add_column(self, name, value):
+        col = _new_column(value)
+        for _ in range(self.n):
+            col.append_default()
+        self.columns[name] = col
+        if self.n:
+            self.missing[name] = _Bitmap(self.n)
+        return col
+
+    def _convert(self, name, value):
+        old = self.columns[name]
+        if (isinstance(old, NumberColumn) and old.typecode == 'q' and type(value) is float
+                and all(abs(v) <= _MAX_EXACT_INT for v in old.data)):
+            new = NumberColumn('d')
+            new.data = array('d', old.data)
+            # Los que ya estaban siguen siendo int
+            new.ints = _Bitmap(len(old))
+        elif isinstance(old, CategoryColumn) and (value is None or type(value) is str):
+            new = StringColumn()
+            for i in range(len(old)):
+                new.append(old.get(i))
+        else:
+            new = ObjectColumn([old.to_python(i) for i in range(len(old))])
+        self.columns[name] = new
+        return new
+
+    def append(self, record):
+        row = self.n
+        for name, value in record.items():
+            col = self.columns.get(name)
+            if col is None:
+                col = self._add_column(name, value)
+            try:
+                col.append(value)
+            except _Incompatible:
+                col = self._convert(name, value)
+                col.append(value)
+            if isinstance(col, CategoryColumn) and col.too_diverse():
+                self._convert(name, None)
+
+        self.n += 1
+        for name, col in self.columns.items():
+            if len(col) < self.n:
+                col.append_default()
+                self._missing(name).add(row)
+        return row
+
+    def _missing(self, name):
+        missing = self.missing.get(name)
+        if missing is None:
+            missing = self.missing[name] = _Bitmap()
+        return missing
+
+    def has(self, row, name):
+        if name not in self.columns:
+            return False
+        missing = self.missing.get(name)
+        return missing is None or row not in missing
+
+    def get(self, row, name):
+        if not self.has(row, name):
+            raise KeyError(name)
+        return self.columns[name].get(row)
+
+    def set(self, row, name, value):
+        col = self.columns.get(name)
+        if col is None:
+            col = self._add_column(name, value)
+        try:
+            col.set(row, value)
+        except _Incompatible:
+            self._convert(name, value).set(row, value)
+        missing = self.missing.get(name)
+        if missing is not None:
+            missing.discard(row)
+
+    def delete(self, row, name):
+        if not self.has(row, name):
+            raise KeyError(name)
+        self._missing(name).add(row)
+
+    def clear_row(self, row):
+        for name in self.columns:
+            self._missing(name).add(row)
+
+    def fields(self, row):
+        return [name for name in self.columns if self.has(row, name)]
+
+    def to_dict(self, row):
+        return {name: self.columns[name].to_python(row) for name in self.fields(row)}
+
+
+class BookRow(MutableMapping):
+    """
+    Vista liviana (sin __dict__) sobre una fila del store. Se comporta como
+    el dict del libro, así que LibrarySystem la usa sin cambios.
+    Dos vistas de la misma fila son iguales.
+    """
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, name):
+        return self.store.get(self.row, name)
+
+    def __setitem__(self, name, value):
+        self.store.set(self.row, name, value)
+
+    def __delitem__(self, name):
+        self.store.delete(self.row, name)
+
+    def __contains__(self, name):
+        return self.store.has(self.row, name)
+
+    def __iter__(self):
+        return iter(self.store.fields(self.row))
+
+    def __len__(self):
+        return len(self.store.fields(self.row))
+
+    def __eq__(self, other):
+        if isinstance(other, BookRow):
+            return self.store is other.store and self.row == other.row
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self.store), self.row))
+
+    def __reduce__(self):
+        return BookRow, (self.store, self.row)
+
+    def to_dict(self):
+        return self.store.to_dict(self.row)
+
+    def __repr__(self):
+        return f"BookRow({self.to_dict()!r})"
+
+
+class BookStore(ColumnStore):
+    """
+    Almacén columnar del catálogo. `append` recibe el dict del JSON y
+    devuelve un BookRow; el dict original ya se puede soltar.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.deleted = set()
+
+    def append(self, record):
+        return BookRow(self, super().append(record))
+
+    def remove(self, book):
+        self.deleted.add(book.row)
+
+    def __len__(self):
+        return self.n - len(self.deleted)
+
+    def rows(self):
+        for i in range(self.n):
+            if i not in self.deleted:
+                yield BookRow(self, i)
+
+    def column(self, name):
+        """
+        Arreglo crudo de una columna numérica (incluye filas borradas,
+        ver `deleted`). Ideal para sumas y filtros sin tocar las filas.
+        """
+        col = self.columns[name]
+        if not isinstance(col, NumberColumn):
+            raise TypeError(f"La columna '{name}' no es numérica")
+        return col.data
+
+    def as_numpy(self, name):
+        """Mismo buffer que `column`, visto como arreglo de NumPy (sin copiar)."""
+        import numpy as np
+        return np.frombuffer(self.column(name), dtype=self.column(name).typecode)
@@ -0,0 +1,164 @@
+import zlib
+
+_EMPTY = None
+
+
+class _Deleted:
+    # Al serializar (snapshot) vuelve a ser la misma lápida del módulo
+    def __reduce__(self):
+        return '_DELETED'
+
+    def __repr__(self):
+        return '<borrado>'
+
+
+_DELETED = _Deleted()
+
+
+def stable_hash(key):
+    """Hash determinista (CRC32): el mismo id cae en el mismo bucket en cualquier proceso."""
+    if isinstance(key, bytes):
+        return zlib.crc32(key)
+    return zlib.crc32(str(key).encode('utf-8'))
+
+
+class HashTable:
+    """
+    Tabla hash de direccionamiento abierto (sondeo lineal) para la llave
+    primaria de los libros.
+
+    Se redimensiona sola al doble cuando (ocupados + borrados) / capacidad
+    pasa de `max_load`, así que las cadenas no crecen con el catálogo y
+    get/put/delete se mantienen en O(1) amortizado.
+    """
+
+    def __init__(self, capacity=8, max_load=0.7):
+        if not 0 < max_load < 1:
+            raise ValueError("max_load debe estar entre 0 y 1")
+        self.max_load = max_load
+        self.resizes = 0
+        self._alloc(self._round_capacity(capacity))
+
+    @staticmethod
+    def _round_capacity(n):
+        cap = 8
+        while cap < n:
+            cap <<= 1
+        return cap
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._keys = [_EMPTY] * capacity
+        self._values = [None] * capacity
+        self._hashes = [0] * capacity
+        self._size = 0
+        self._deleted = 0
+
+    def _resize(self, capacity):
+        old = [(h, k, v) for h, k, v in zip(self._hashes, self._keys, self._values)
+               if k is not _EMPTY and k is not _DELETED]
+        self._alloc(capacity)
+        keys, values, hashes, mask = self._keys, self._values, self._hashes, self._mask
+        for h, k, v in old:
+            i = h & mask
+            while keys[i] is not _EMPTY:
+                i = (i + 1) & mask
+            keys[i] = k
+            values[i] = v
+            hashes[i] = h
+        self._size = len(old)
+        self.resizes += 1
+
+    def _lookup(self, key, h):
+        """Posición de la llave, o -1 si no está."""
+        keys, hashes, mask = self._keys, self._hashes, self._mask
+        i = h & mask
+        while True:
+            k = keys[i]
+            if k is _EMPTY:
+                return -1
+            if k is not _DELETED and hashes[i] == h and k == key:
+                return i
+            i = (i + 1) & mask
+
+    def get(self, key, default=None):
+        i = self._lookup(key, stable_hash(key))
+        return default if i < 0 else self._values[i]
+
+    def put(self, key, value):
+        """Inserta o actualiza. Devuelve True si la llave era nueva."""
+        h = stable_hash(key)
+        i = self._lookup(key, h)
+        if i >= 0:
+            self._values[i] = value
+            return False
+
+        if (self._size + self._deleted + 1) > self.capacity * self.max_load:
+            # Si casi todo son borrados basta con limpiar; si no, se duplica
+            grow = self._size + 1 > self.capacity * self.max_load / 2
+            self._resize(self.capacity * 2 if grow else self.capacity)
+
+        keys, mask = self._keys, self._mask
+        i = h & mask
+        while keys[i] is not _EMPTY and keys[i] is not _DELETED:
+            i = (i + 1) & mask
+        if keys[i] is _DELETED:
+            self._deleted -= 1
+        keys[i] = key
+        self._values[i] = value
+        self._hashes[i] = h
+        self._size += 1
+        return True
+
+    def delete(self, key):
+        """Borra la llave dejando una lápida. Devuelve el valor o None."""
+        i = self._lookup(key, stable_hash(key))
+        if i < 0:
+            return None
+        value = self._values[i]
+        self._keys[i] = _DELETED
+        self._values[i] = None
+        self._size -= 1
+        self._deleted += 1
+        return value
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return self._lookup(key, stable_hash(key)) >= 0
+
+    def items(self):
+        for k, v in zip(self._keys, self._values):
+            if k is not _EMPTY and k is not _DELETED:
+                yield k, v
+
+    def __iter__(self):
+        for k, _ in self.items():
+            yield k
+
+    def load_factor(self):
+        return self._size / self.capacity
+
+    def stats(self):
+        """Factor de carga y largo de sondeo (1 = la llave está en su bucket)."""
+        mask = self._mask
+        total = 0
+        longest = 0
+        for i, k in enumerate(self._keys):
+            if k is _EMPTY or k is _DELETED:
+                continue
+            probe = ((i - self._hashes[i]) & mask) + 1
+            total += probe
+            if probe > longest:
+                longest = probe
+        return {
+            "size": self._size,
+            "capacity": self.capacity,
+            "load_factor": round(self.load_factor(), 4),
+            "tombstones": self._deleted,
+            "resizes": self.resizes,
+            "avg_probe": round(total / self._size, 4) if self._size else 0.0,
+            "max_probe": longest,
+        }
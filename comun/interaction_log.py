@@ -0,0 +1,235 @@
+import json
+import os
+import time
+import warnings
+from datetime import datetime
+
+from .snapshot import save_snapshot
+
+
+def as_event(event, default_user="anon"):
+    """
+    Normaliza un evento a (book_id, user_id, timestamp). Se acepta el id
+    solo, una tupla (book_id, user_id[, timestamp]) o un dict con esas llaves.
+    """
+    if isinstance(event, dict):
+        book_id = event["book_id"]
+        user_id = event.get("user_id", default_user)
+        ts = event.get("timestamp")
+    elif isinstance(event, (tuple, list)):
+        book_id = event[0]
+        user_id = event[1] if len(event) > 1 else default_user
+        ts = event[2] if len(event) > 2 else None
+    else:
+        book_id, user_id, ts = event, default_user, None
+    return book_id, user_id, ts or datetime.now().isoformat()
+
+
+class InteractionLog:
+    """
+    Bitácora de interacciones en JSONL, solo se agrega al final.
+
+    Cada lote (`append_many`) se escribe con un solo write y se hace fsync
+    cuando se juntan `fsync_every` registros o pasan `fsync_interval`
+    segundos (group commit). Cada registro lleva un número de secuencia; el
+    sistema guarda el último aplicado, así que re-aplicar la bitácora sobre
+    un snapshot nunca cuenta dos veces la misma vista.
+
+    Si se da `snapshot`, cada `compact_every` registros el estado se vuelca
+    al snapshot, la bitácora viva se junta en la base (`<raíz>.base.log`) y
+    se vacía. El snapshot se invalida si cambia el JSON, así que no puede
+    ser la única copia de esas vistas: al reconstruir desde el JSON se
+    aplica la base y luego la bitácora viva. Con un snapshot al día la base
+    ni se lee.
+
+    La base guarda un registro por par (libro, usuario): cuántas veces,
+    el último timestamp y el último seq, así que crece con los pares
+    distintos y no con los eventos. Al re-aplicarla salen los mismos
+    conteos, usuarios y último acceso por libro; lo que se pierde es el
+    orden exacto de los eventos viejos (solo le importa a DGIM).
+    """
+
+    def __init__(self, path, fsync_every=1000, fsync_interval=1.0,
+                 snapshot=None, source=None, compact_every=100000):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.snapshot = snapshot
+        self.source = source
+        self.compact_every = compact_every
+
+        root, ext = os.path.splitext(path)
+        self.base_path = f"{root}.base{ext}"
+
+        self.seq = self.base_seq = self._base_header()
+        self.since_compaction = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._records = self._load()
+        self.f = open(path, "ab")
+
+    def _base_header(self):
+        """Último seq juntado en la base (su primera línea), 0 si no hay base."""
+        try:
+            with open(self.base_path, "rb") as f:
+                return json.loads(f.readline())["base_seq"]
+        except FileNotFoundError:
+            return 0
+
+    def _base_records(self):
+        if not os.path.exists(self.base_path):
+            return []
+        return [rec for rec in self._read(self.base_path)[0] if "base_seq" not in rec]
+
+    @staticmethod
+    def _read(path):
+        """
+        (registros, bytes buenos) de un archivo JSONL. Una línea corrupta a la
+        mitad se salta con un aviso; la última, si quedó a medio escribir, no
+        cuenta en los bytes buenos.
+        """
+        records = []
+        good = 0
+        with open(path, "rb") as f:
+            for n, line in enumerate(f, 1):
+                if not line.endswith(b"\n"):
+                    break
+                good += len(line)
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    rec = None
+                if not isinstance(rec, dict) or "seq" not in rec and "base_seq" not in rec:
+                    warnings.warn(f"{path}:{n}: registro corrupto, se salta", RuntimeWarning)
+                    continue
+                records.append(rec)
+        return records, good
+
+    def _load(self):
+        """Lee la bitácora viva y corta una última línea a medio escribir."""
+        if not os.path.exists(self.path):
+            return []
+
+        records, good = self._read(self.path)
+        if good < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        for rec in records:
+            self.seq = max(self.seq, rec["seq"])
+        self.since_compaction = len(records)
+        return records
+
+    def replay(self, system):
+        """Aplica al sistema los registros que su snapshot todavía no tenía."""
+        applied = 0
+        # Una base ya incluida en el snapshot ni se abre
+        if system.log_seq < self.base_seq:
+            if system.log_seq:
+                # La base no guarda eventos sueltos: no se puede aplicar a medias
+                warnings.warn(f"{self.base_path}: el snapshot (seq {system.log_seq}) es más viejo "
+                              f"que la base (seq {self.base_seq}); esas vistas no se re-aplican",
+                              RuntimeWarning)
+            else:
+                applied += self._apply_base(system, self._base_records())
+            system.log_seq = self.base_seq
+        applied += self._apply(system, self._records)
+        self._records = []
+        self.seq = max(self.seq, system.log_seq)
+        return applied
+
+    @staticmethod
+    def _apply(system, records, chunk=10000):
+        # Por lotes, igual que register_interactions (el Bloom hashea el lote entero)
+        pending = [rec for rec in records if rec["seq"] > system.log_seq]
+        for i in range(0, len(pending), chunk):
+            batch = pending[i:i + chunk]
+            system._apply_interactions([(rec["id"], rec["user"], rec["ts"]) for rec in batch])
+            system.log_seq = batch[-1]["seq"]
+        return len(pending)
+
+    @staticmethod
+    def _apply_base(system, records, chunk=10000):
+        batch = []
+        applied = 0
+        for rec in records:
+            batch.extend([(rec["id"], rec["user"], rec["ts"])] * rec["n"])
+            if len(batch) >= chunk:
+                system._apply_interactions(batch)
+                applied += len(batch)
+                batch = []
+        if batch:
+            system._apply_interactions(batch)
+            applied += len(batch)
+        return applied
+
+    def _merge_into_base(self):
+        """Junta la bitácora viva con la base y la escribe aparte (tmp + rename)."""
+        pairs = {}
+        for rec in self._base_records():
+            pairs[(rec["id"], rec["user"])] = rec
+        for rec in self._read(self.path)[0]:
+            if rec["seq"] <= self.base_seq:
+                continue
+            key = (rec["id"], rec["user"])
+            old = pairs.get(key)
+            pairs[key] = {"seq": rec["seq"], "id": rec["id"], "user": rec["user"], "ts": rec["ts"],
+                          "n": (old["n"] if old else 0) + 1}
+        # En orden de último seq: al re-aplicar, el último acceso de cada libro queda bien
+        lines = [json.dumps({"base_seq": self.seq})]
+        lines += [json.dumps(rec, ensure_ascii=False, separators=(",", ":"))
+                  for rec in sorted(pairs.values(), key=lambda r: r["seq"])]
+        tmp = self.base_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.base_path)
+        self.base_seq = self.seq
+
+    def append_many(self, events):
+        lines = []
+        for book_id, user_id, ts in events:
+            self.seq += 1
+            lines.append(json.dumps({"seq": self.seq, "id": book_id, "user": user_id, "ts": ts},
+                                    ensure_ascii=False, separators=(",", ":")))
+        if not lines:
+            return self.seq
+
+        self.f.write(("\n".join(lines) + "\n").encode("utf-8"))
+        self.f.flush()
+        self._pending += len(lines)
+        self.since_compaction += len(lines)
+
+        if (self._pending >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+        return self.seq
+
+    def sync(self):
+        if self._pending:
+            os.fsync(self.f.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def needs_compaction(self):
+        return (self.snapshot is not None and self.compact_every
+                and self.since_compaction >= self.compact_every)
+
+    def compact(self, system):
+        """
+        Vuelca el estado al snapshot, recién ahí junta la bitácora viva con
+        la base y la vacía. Si algo se corta en el medio, los registros que
+        ya están en la base se reconocen por su seq y no se cuentan dos veces.
+        """
+        self.sync()
+        save_snapshot(system, self.snapshot, source=self.source)
+        if self.since_compaction:
+            self._merge_into_base()
+            self.f.close()
+            self.f = open(self.path, "wb")
+            os.fsync(self.f.fileno())
+        self.since_compaction = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# Generador de carga para server.py: abre varias conexiones, manda una mezcla
+# de consultas (con repetidas a propósito, para que se note el coalescing) y
+# reporta throughput y latencias p50/p99.
+
+MIX = {"search": 0.4, "genre": 0.1, "book": 0.2, "recommend": 0.1, "interact": 0.2}
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    i = min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))
+    return orden[i]
+
+
+def armar_pedidos(datos, n, seed=42):
+    rng = random.Random(seed)
+    ids = [d["_id"] for d in datos]
+    palabras = [w.lower().strip(".,") for d in datos for w in d["title"].split() if len(w) > 3]
+    generos = sorted({d["genre"] for d in datos})
+    ops, pesos = zip(*MIX.items())
+
+    pedidos = []
+    for i in range(n):
+        op = rng.choices(ops, pesos)[0]
+        if op == "search":
+            req = {"op": "search", "query": rng.choice(palabras[:50]), "field": "title"}
+        elif op == "genre":
+            req = {"op": "genre", "genre": rng.choice(generos)}
+        elif op == "book":
+            req = {"op": "book", "book_id": rng.choice(ids)}
+        elif op == "recommend":
+            req = {"op": "recommend", "params": {"genre_preference": rng.choice(generos)}}
+        else:
+            req = {"op": "interact", "events": [[rng.choice(ids), f"user_{rng.randrange(5000)}"]]}
+        req["id"] = i
+        pedidos.append(req)
+    return pedidos
+
+
+async def conexion(pedidos, host, port, unix_path, latencias, errores, pipeline):
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path, limit=2 ** 24)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=2 ** 24)
+
+    enviados = {}
+
+    async def leer():
+        for _ in range(len(pedidos)):
+            linea = await reader.readline()
+            if not linea:
+                break
+            resp = json.loads(linea)
+            inicio = enviados.pop(resp.get("id"), None)
+            if inicio is not None:
+                latencias.append(time.perf_counter() - inicio)
+            if not resp.get("ok"):
+                errores.append(resp.get("error"))
+            ventana.release()
+
+    ventana = asyncio.Semaphore(pipeline)
+    lector = asyncio.ensure_future(leer())
+    for req in pedidos:
+        await ventana.acquire()
+        enviados[req["id"]] = time.perf_counter()
+        writer.write(json.dumps(req).encode("utf-8") + b"\n")
+        await writer.drain()
+    await lector
+    writer.close()
+
+
+def cargar_datos(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def correr(args):
+    datos = cargar_datos(args.datos)
+    pedidos = armar_pedidos(datos, args.requests)
+    por_conexion = [pedidos[i::args.connections] for i in range(args.connections)]
+
+    latencias, errores = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(conexion(p, args.host, args.port, args.unix, latencias, errores, args.pipeline)
+                           for p in por_conexion))
+    total = time.perf_counter() - inicio
+
+    return {
+        "requests": len(latencias),
+        "errors": len(errores),
+        "seconds": round(total, 3),
+        "throughput_rps": round(len(latencias) / total, 1) if total else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+    }
+
+
+def main(datos="biblioteca.json"):
+    parser = argparse.ArgumentParser(description="Generador de carga para server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--datos", default=datos)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--pipeline", type=int, default=8, help="pedidos en vuelo por conexión")
+    parser.add_argument("--json", action="store_true", help="imprime el reporte como JSON")
+    args = parser.parse_args()
+
+    reporte = asyncio.run(correr(args))
+    if args.json:
+        print(json.dumps(reporte))
+        return
+
+    print(f"Pedidos: {reporte['requests']}  (errores: {reporte['errors']})")
+    print(f"Tiempo total: {reporte['seconds']} s")
+    print(f"Throughput: {reporte['throughput_rps']} pedidos/s")
+    print(f"Latencia p50: {reporte['p50_ms']} ms | p99: {reporte['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+from array import array
+from bisect import bisect_left
+
+
+class NgramIndex:
+    """
+    Índice invertido de n-gramas (trigramas por defecto) para búsquedas
+    tipo "contiene" sin distinguir mayúsculas.
+
+    Cada documento se guarda en minúsculas con un número interno creciente,
+    y cada n-grama apunta a un array('I') ordenado con esos números. Una
+    consulta intersecta las listas de sus n-gramas (empezando por la más
+    corta, con búsqueda binaria) y solo verifica con `in` los pocos
+    candidatos que quedan.
+
+    Borrar o actualizar no toca las listas: el número viejo queda muerto y
+    se filtra al buscar; cuando hay más muertos que vivos se compacta.
+    """
+
+    def __init__(self, n=3):
+        if n < 1:
+            raise ValueError("n debe ser >= 1")
+        self.n = n
+        self.postings = {}
+        self.docs = {}
+        self.texts = []
+        self.keys = []
+        self._orden = {}
+        self._siguiente = 0
+        self._muertos = 0
+
+    def _ngramas(self, texto):
+        n = self.n
+        return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+    def _indexar(self, key, texto):
+        doc = len(self.texts)
+        self.texts.append(texto)
+        self.keys.append(key)
+        self.docs[key] = doc
+
+        postings = self.postings
+        for g in self._ngramas(texto):
+            lista = postings.get(g)
+            if lista is None:
+                postings[g] = array('I', (doc,))
+            else:
+                lista.append(doc)
+
+    def _matar(self, key):
+        doc = self.docs[key]
+        self.texts[doc] = None
+        self._muertos += 1
+
+    def add(self, key, texto):
+        if key in self.docs:
+            self.update(key, texto)
+            return
+
+        self._orden[key] = self._siguiente
+        self._siguiente += 1
+        self._indexar(key, texto.lower())
+
+    def remove(self, key):
+        if key not in self.docs:
+            return False
+        self._matar(key)
+        del self.docs[key]
+        del self._orden[key]
+        self._tal_vez_compactar()
+        return True
+
+    def update(self, key, texto):
+        """Re-indexa el texto con un número nuevo; conserva el orden de inserción."""
+        doc = self.docs.get(key)
+        if doc is None:
+            self.add(key, texto)
+            return
+
+        texto = texto.lower()
+        if texto == self.texts[doc]:
+            return
+
+        self._matar(key)
+        self._indexar(key, texto)
+        self._tal_vez_compactar()
+
+    def _tal_vez_compactar(self):
+        if self._muertos > 1024 and self._muertos > len(self.docs):
+            self.compact()
+
+    def compact(self):
+        """Reconstruye las listas solo con los documentos vivos."""
+        vivos = [(key, self.texts[doc]) for key, doc in self.docs.items()]
+        self.postings = {}
+        self.docs = {}
+        self.texts = []
+        self.keys = []
+        self._muertos = 0
+        for key, texto in vivos:
+            self._indexar(key, texto)
+
+    def search(self, query):
+        """Devuelve las claves cuyo texto contiene `query`, en orden de inserción."""
+        query = query.lower()
+        texts = self.texts
+
+        # Consultas más cortas que n no tienen n-gramas: toca recorrer todo
+        if len(query) < self.n:
+            return [k for k, doc in self.docs.items() if query in texts[doc]]
+
+        listas = []
+        for g in self._ngramas(query):
+            lista = self.postings.get(g)
+            if not lista:
+                return []
+            listas.append(lista)
+
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            quedan = array('I')
+            lo = 0
+            fin = len(lista)
+            for doc in candidatos:
+                lo = bisect_left(lista, doc, lo)
+                if lo == fin:
+                    break
+                if lista[lo] == doc:
+                    quedan.append(doc)
+            candidatos = quedan
+            if not candidatos:
+                return []
+
+        keys = self.keys
+        encontrados = []
+        for doc in candidatos:
+            texto = texts[doc]
+            if texto is not None and query in texto:
+                encontrados.append(keys[doc])
+        encontrados.sort(key=self._orden.__getitem__)
+        return encontrados
+
+    def __len__(self):
+        return len(self.docs)
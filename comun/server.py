@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from .interaction_log import as_event
+
+# Servidor asyncio de JSON por líneas (TCP o socket Unix) para el sistema.
+# Es el mismo para las unidades 1 y 2: el server.py de cada unidad llama a
+# main() con su propio cargar_sistema.
+# Cada línea es un pedido, por ejemplo:
+#   {"id": 1, "op": "search", "query": "lorem", "field": "title"}
+#   {"id": 2, "op": "genre", "genre": "science"}
+#   {"id": 3, "op": "book", "book_id": "..."}
+#   {"id": 4, "op": "recommend", "params": {"genre_preference": "history"}}
+#   {"id": 5, "op": "interact", "events": [["<book_id>", "user_1"], ...]}
+#   {"id": 6, "op": "stats"}
+# y la respuesta es {"id": ..., "ok": true, "result": ...} o {"ok": false, "error": ...}.
+
+READ_OPS = ("search", "genre", "book")
+
+
+class RWLock:
+    """
+    Varios lectores a la vez o un solo escritor. Un escritor esperando frena
+    a los lectores nuevos, así un lote de interacciones no se queda sin turno.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def _as_dict(book):
+    if book is None:
+        return None
+    return book.to_dict() if hasattr(book, "to_dict") else book
+
+
+def _encode(result):
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
+def _events(raw):
+    """Valida y normaliza los eventos de un pedido `interact` (ValueError si alguno está mal)."""
+    if not isinstance(raw, list):
+        raise ValueError("'events' tiene que ser una lista")
+    events = []
+    for i, e in enumerate(raw):
+        try:
+            event = as_event(e)
+        except (KeyError, IndexError, TypeError):
+            raise ValueError(f"Evento {i} mal formado: {e!r}") from None
+        if not isinstance(event[0], (str, int)) or isinstance(event[0], bool):
+            raise ValueError(f"Evento {i}: book_id inválido: {event[0]!r}")
+        events.append(event)
+    return events
+
+
+class LibraryServer:
+    """
+    - Consultas de lectura idénticas que llegan a la vez comparten un solo
+      cálculo (y un solo JSON ya codificado).
+    - Las interacciones concurrentes se juntan en un lote para
+      `register_interactions` (un solo write a la bitácora).
+    - El trabajo pesado corre en un pool de hilos. El sistema no es
+      thread-safe: las búsquedas (READ_OPS) toman el lock de lectura y
+      corren juntas; los lotes de interacciones y las recomendaciones (el
+      muestreo de la unidad 1 toca el árbol) toman el de escritura.
+      Ojo: búsquedas y recomendaciones son Python puro y se quedan con el
+      GIL, así que el pool no las corre en paralelo. Sirve para que el
+      event loop siga atendiendo sockets y juntando lotes mientras tanto,
+      no para usar más de un núcleo; para eso habría que levantar varios
+      procesos, cada uno con su copia del sistema.
+    - Cada evento se valida al llegar: uno mal formado falla solo su
+      pedido, no el lote entero. Al cerrar se escriben los lotes pendientes.
+    - Backpressure: como máximo `max_inflight` pedidos en curso; cuando se
+      llena se deja de leer de los sockets y TCP frena al cliente.
+    """
+
+    def __init__(self, sistema, workers=4, max_inflight=256, batch_window=0.002, batch_max=1000):
+        self.sistema = sistema
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = RWLock()
+        self.slots = asyncio.Semaphore(max_inflight)
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+
+        self.inflight = {}
+        self.pending_events = []
+        self.pending_waiters = []
+        self.flush_handle = None
+        self.writes = set()
+        self.stats = {"requests": 0, "errors": 0, "coalesced": 0, "batches": 0, "events": 0}
+
+    async def _run(self, fn, *args, write=False):
+        """Corre fn en el pool con el lock y codifica el resultado."""
+        def job():
+            # Se codifica con el lock tomado: los libros son los del sistema
+            with self.lock.write() if write else self.lock.read():
+                return _encode(fn(*args))
+        return await asyncio.get_running_loop().run_in_executor(self.pool, job)
+
+    async def _coalesced(self, key, fn, *args):
+        fut = self.inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._run(fn, *args))
+            self.inflight[key] = fut
+            fut.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(fut)
+
+    def _search(self, query, field):
+        return [_as_dict(b) for b in self.sistema.search_flexible(query, field)]
+
+    def _genre(self, genre):
+        return [_as_dict(b) for b in self.sistema.get_books_by_genre(genre)]
+
+    def _book(self, book_id):
+        return _as_dict(self.sistema.search_by_id(book_id))
+
+    def _recommend(self, params):
+        return [_as_dict(b) for b in self.sistema.recommend_books(**params)]
+
+    async def _interact(self, events):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        start = len(self.pending_events)
+        self.pending_events.extend(events)
+        self.pending_waiters.append((waiter, start, len(events)))
+
+        if len(self.pending_events) >= self.batch_max:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await waiter
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        events, waiters = self.pending_events, self.pending_waiters
+        self.pending_events, self.pending_waiters = [], []
+        if events:
+            task = asyncio.ensure_future(self._write_batch(events, waiters))
+            self.writes.add(task)
+            task.add_done_callback(self.writes.discard)
+
+    async def drain(self):
+        """Escribe el lote pendiente y espera a los que ya están en curso."""
+        self._flush()
+        while self.writes:
+            await asyncio.gather(*self.writes, return_exceptions=True)
+
+    async def _write_batch(self, events, waiters):
+        def job():
+            with self.lock.write():
+                return self.sistema.register_interactions(events)
+        try:
+            books = await asyncio.get_running_loop().run_in_executor(self.pool, job)
+        except Exception as exc:
+            for waiter, _, _ in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["events"] += len(events)
+        for waiter, start, n in waiters:
+            found = sum(1 for b in books[start:start + n] if b is not None)
+            if not waiter.done():
+                waiter.set_result(_encode({"registered": found, "unknown": n - found}))
+
+    async def handle(self, req):
+        op = req.get("op")
+        if op == "search":
+            q, field = req["query"], req.get("field", "title")
+            return await self._coalesced(("search", q, field), self._search, q, field)
+        if op == "genre":
+            return await self._coalesced(("genre", req["genre"]), self._genre, req["genre"])
+        if op == "book":
+            return await self._coalesced(("book", req["book_id"]), self._book, req["book_id"])
+        if op == "recommend":
+            # Es aleatorio: cada pedido necesita su propia muestra, no se comparte
+            return await self._run(self._recommend, req.get("params", {}), write=True)
+        if op == "interact":
+            return await self._interact(_events(req["events"]))
+        if op == "stats":
+            return _encode(dict(self.stats, inflight=len(self.inflight)))
+        raise ValueError(f"Operación desconocida: {op}")
+
+    async def _respond(self, line, writer, write_lock):
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("el pedido tiene que ser un objeto JSON")
+            req_id = req.get("id")
+            try:
+                body = '{"id":%s,"ok":true,"result":%s}' % (_encode(req_id), await self.handle(req))
+            except Exception as exc:
+                self.stats["errors"] += 1
+                body = _encode({"id": req_id, "ok": False, "error": f"{type(exc).__name__}: {exc}"})
+        except ValueError as exc:
+            self.stats["errors"] += 1
+            body = _encode({"id": None, "ok": False, "error": f"JSON inválido: {exc}"})
+        finally:
+            self.slots.release()
+
+        async with write_lock:
+            writer.write(body.encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def client_connected(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # Sin cupo no se lee la siguiente línea: eso es la backpressure
+                await self.slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    self.slots.release()
+                    break
+                self.stats["requests"] += 1
+                task = asyncio.ensure_future(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        except asyncio.CancelledError:
+            # Ctrl+C con el cliente conectado: la conexión se cierra sin más
+            # (serve() escribe lo pendiente)
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.client_connected, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.client_connected, host, port)
+        print("Servidor escuchando en", unix_path or f"{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # Al cortar (Ctrl+C) las interacciones ya aceptadas no se pierden
+            await self.drain()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        if self.sistema.log is not None:
+            self.sistema.log.close()
+
+
+def main(cargar_sistema):
+    """Punto de entrada de `server.py` de cada unidad, que pasa su cargar_sistema."""
+    parser = argparse.ArgumentParser(description="Servidor de consultas de la biblioteca")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="ruta de socket Unix en vez de TCP")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--batch-window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    servidor = LibraryServer(cargar_sistema(), workers=args.workers,
+                             max_inflight=args.max_inflight,
+                             batch_window=args.batch_window_ms / 1000)
+    try:
+        asyncio.run(servidor.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("Saliendo...")
+    finally:
+        servidor.close()
+
@@ -0,0 +1,151 @@
+import json
+import pickle
+import random
+import sys
+
+import pytest
+
+from comun.book_store import BookRow, BookStore, CategoryColumn, ListColumn, NumberColumn, \
+    ObjectColumn, StringColumn, StructColumn
+
+
+def _json(d):
+    # Con sort_keys el JSON distingue 1 de 1.0, True de 1 y None de una llave que falta
+    return json.dumps(d, sort_keys=True)
+
+
+def _libros(n=300, seed=0):
+    rng = random.Random(seed)
+    res = []
+    for i in range(n):
+        libro = {"_id": f"id_{i}", "title": f"Libro {rng.random()}", "genre": rng.choice(["historia", "ciencia"]),
+                 "views": rng.randint(0, 10 ** 6), "available": rng.random() < 0.5}
+        if i % 7 == 0:
+            libro["rating"] = 4.5 if i % 2 else 4
+        if i % 11 == 0:
+            libro["tags"] = [rng.choice("abc") for _ in range(rng.randint(0, 3))]
+        if i % 13 == 0:
+            libro["contentSimilarity"] = [{"bookId": f"id_{j}", "score": rng.random()}
+                                          for j in range(rng.randint(1, 3))]
+        if i % 5 == 0:
+            libro["meta"] = {"isbn": f"978-{i}", "pages": i} if i % 10 else {"pages": None}
+        if i == 150:
+            libro["extra"] = [1, "dos", [3]]
+        res.append(libro)
+    return res
+
+
+def test_ida_y_vuelta_exacta_a_json():
+    libros = _libros()
+    store = BookStore()
+    filas = [store.append(dict(libro)) for libro in libros]
+    for libro, fila in zip(libros, filas):
+        assert _json(fila.to_dict()) == _json(libro)
+        assert set(fila) == set(libro) and len(fila) == len(libro)
+    # rating mezcla 4 y 4.5: la columna es de floats, pero los int vuelven como int
+    assert isinstance(store.columns["rating"], NumberColumn) and store.columns["rating"].typecode == "d"
+    assert type(filas[0]["rating"]) is int and type(filas[7]["rating"]) is float
+    assert isinstance(store.columns["contentSimilarity"], ListColumn)
+    assert isinstance(store.columns["meta"], StructColumn)
+    # Los títulos son todos distintos: la categoría pasó a StringColumn
+    assert isinstance(store.columns["title"], StringColumn)
+    assert isinstance(store.columns["genre"], CategoryColumn)
+
+    copia = pickle.loads(pickle.dumps(store))
+    assert [_json(b.to_dict()) for b in copia.rows()] == [_json(l) for l in libros]
+
+
+def test_columna_de_enteros_que_pasa_a_float():
+    store = BookStore()
+    a = store.append({"x": 3})
+    b = store.append({"x": 2.5})
+    c = store.append({"y": 1})
+    assert store.columns["x"].typecode == "d"
+    assert (type(a["x"]), a["x"]) == (int, 3)
+    assert (type(b["x"]), b["x"]) == (float, 2.5)
+    assert "x" not in c
+    c["x"] = 7
+    b["x"] = 8
+    a["x"] = 1.0
+    assert [(type(r["x"]), r["x"]) for r in (a, b, c)] == [(float, 1.0), (int, 8), (int, 7)]
+    # Enteros que no caben exactos en un double: la columna pasa a objetos
+    a["x"] = 2 ** 60 + 1
+    assert isinstance(store.columns["x"], ObjectColumn)
+    assert [r["x"] for r in (a, b, c)] == [2 ** 60 + 1, 8, 7]
+    assert type(b["x"]) is int
+
+
+def test_categoria_con_muchos_valores_o_tipos_raros():
+    store = BookStore()
+    filas = [store.append({"g": f"valor_{i}"}) for i in range(CategoryColumn.MIN_VALUES * 2)]
+    assert isinstance(store.columns["g"], StringColumn)
+    assert [f["g"] for f in filas] == [f"valor_{i}" for i in range(len(filas))]
+
+    otro = BookStore()
+    x = otro.append({"g": "a"})
+    y = otro.append({"g": None})
+    z = otro.append({"g": 5})
+    assert isinstance(otro.columns["g"], ObjectColumn)
+    assert (x["g"], y["g"], z["g"]) == ("a", None, 5)
+
+
+def test_listas_y_structs_por_bookrow():
+    store = BookStore()
+    fila = store.append({"_id": "a", "sim": [{"id": "b", "s": 0.5}], "tags": ["x"], "meta": {"p": 1}})
+    otra = store.append({"_id": "b", "tags": []})
+
+    # Las listas se devuelven nuevas: para cambiarlas se reasignan
+    sim = fila["sim"]
+    assert isinstance(sim[0], BookRow) and sim[0]["s"] == 0.5
+    fila["sim"] = sim + [{"id": "c", "s": 0.25}]
+    fila["tags"] = fila["tags"] + ["y"]
+    otra["tags"] = ["z", 2]
+    assert fila.to_dict()["sim"] == [{"id": "b", "s": 0.5}, {"id": "c", "s": 0.25}]
+    assert fila["tags"] == ["x", "y"] and otra["tags"] == ["z", 2]
+
+    # Un struct se ve como dict y se reemplaza entero
+    assert fila["meta"]["p"] == 1
+    fila["meta"] = {"q": "nuevo"}
+    assert fila.to_dict()["meta"] == {"q": "nuevo"}
+    otra["meta"] = fila["meta"]
+    assert otra.to_dict()["meta"] == {"q": "nuevo"}
+    with pytest.raises(KeyError):
+        fila["meta"]["p"]
+
+
+def test_campos_que_faltan_set_delete_y_append():
+    store = BookStore()
+    a = store.append({"_id": "a", "views": 1})
+    b = store.append({"_id": "b", "nuevo": "x"})
+    assert "nuevo" not in a and "views" not in b
+    with pytest.raises(KeyError):
+        a["nuevo"]
+    assert a.get("nuevo") is None
+
+    b["views"] = 10
+    del a["views"]
+    assert "views" not in a and b["views"] == 10
+    with pytest.raises(KeyError):
+        del a["views"]
+    a["views"] = 3
+    assert a.to_dict() == {"_id": "a", "views": 3}
+    assert b.to_dict() == {"_id": "b", "nuevo": "x", "views": 10}
+
+    c = store.append({"_id": "c"})
+    assert c.to_dict() == {"_id": "c"}
+    assert [r["_id"] for r in store.rows()] == ["a", "b", "c"]
+    store.remove(b)
+    assert len(store) == 2 and [r["_id"] for r in store.rows()] == ["a", "c"]
+    assert a == BookRow(store, 0) and a != c and len({a, BookRow(store, 0)}) == 1
+
+
+def test_faltantes_dispersos_cuestan_bits():
+    store = BookStore()
+    n = 20000
+    for i in range(n):
+        store.append({"_id": i} if i % 1000 else {"_id": i, "raro": i})
+    faltan = store.missing["raro"]
+    # Un set de esas filas serían cientos de KB; el bitmap ~n/8 bytes (más lo que reserva bytearray)
+    assert sys.getsizeof(faltan.bits) < n // 4
+    assert len(faltan) == n - n // 1000
+    assert [r["raro"] for r in store.rows() if "raro" in r] == list(range(0, n, 1000))
@@ -0,0 +1,68 @@
+import pickle
+import random
+
+import pytest
+
+from comun.hash_table import HashTable
+
+
+def _igual_que(tabla, ref):
+    assert len(tabla) == len(ref)
+    assert dict(tabla.items()) == ref
+    for k, v in ref.items():
+        assert k in tabla and tabla.get(k) == v
+
+
+def test_operaciones_al_azar_contra_dict():
+    rng = random.Random(6)
+    tabla, ref = HashTable(8), {}
+    for _ in range(20000):
+        k = f"id_{rng.randrange(3000)}"
+        if rng.random() < 0.4:
+            assert tabla.delete(k) == ref.pop(k, None)
+        else:
+            v = rng.random()
+            assert tabla.put(k, v) == (k not in ref)
+            ref[k] = v
+    _igual_que(tabla, ref)
+    assert tabla.get("no_existe", "x") == "x"
+    assert tabla.delete("no_existe") is None
+
+
+def test_crece_y_respeta_el_factor_de_carga():
+    tabla = HashTable(8, max_load=0.7)
+    for i in range(10000):
+        tabla.put(i, i)
+        assert (len(tabla) + tabla._deleted) <= tabla.capacity * 0.7
+    assert tabla.capacity == 16384 and tabla.resizes == 11
+    _igual_que(tabla, {i: i for i in range(10000)})
+
+
+def test_lapidas_no_hacen_crecer_la_tabla():
+    # Insertar y borrar siempre llaves nuevas llena la tabla de lápidas:
+    # se tienen que limpiar sin duplicar la capacidad
+    tabla = HashTable(64)
+    for i in range(50000):
+        tabla.put(i, i)
+        if i >= 10:
+            assert tabla.delete(i - 10) == i - 10
+    assert len(tabla) == 10
+    assert tabla.capacity <= 64
+    _igual_que(tabla, {i: i for i in range(49990, 50000)})
+
+
+def test_pickle_conserva_las_lapidas():
+    tabla = HashTable(8)
+    for i in range(5):
+        tabla.put(i, str(i))
+    tabla.delete(2)
+    copia = pickle.loads(pickle.dumps(tabla))
+    _igual_que(copia, {0: "0", 1: "1", 3: "3", 4: "4"})
+    # La lápida sigue siendo la del módulo: el sondeo pasa por encima
+    copia.put(2, "dos")
+    assert copia.get(2) == "dos" and len(copia) == 5
+
+
+def test_max_load_invalido():
+    with pytest.raises(ValueError):
+        HashTable(8, max_load=1)
@@ -0,0 +1,55 @@
+import random
+
+from comun.ngram_index import NgramIndex
+
+LETRAS = "abcde "
+
+
+def _texto(rng):
+    return "".join(rng.choice(LETRAS) for _ in range(rng.randint(0, 30))).title()
+
+
+def _lineal(docs, query):
+    q = query.lower()
+    return [k for k, t in docs.items() if q in t.lower()]
+
+
+def _consultas(rng, docs):
+    for _ in range(200):
+        texto = rng.choice(list(docs.values()) or [""])
+        i = rng.randint(0, len(texto))
+        yield texto[i:i + rng.randint(0, 6)]
+        yield "".join(rng.choice(LETRAS) for _ in range(rng.randint(1, 5)))
+
+
+def test_busqueda_igual_que_recorrido_lineal():
+    rng = random.Random(1)
+    idx = NgramIndex(3)
+    docs = {}
+    for i in range(500):
+        docs[i] = _texto(rng)
+        idx.add(i, docs[i])
+
+    for q in _consultas(rng, docs):
+        assert idx.search(q) == _lineal(docs, q), q
+
+
+def test_busqueda_despues_de_borrar_actualizar_y_compactar():
+    rng = random.Random(2)
+    idx = NgramIndex(3)
+    docs = {}
+    for i in range(3000):
+        docs[i] = _texto(rng)
+        idx.add(i, docs[i])
+    # Suficientes muertos para que se compacte solo (más de 1024 y más que vivos)
+    for i in rng.sample(range(3000), 2000):
+        if rng.random() < 0.5:
+            idx.remove(i)
+            del docs[i]
+        else:
+            docs[i] = _texto(rng)
+            idx.update(i, docs[i])
+
+    assert len(idx) == len(docs)
+    for q in _consultas(rng, docs):
+        assert idx.search(q) == _lineal(docs, q), q
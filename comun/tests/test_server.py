@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from comun.server import LibraryServer
+
+
+class Sistema:
+    """Lo mínimo que usa el servidor: libros en un dict y la bitácora apagada."""
+
+    def __init__(self):
+        self.books = {f"id_{i}": {"_id": f"id_{i}", "title": f"Libro {i}", "views": 0} for i in range(5)}
+        self.log = None
+        self.lotes = []
+
+    def search_by_id(self, book_id):
+        return self.books.get(book_id)
+
+    def register_interactions(self, events):
+        self.lotes.append(list(events))
+        res = []
+        for book_id, _, _ in events:
+            book = self.books.get(book_id)
+            if book:
+                book["views"] += 1
+            res.append(book)
+        return res
+
+
+async def _conversar(servidor, path, lineas):
+    srv = await asyncio.start_unix_server(servidor.client_connected, path=path)
+    async with srv:
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write("".join(l + "\n" for l in lineas).encode("utf-8"))
+        await writer.drain()
+        respuestas = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in lineas]
+        writer.close()
+    return {r["id"]: r for r in respuestas if r["id"] is not None}, respuestas
+
+
+def test_pedidos_invalidos_responden_error(tmp_path):
+    servidor = LibraryServer(Sistema())
+    lineas = ["[1, 2]", "42", "{no es json", json.dumps({"id": 1, "op": "book", "book_id": "id_1"})]
+    por_id, todas = asyncio.run(_conversar(servidor, str(tmp_path / "s.sock"), lineas))
+    servidor.close()
+    assert sum(not r["ok"] for r in todas) == 3
+    assert por_id[1]["ok"] and por_id[1]["result"]["_id"] == "id_1"
+
+
+def test_evento_mal_formado_no_tumba_el_lote(tmp_path):
+    sistema = Sistema()
+    # Ventana larga: todos los pedidos caen en el mismo lote
+    servidor = LibraryServer(sistema, batch_window=0.2)
+    lineas = [
+        json.dumps({"id": 1, "op": "interact", "events": [["id_1", "u1"], ["id_2", "u2"]]}),
+        json.dumps({"id": 2, "op": "interact", "events": [{"user_id": "sin libro"}]}),
+        json.dumps({"id": 3, "op": "interact", "events": [[["no", "hashable"], "u3"]]}),
+        json.dumps({"id": 4, "op": "interact", "events": "id_1"}),
+        json.dumps({"id": 5, "op": "interact", "events": [["id_1"], ["nadie"]]}),
+    ]
+    por_id, _ = asyncio.run(_conversar(servidor, str(tmp_path / "s.sock"), lineas))
+    servidor.close()
+    assert por_id[1]["result"] == {"registered": 2, "unknown": 0}
+    assert por_id[5]["result"] == {"registered": 1, "unknown": 1}
+    assert not por_id[2]["ok"] and not por_id[3]["ok"] and not por_id[4]["ok"]
+    assert len(sistema.lotes) == 1 and len(sistema.lotes[0]) == 4
+    assert sistema.books["id_1"]["views"] == 2
+
+
+def test_al_cerrar_se_escribe_el_lote_pendiente():
+    sistema = Sistema()
+
+    async def correr():
+        servidor = LibraryServer(sistema, batch_window=60)
+        pedido = asyncio.ensure_future(servidor.handle({"op": "interact", "events": [["id_3", "u"]]}))
+        await asyncio.sleep(0.01)
+        assert not sistema.lotes
+        await servidor.drain()
+        servidor.close()
+        return await pedido
+
+    assert json.loads(asyncio.run(correr())) == {"registered": 1, "unknown": 0}
+    assert sistema.books["id_3"]["views"] == 1
@@ -0,0 +1,80 @@
+import os
+from array import array
+
+from comun import snapshot
+from comun.snapshot import load_snapshot, save_snapshot
+
+
+def _estado():
+    return {"vistas": array("q", range(1000)), "pesos": array("d", [0.5] * 300),
+            "bits": bytearray(b"\x01\x02" * 50), "libros": {"id_1": {"title": "Uno"}}}
+
+
+def _guardar(tmp_path, obj=None):
+    fuente = tmp_path / "biblioteca.json"
+    fuente.write_text("[]", encoding="utf-8")
+    path = str(tmp_path / "b.snap")
+    save_snapshot(_estado() if obj is None else obj, path, source=str(fuente))
+    return path, str(fuente)
+
+
+def test_ida_y_vuelta_con_buffers_fuera_de_banda(tmp_path):
+    path, fuente = _guardar(tmp_path)
+    cargado = load_snapshot(path, source=fuente)
+    assert cargado == _estado()
+    # Los arrays no dependen del archivo: se pueden extender y el archivo borrar
+    os.remove(path)
+    cargado["vistas"].append(5)
+    assert len(cargado["vistas"]) == 1001
+    assert not os.path.exists(path + ".tmp")
+
+
+def _pisar(path, offset, valor=b"\xff"):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        viejo = f.read(1)
+        f.seek(offset)
+        f.write(bytes([viejo[0] ^ valor[0]]))
+
+
+def test_checksum_detecta_bytes_cambiados(tmp_path):
+    path, fuente = _guardar(tmp_path)
+    tamano = os.path.getsize(path)
+    # Un byte del pickle y otro del último buffer crudo
+    for offset in (snapshot._HEADER.size + snapshot._ENTRY.size * 2 + 10, tamano - 1):
+        _pisar(path, offset)
+        assert load_snapshot(path, source=fuente) is None
+        _pisar(path, offset)
+        assert load_snapshot(path, source=fuente) == _estado()
+
+
+def test_snapshot_desactualizado_o_roto(tmp_path):
+    path, fuente = _guardar(tmp_path)
+    # La fuente cambió después de guardar
+    with open(fuente, "a", encoding="utf-8") as f:
+        f.write(" ")
+    assert load_snapshot(path, source=fuente) is None
+    assert load_snapshot(path) == _estado()
+
+    # Otra versión del formato, archivo cortado, vacío o inexistente
+    _pisar(path, 8, b"\x07")
+    assert load_snapshot(path) is None
+    path, _ = _guardar(tmp_path)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 40)
+    assert load_snapshot(path) is None
+    with open(path, "wb"):
+        pass
+    assert load_snapshot(path) is None
+    assert load_snapshot(str(tmp_path / "no_existe.snap")) is None
+
+
+class _Viejo:
+    pass
+
+
+def test_clase_que_ya_no_existe(tmp_path, monkeypatch):
+    path, _ = _guardar(tmp_path, {"x": _Viejo()})
+    # La clase se guardó por su módulo; si ese módulo ya no la tiene, se reconstruye desde el JSON
+    monkeypatch.delitem(globals(), "_Viejo")
+    assert load_snapshot(path) is None